@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import os
+
+from slack_bolt import BoltResponse
+from slack_bolt.async_app import AsyncApp, AsyncBoltRequest
+from slack_bolt.context.say.async_say import AsyncSay
+from slack_sdk.web.async_client import AsyncWebClient
+
+from src.async_bot_policy import handle_message, help_command, classify_and_respond
+from src.bot_policy import seen_deliveries
+from src.state.delivery_deduplication import retry_number
+
+# HYPER_VYPER_LOG_LEVEL=DEBUG logs every payload, which costs time on every message.
+logging.basicConfig(level=os.environ.get('HYPER_VYPER_LOG_LEVEL', 'INFO').upper())
+logger = logging.getLogger(__name__)
+
+bot_token = os.environ.get("SLACK_BOT_API_TOKEN")
+bot_signature = os.environ.get("SLACK_BOT_SIGNING_SECRET")
+if None in [bot_token, bot_signature]:
+    raise ValueError("Bot Token and Bot Signing Secret must be set")
+
+# slack expects an ack within 3 seconds. bolt answers the http request as soon as ack() is awaited,
+# while the listener keeps running on the event loop, so the reply to slack never waits for slack's own api.
+bolt_app = AsyncApp(token=bot_token, signing_secret=bot_signature)
+
+
+@bolt_app.middleware
+async def skip_duplicate_deliveries(body: dict, request: AsyncBoltRequest, next):
+    """the deliveries slack retries after it got no answer in time are answered without handling them again."""
+    # off the event loop, as the deliveries may be claimed in a sqlite database shared with other workers.
+    if await asyncio.to_thread(seen_deliveries.is_duplicate, body, retry_number(request.headers)):
+        logger.info(f"Skipped a duplicate delivery of event {body.get('event_id')}")
+        return BoltResponse(status=200, body="")
+    await next()
+
+
+@bolt_app.message()
+async def forward_message_to_handler(message: dict, client: AsyncWebClient, say: AsyncSay, context):
+    """
+    Handles all incoming messages and checks if they are replies
+    to the bot's own messages within a thread.
+    """
+    await handle_message(message, client, say, context)
+
+
+@bolt_app.command("/help")
+async def display_help(say, ack):
+    await ack()
+    await help_command(say)
+
+
+@bolt_app.command("/classify")
+async def forward_command_to_classification(payload, ack, client):
+    """This initiates a conversation about a security request."""
+    await ack()
+    await classify_and_respond(payload, client)
+
+
+if __name__ == '__main__':
+    bolt_app.start(host='0.0.0.0', port=8080, path="/hyper-vyper/events")
@@ -0,0 +1,117 @@
+"""
+Measures how long slack waits for the ack of a /classify command during a burst of them, when the command is
+classified on bolt's own listener threads right after the ack, and when it is handed to the classify queue.
+Both bolt apps talk to a local fake of slack's web api which answers after a set latency.
+
+run with `python -m benchmarks.ack_latency_benchmark`
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from slack_bolt import App, BoltRequest
+from slack_sdk import WebClient
+
+from src import bot_policy
+from src.auditing.decision_logging import DecisionLogger
+from src.work_queue import ShardedWorkQueue
+from benchmarks.async_load_benchmark import FAKE_TOKEN, FakeSlackApi
+from benchmarks.ticket_archive import load_ticket_details
+
+CHANNELS = 20
+
+
+def _bolt_app(base_url: str) -> App:
+    return App(
+        client=WebClient(token=FAKE_TOKEN, base_url=base_url),
+        token_verification_enabled=False, request_verification_enabled=False,
+    )
+
+
+def _classifying_after_ack(base_url: str):
+    app = _bolt_app(base_url)
+
+    @app.command('/classify')
+    def classify(payload, ack, client):
+        ack()
+        bot_policy.classify_and_respond(payload, client)
+    return app, None
+
+
+def _queueing(base_url: str, workers: int):
+    app = _bolt_app(base_url)
+    classify_queue = ShardedWorkQueue(lambda work: bot_policy.classify_and_respond(*work), workers=workers)
+
+    @app.command('/classify')
+    def classify(payload, ack, client):
+        if classify_queue.submit(payload['channel_id'], (payload, client)):
+            ack()
+        else:
+            ack(blocks=bot_policy.overloaded_command_reply())
+    return app, classify_queue
+
+
+def _command(text: str, i: int) -> BoltRequest:
+    payload = {
+        'command': '/classify', 'text': text, 'user_id': 'U1', 'team_id': 'T1',
+        'channel_id': f"C{i % CHANNELS}", 'channel_name': 'load-test',
+    }
+    return BoltRequest(body=urlencode(payload), headers={'content-type': ['application/x-www-form-urlencoded']})
+
+
+def _ack_latencies(app: App, texts, web_threads: int) -> list:
+    def ack_latency(i_text) -> float:
+        request = _command(i_text[1], i_text[0])
+        start = time.perf_counter()
+        response = app.dispatch(request)
+        if response.status != 200:
+            raise AssertionError(f"the bolt app answered with {response.status}")
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=web_threads) as web_workers:
+        return sorted(web_workers.map(ack_latency, enumerate(texts)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency-ms', type=float, default=250., help='how long the fake slack api takes to answer')
+    parser.add_argument('--web-threads', type=int, default=32, help='requests in flight at once')
+    parser.add_argument('--workers', type=int, default=8, help='consumers of the classify queue')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    texts = load_ticket_details()[:args.requests]
+    with tempfile.TemporaryDirectory() as log_dir, FakeSlackApi(0) as slack_api:
+        bot_policy.decision_logger = DecisionLogger(log_path=os.path.join(log_dir, 'audit.log'))
+        modes = [
+            ('classified after ack', lambda: _classifying_after_ack(slack_api.base_url)),
+            (f"queue, {args.workers} workers", lambda: _queueing(slack_api.base_url, args.workers)),
+        ]
+        for name, build in modes:
+            slack_api.latency_seconds = 0
+            app, classify_queue = build()
+            # bolt asks slack who it is on the first request only, which is not what is measured.
+            app.dispatch(_command(texts[0], 0))
+            slack_api.latency_seconds = args.latency_ms / 1e3
+
+            start = time.perf_counter()
+            latencies = _ack_latencies(app, texts, args.web_threads)
+            if classify_queue is not None:
+                classify_queue.join()
+                classify_queue.close()
+            p50, p99 = latencies[len(latencies) // 2], latencies[int(len(latencies) * .99)]
+            print(
+                f"{name:<22}ack p50 {1e3 * p50:.1f}ms, p99 {1e3 * p99:.1f}ms, worst {1e3 * latencies[-1]:.1f}ms"
+                + (f", {classify_queue.rejected} refused" if classify_queue is not None else '')
+            )
+            # lets bolt's listener threads finish the burst before the next mode is measured.
+            time.sleep(len(texts) * slack_api.latency_seconds / 5)
+
+
+if __name__ == '__main__':
+    main()
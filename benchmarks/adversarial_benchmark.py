@@ -0,0 +1,83 @@
+"""
+Feeds the parser 100 KB messages crafted to make backtracking regexes explode,
+and fails if any of them takes longer than the latency budget.
+
+run with `python -m benchmarks.adversarial_benchmark`
+"""
+import argparse
+import sys
+import time
+
+from src.parsing.regex_classifier import (
+    attempt_to_classify, attempt_to_construct_cloud_access, attempt_to_construct_data_export,
+    attempt_to_construct_devtool_install, attempt_to_construct_firewall_change,
+    attempt_to_construct_network_access, attempt_to_construct_permissions_change,
+    attempt_to_construct_vendor_approval
+)
+
+INPUT_SIZE = 100 * 1024
+
+PARSERS = [
+    attempt_to_classify,
+    attempt_to_construct_cloud_access,
+    attempt_to_construct_data_export,
+    attempt_to_construct_devtool_install,
+    attempt_to_construct_firewall_change,
+    attempt_to_construct_network_access,
+    attempt_to_construct_permissions_change,
+    attempt_to_construct_vendor_approval,
+]
+
+
+def _repeat_to_size(prefix: str, body: str, suffix: str = '!') -> str:
+    repetitions = (INPUT_SIZE - len(prefix) - len(suffix)) // len(body)
+    return prefix + body * repetitions + suffix
+
+
+ADVERSARIAL_MESSAGES = {
+    'provides without services': _repeat_to_size('provides ', 'ab '),
+    'repeated provides': _repeat_to_size('', 'provides '),
+    'justification without a full stop': _repeat_to_size('for ', 'abcdefgh '),
+    'repeated justification openers': _repeat_to_size('', 'to for '),
+    'one endless word': _repeat_to_size('to ', 'a'),
+    'vendor name without provide': _repeat_to_size('', 'acme, '),
+    'firewall source and destination': _repeat_to_size('from ', 'to a '),
+    'data classification': _repeat_to_size('data classification: ', 'a. '),
+    'export destination': _repeat_to_size('exported to ', 'a-b '),
+    'unicode text': _repeat_to_size('provides ', 'ſervice '),
+}
+
+
+def _worst_latency(text: str, repeats: int) -> (float, str):
+    """:returns the slowest time in milliseconds any parser took on the text, and that parser's name."""
+    worst, worst_parser = 0., None
+    for parser in PARSERS:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            parser(text)
+            elapsed = (time.perf_counter() - start) * 1e3
+            if elapsed > worst:
+                worst, worst_parser = elapsed, parser.__name__
+    return worst, worst_parser
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=50., help='the worst latency allowed per message')
+    args = parser.parse_args()
+
+    over_budget = []
+    for name, text in ADVERSARIAL_MESSAGES.items():
+        worst, worst_parser = _worst_latency(text, args.repeats)
+        print(f"{name} ({len(text) // 1024} KB): worst {worst:.2f}ms in {worst_parser}")
+        if worst > args.budget_ms:
+            over_budget.append(name)
+
+    if over_budget:
+        print(f"over the {args.budget_ms}ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Measures how long building the blocks of a reply takes with every attitude, apart from classifying the message.
+Every ticket in the archive is evaluated once up front, and then its reply blocks are built the way
+bot_policy builds them for a new request.
+
+run with `python -m benchmarks.block_rendering_benchmark`
+"""
+import argparse
+import timeit
+
+from src.conversational_user_interfaces.furry import Furry
+from src.conversational_user_interfaces.professional import Professional
+from src.parsing.constants import RequestFollowUp
+from src.message_evaluation import evaluate_message
+from benchmarks.ticket_archive import load_ticket_details
+
+
+def _build_reply_blocks(attitude, payload: dict, evaluation) -> list:
+    blocks = [
+        attitude.generate_acknowledgement_block(payload),
+        attitude.generate_reflection_block(payload),
+        attitude.generate_initial_classification_block(evaluation.request_type),
+        attitude.generate_user_request_description_block(evaluation.user_request),
+    ]
+    if evaluation.followup is RequestFollowUp.ACCEPT:
+        blocks.append(attitude.generate_approval_block())
+    elif evaluation.followup is RequestFollowUp.REQUEST_FURTHER_DETAILS:
+        blocks.append(attitude.generate_request_for_fields(evaluation.user_request.get_missing_fields()))
+    else:
+        blocks.append(attitude.generate_rejection_block())
+    return blocks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    replies = [({'user_id': 'U092VDAKQG0', 'text': text}, evaluate_message(text)) for text in load_ticket_details()]
+    for attitude in [Professional(), Furry()]:
+        build_all = lambda: [_build_reply_blocks(attitude, payload, evaluation) for payload, evaluation in replies]
+        best = min(timeit.repeat(build_all, number=1, repeat=args.repeats))
+        print(f"{type(attitude).__name__:<14}{1e6 * best / len(replies):.2f}us of block construction per reply")
+
+
+if __name__ == '__main__':
+    main()
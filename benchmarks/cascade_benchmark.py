@@ -0,0 +1,63 @@
+"""
+Shows the tradeoff the classification cascade makes between cost and accuracy: for every confidence the keyword rules
+need to answer, how many of the held out tickets of the archive they escalate to the learned model, how accurate the
+cascade is and how long it takes per message.
+The held out tickets are also classified with their trigger keywords misspelled, like in classification_benchmark,
+as messages the keyword rules miss.
+
+run with `python -m benchmarks.cascade_benchmark`
+"""
+import argparse
+import time
+
+from src.parsing.cascade import CascadeRouter, CascadeTier
+from src.parsing.learned_classifier import read_labeled_tickets, split_holdout, train
+from src.parsing.regex_classifier import attempt_to_classify, classify_with_confidence
+from benchmarks.classification_benchmark import _strip_trigger_keywords
+from benchmarks.ticket_archive import TICKET_ARCHIVE_PATH
+
+
+def _timed_tier(name: str, classify, min_confidence: float, seconds_by_tier: dict) -> CascadeTier:
+    def timed_classify(text: str):
+        start = time.perf_counter()
+        try:
+            return classify(text)
+        finally:
+            seconds_by_tier[name] += time.perf_counter() - start
+    return CascadeTier(name, timed_classify, min_confidence)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--min-confidences', type=float, nargs='+', default=[0., .5, .75, 1.])
+    args = parser.parse_args()
+
+    texts, labels = read_labeled_tickets(TICKET_ARCHIVE_PATH)
+    (train_texts, train_labels), (holdout_texts, holdout_labels) = split_holdout(texts, labels, .2)
+    model = train(train_texts, train_labels)
+    for name, texts in [('held out tickets', holdout_texts), ('without keywords', [
+        _strip_trigger_keywords(t) for t in holdout_texts
+    ])]:
+        keyword_accuracy = sum(attempt_to_classify(t) == l for t, l in zip(texts, holdout_labels)) / len(texts)
+        print(f"{name}: {len(texts)} messages, keyword rules alone are {keyword_accuracy:.3f} accurate")
+        for min_confidence in args.min_confidences:
+            seconds_by_tier = {'keyword_rules': 0., 'learned_model': 0.}
+            router = CascadeRouter([
+                _timed_tier('keyword_rules', classify_with_confidence, min_confidence, seconds_by_tier),
+                _timed_tier('learned_model', model.classify, 0., seconds_by_tier),
+            ])
+            start = time.perf_counter()
+            predictions = [router.classify(t)[0] for t in texts]
+            elapsed = time.perf_counter() - start
+            accuracy = sum(p == l for p, l in zip(predictions, holdout_labels)) / len(texts)
+            print(
+                f"  keyword rules answering from {min_confidence:.2f}: "
+                f"{router.escalation_rate('keyword_rules'):6.1%} escalated, {accuracy:.3f} accurate, "
+                f"{elapsed / len(texts) * 1e6:7.1f}us per message "
+                f"(keyword rules {seconds_by_tier['keyword_rules'] / len(texts) * 1e6:.1f}us, "
+                f"learned model {seconds_by_tier['learned_model'] / len(texts) * 1e6:.1f}us)"
+            )
+
+
+if __name__ == '__main__':
+    main()
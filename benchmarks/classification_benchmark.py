@@ -0,0 +1,52 @@
+"""
+Compares the single pass classifier with the sequential rule chain over the ticket archive.
+
+run with `python -m benchmarks.classification_benchmark`
+"""
+import argparse
+import timeit
+
+from src.parsing.constants import RequestTypes
+from src.parsing.regex_classifier import attempt_to_classify, attempt_to_classify_sequentially
+from benchmarks.ticket_archive import load_ticket_details
+
+
+def _strip_trigger_keywords(text: str) -> str:
+    """mangles the text so that no trigger rule matches, forcing a walk through every rule."""
+    for keyword, replacement in [
+        ('install', 'instal'), ('role', 'rol'), ('export', 'exprt'), ('ccess', 'cess'),
+        ('traffic', 'trafic'), ('rovide', 'rovid'), ('firewall', 'firewal'), ('external', 'extrnl')
+    ]:
+        text = text.replace(keyword, replacement)
+    return text
+
+
+def _time_per_message(classifier, texts, repeats: int) -> float:
+    """:returns the best average time in microseconds it took to classify one of the texts."""
+    timings = timeit.repeat(lambda: [classifier(t) for t in texts], number=1, repeat=repeats)
+    return min(timings) / len(texts) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    archive = load_ticket_details()
+    unmatched = [_strip_trigger_keywords(t) for t in archive]
+    assert all(attempt_to_classify_sequentially(t) == RequestTypes.UNKNOWN for t in unmatched)
+
+    for name, texts in [('ticket archive', archive), ('unmatched texts', unmatched)]:
+        mismatches = [t for t in texts if attempt_to_classify(t) != attempt_to_classify_sequentially(t)]
+        if mismatches:
+            raise AssertionError(f"classifiers disagree on {len(mismatches)} {name}, e.g. {mismatches[0]!r}")
+        sequential = _time_per_message(attempt_to_classify_sequentially, texts, args.repeats)
+        single_pass = _time_per_message(attempt_to_classify, texts, args.repeats)
+        print(
+            f"{name} ({len(texts)} messages): sequential {sequential:.2f}us, "
+            f"single pass {single_pass:.2f}us, speedup x{sequential / single_pass:.2f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
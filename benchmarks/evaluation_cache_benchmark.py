@@ -0,0 +1,52 @@
+"""
+Measures what the message evaluation cache saves when texts are pasted again.
+Every ticket in the archive is evaluated without the cache, then through an empty cache (all misses),
+and then through the cache filled by that pass, as when users paste the same text again.
+
+run with `python -m benchmarks.evaluation_cache_benchmark`
+"""
+import argparse
+import timeit
+
+from src.message_evaluation import _parse_and_score, decide_on_follow_up, DEFAULT_SECURITY_RISK_THRESHOLD
+from src.state.evaluation_cache import MessageEvaluationCache
+from benchmarks.ticket_archive import load_ticket_details
+
+
+def _evaluate_all(texts, parse_and_score) -> list:
+    evaluations = []
+    for text in texts:
+        request_type, formed_request, security_risk = parse_and_score(text)
+        evaluations.append(decide_on_follow_up(formed_request, security_risk, DEFAULT_SECURITY_RISK_THRESHOLD))
+    return evaluations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    archive = load_ticket_details()
+    print(f"{len(archive)} messages, {len(set(archive))} distinct texts")
+
+    uncached = min(timeit.repeat(lambda: _evaluate_all(archive, _parse_and_score), number=1, repeat=args.repeats))
+
+    def through_an_empty_cache():
+        cache = MessageEvaluationCache(maxsize=len(archive))
+        return _evaluate_all(archive, lambda text: cache.get_or_evaluate(text, _parse_and_score))
+    misses = min(timeit.repeat(through_an_empty_cache, number=1, repeat=args.repeats))
+
+    filled_cache = MessageEvaluationCache(maxsize=len(archive))
+    _evaluate_all(archive, lambda text: filled_cache.get_or_evaluate(text, _parse_and_score))
+    hits = min(timeit.repeat(
+        lambda: _evaluate_all(archive, lambda text: filled_cache.get_or_evaluate(text, _parse_and_score)),
+        number=1, repeat=args.repeats
+    ))
+
+    for name, seconds in [('uncached', uncached), ('cache misses', misses), ('cache hits', hits)]:
+        print(f"{name:<14}{1e6 * seconds / len(archive):.2f}us per message")
+    print(f"hit rate of the filled cache: {filled_cache.hit_rate:.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Compares the planned extraction of every request type with searching the whole text for every one of its fields,
+over the messages of the ticket archive classified as that type: pattern searches and time per message.
+
+run with `python -m benchmarks.extraction_benchmark`
+"""
+import argparse
+import timeit
+from collections import defaultdict
+
+from src.parsing.regex_classifier import attempt_to_classify
+from src.parsing.request_registry import registered_schemas
+from benchmarks.ticket_archive import load_ticket_details
+
+
+def _time_per_message(extract, texts, repeats: int) -> float:
+    """:returns the best average time in microseconds it took to extract one of the texts."""
+    return min(timeit.repeat(lambda: [extract(t) for t in texts], number=1, repeat=repeats)) / len(texts) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    texts_by_type = defaultdict(list)
+    for text in load_ticket_details():
+        texts_by_type[attempt_to_classify(text)].append(text)
+
+    plans = {schema.request_type: schema.extraction_plan for schema in registered_schemas() if schema.extraction_plan}
+    total_sequential = total_planned = 0.
+    for request_type, plan in plans.items():
+        texts = texts_by_type[request_type]
+        mismatches = [t for t in texts if plan.extract(t) != plan.extract_sequentially(t)]
+        assert not mismatches, f"planned extraction differs on {len(mismatches)} {request_type} messages"
+        searches = sum(plan.searches(t) for t in texts) / len(texts)
+        sequential = _time_per_message(plan.extract_sequentially, texts, args.repeats)
+        planned = _time_per_message(plan.extract, texts, args.repeats)
+        total_sequential += sequential * len(texts)
+        total_planned += planned * len(texts)
+        print(
+            f"{request_type:<24}{len(plan.fields)} -> {searches:.2f} searches per message, "
+            f"{sequential:6.2f}us -> {planned:6.2f}us"
+        )
+    messages = sum(len(texts_by_type[request_type]) for request_type in plans)
+    print(f"{'every type':<24}{total_sequential / messages:.2f}us -> {total_planned / messages:.2f}us per message")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Reports how long a cold start of the bot spends importing, and on what: every module is imported in a fresh
+interpreter with `-X importtime`, and the time is added up by top level package.
+bot_main is imported against a local fake of slack's web api, since building the app asks slack who it is.
+
+run with `python -m benchmarks.import_time_benchmark`
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from benchmarks.async_load_benchmark import FAKE_SIGNING_SECRET, FAKE_TOKEN, FakeSlackApi
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVING_MODULES = ['bot_main', 'src.bot_policy', 'src.message_evaluation']
+# none of these is needed to answer slack, and each takes from tenths of a second to seconds to import.
+HEAVY_PACKAGES = ['torch', 'transformers', 'datasets', 'accelerate', 'pandas', 'numpy', 'matplotlib', 'pyarrow']
+
+_IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+
+def import_times(module: str, slack_api_url: str) -> List[Tuple[str, int, int]]:
+    """
+    imports the module in a fresh interpreter.
+    :returns (name, own us, cumulative us) of every module its import imported, ending with the module itself.
+    """
+    env = dict(
+        os.environ, PYTHONPATH=REPO_ROOT, SLACK_API_URL=slack_api_url,
+        SLACK_BOT_API_TOKEN=FAKE_TOKEN, SLACK_BOT_SIGNING_SECRET=FAKE_SIGNING_SECRET
+    )
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    times = []
+    for line in completed.stderr.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if match is None:
+            continue
+        name, depth = match.group(4), len(match.group(3))
+        if depth == 0:
+            # a module is reported after everything it imported, so a new top level import starts a new tree.
+            if name == module:
+                return times + [(name, int(match.group(1)), int(match.group(2)))]
+            times = []
+        else:
+            times.append((name, int(match.group(1)), int(match.group(2))))
+    raise ValueError(f"{module} was not reported as imported")
+
+
+def cumulative_import_us(module: str, slack_api_url: str) -> int:
+    """:returns how long importing the module took, with everything it imported that was not imported yet."""
+    return import_times(module, slack_api_url)[-1][2]
+
+
+def time_by_package(times: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    """:returns the import time of every top level package, from the own time of all of its modules."""
+    by_package = defaultdict(int)
+    for name, own_us, _ in times:
+        by_package[name.split('.')[0]] += own_us
+    return dict(by_package)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='how many of the slowest packages to list')
+    parser.add_argument('--modules', nargs='+', default=SERVING_MODULES)
+    args = parser.parse_args()
+
+    with FakeSlackApi(0) as slack_api:
+        for module in args.modules:
+            runs = [import_times(module, slack_api.base_url) for _ in range(args.repeats)]
+            totals = [times[-1][2] for times in runs]
+            print(f"{module}: {min(totals) / 1e3:.1f}ms (median {statistics.median(totals) / 1e3:.1f}ms)")
+            fastest = runs[totals.index(min(totals))]
+            packages = time_by_package(fastest)
+            for package, own_us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+                print(f"  {package:<28}{own_us / 1e3:>7.1f}ms")
+            heavy = [package for package in HEAVY_PACKAGES if package in packages]
+            if heavy:
+                print(f"  imports heavy packages it does not need to serve: {', '.join(heavy)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Load-tests the micro-batching inference worker: many threads classify messages of the ticket archive at once, like
+the bot's threads do when it is busy, while the worker batches them up to different maximum batch sizes.
+Reports the p50 and p99 latency of a classification, the messages classified per second and the average batch size.
+--model is a transformer saved by src.parsing.transformer_classifier, which needs torch. Without it, the tf-idf model
+of src.parsing.learned_classifier is trained on the archive and served instead, which is cheap enough per message
+that the numbers mostly show the overhead of the worker.
+
+run with `python -m benchmarks.micro_batching_benchmark`
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from src.parsing.learned_classifier import read_labeled_tickets, train
+from src.parsing.micro_batching import MicroBatchingClassifier
+from benchmarks.ticket_archive import TICKET_ARCHIVE_PATH
+
+
+def _load_model(model_directory: str, threads: int, quantize: bool):
+    """:returns the batch prediction and the warm up of the model to serve."""
+    if model_directory is None:
+        classifier = train(*read_labeled_tickets(TICKET_ARCHIVE_PATH))
+        return classifier.classify_batch, None
+    from src.parsing.transformer_classifier import TransformerClassifier
+    transformer = TransformerClassifier.load(model_directory, quantize=quantize, threads=threads)
+    return transformer.predict_batch, transformer.warm_up
+
+
+def run_load(classifier: MicroBatchingClassifier, texts, clients: int, messages_per_client: int) -> dict:
+    """has every client classify its messages one after the other, all clients at once."""
+    latencies = [[] for _ in range(clients)]
+
+    def client(index: int):
+        for i in range(messages_per_client):
+            text = texts[(index * messages_per_client + i) % len(texts)]
+            start = time.perf_counter()
+            classifier.classify(text)
+            latencies[index].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    all_latencies = sorted(latency for client_latencies in latencies for latency in client_latencies)
+    return {
+        'p50_ms': statistics.median(all_latencies) * 1e3,
+        'p99_ms': all_latencies[int(len(all_latencies) * .99)] * 1e3,
+        'messages_per_second': len(all_latencies) / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--model', help='the directory of a fine-tuned transformer')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    parser.add_argument('--max-wait-ms', type=float, default=5.)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--messages', type=int, default=20, help='how many messages every client classifies')
+    parser.add_argument('--threads', type=int, default=None, help='how many threads torch runs an inference on')
+    parser.add_argument('--no-quantize', action='store_true', help='serve the transformer in float32')
+    args = parser.parse_args()
+
+    predict_batch, warm_up = _load_model(args.model, args.threads, not args.no_quantize)
+    texts, _ = read_labeled_tickets(TICKET_ARCHIVE_PATH)
+    print(f"{args.clients} clients classifying {args.messages} messages each, "
+          f"waiting up to {args.max_wait_ms}ms for a batch to fill")
+    for max_batch_size in args.batch_sizes:
+        classifier = MicroBatchingClassifier(predict_batch, max_batch_size, args.max_wait_ms / 1e3, warm_up)
+        classifier.classify(texts[0])
+        result = run_load(classifier, texts, args.clients, args.messages)
+        average_batch_size = classifier.average_batch_size
+        classifier.close()
+        print(
+            f"max batch {max_batch_size:>3}: p50 {result['p50_ms']:7.2f}ms, p99 {result['p99_ms']:7.2f}ms, "
+            f"{result['messages_per_second']:8.0f} messages per second, average batch {average_batch_size:.1f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Measures what a parsed request costs: the memory every request object takes on top of its field values,
+and how long merging a partial request with the reply completing it takes.
+
+run with `python -m benchmarks.request_model_benchmark`
+"""
+import argparse
+import timeit
+import tracemalloc
+
+from src.parsing.regex_classifier import attempt_to_classify, construct_according_to_classification
+from src.parsing.requests import UnIdentifiedUserRequest
+from benchmarks.ticket_archive import load_ticket_details
+
+
+def _field_values(request) -> list:
+    return [getattr(request, name) for name in request._field_details]
+
+
+def _bytes_per_request(requests, copies: int) -> float:
+    """rebuilds the requests from their existing field values, so that only the request objects are counted."""
+    blueprints = [(type(r), _field_values(r)) for r in requests] * copies
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    rebuilt = [cls(*values) for cls, values in blueprints]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (after - before) / len(rebuilt)
+
+
+def _partial_and_completing(request):
+    """splits a request into one with only its first field and one with all the rest."""
+    values = _field_values(request)
+    partial = type(request)(*values[:1], *[None] * (len(values) - 1))
+    completing = type(request)(None, *values[1:])
+    return partial, completing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--copies', type=int, default=10, help='how many times to replicate the archive')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    requests = [construct_according_to_classification(attempt_to_classify(t), t) for t in load_ticket_details()]
+    requests = [r for r in requests if not isinstance(r, UnIdentifiedUserRequest)]
+
+    print(f"memory per request object: {_bytes_per_request(requests, args.copies):.0f} bytes")
+
+    pairs = [_partial_and_completing(r) for r in requests]
+    for request, (partial, completing) in zip(requests, pairs):
+        if partial.merge_with(completing) != request:
+            raise AssertionError(f"merging the parts of {request.pretty_print_content()} did not give it back")
+    merges = min(timeit.repeat(lambda: [p.merge_with(c) for p, c in pairs], number=1, repeat=args.repeats))
+    print(f"merge latency: {1e6 * merges / len(pairs):.2f}us per merge")
+
+
+if __name__ == '__main__':
+    main()
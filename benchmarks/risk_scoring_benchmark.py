@@ -0,0 +1,56 @@
+"""
+Compares re-scoring the whole ticket archive request by request with the columnar scorer.
+Parsing happens once up front, since re-scoring after a threshold change does not need to parse again.
+
+run with `python -m benchmarks.risk_scoring_benchmark`
+"""
+import argparse
+import timeit
+
+from src.columnar_security_estimator import calculate_security_risks, decide_on_follow_ups, requests_to_frame
+from src.message_evaluation import DEFAULT_SECURITY_RISK_THRESHOLD, decide_on_follow_up
+from src.parsing.regex_classifier import attempt_to_classify, construct_according_to_classification
+from src.security_estimator import calculate_security_risk
+from benchmarks.ticket_archive import load_ticket_details
+
+
+def _rescore_one_by_one(requests, threshold):
+    return [decide_on_follow_up(r, calculate_security_risk(r), threshold) for r in requests]
+
+
+def _rescore_columns(frame, threshold):
+    return decide_on_follow_ups(frame, calculate_security_risks(frame), threshold)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--archive-copies', type=int, default=10, help='how many times to replicate the archive')
+    args = parser.parse_args()
+
+    texts = load_ticket_details() * args.archive_copies
+    requests = [construct_according_to_classification(attempt_to_classify(t), t) for t in texts]
+    frame = requests_to_frame(requests)
+
+    if [calculate_security_risk(r) for r in requests] != calculate_security_risks(frame).tolist():
+        raise AssertionError('the columnar scorer disagrees with calculate_security_risk')
+
+    threshold = DEFAULT_SECURITY_RISK_THRESHOLD
+    one_by_one = _best_time(lambda: _rescore_one_by_one(requests, threshold), args.repeats)
+    columnar = _best_time(lambda: _rescore_columns(frame, threshold), args.repeats)
+    print(
+        f"re-scoring {len(requests)} requests: one by one {one_by_one:.2f}ms, "
+        f"columnar {columnar:.2f}ms, speedup x{one_by_one / columnar:.2f}"
+    )
+    risks = calculate_security_risks(frame)
+    threshold_change = _best_time(lambda: decide_on_follow_ups(frame, risks, threshold - 10), args.repeats)
+    print(f"deciding again after a threshold change, with the risks at hand: {threshold_change:.2f}ms")
+
+
+def _best_time(job, repeats: int) -> float:
+    """:returns the fastest time in milliseconds it took to do the job."""
+    return min(timeit.repeat(job, number=1, repeat=repeats)) * 1e3
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Load-tests bot_main as it is served in production and in development: it starts the server in every configuration
+in turn, posts signed fake slack deliveries at it (/classify commands and thread replies) and reports how many
+requests per second each configuration answers, and how fast. the bot talks to a local fake of slack's web api.
+
+run with `python -m benchmarks.server_load_benchmark`
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from urllib.parse import urlencode
+
+from aiohttp import ClientSession
+from slack_sdk.signature import SignatureVerifier
+
+from benchmarks.async_load_benchmark import FAKE_SIGNING_SECRET, FAKE_TOKEN, FakeSlackApi
+from benchmarks.ticket_archive import load_ticket_details
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUNICORN_CONFIG = os.path.join(REPO_ROOT, 'gunicorn.conf.py')
+
+CONFIGURATIONS = {
+    'flask dev server': ([sys.executable, os.path.join(REPO_ROOT, 'bot_main.py')], {}),
+    'gunicorn 1x1': (
+        [sys.executable, '-m', 'gunicorn', '-c', GUNICORN_CONFIG, 'bot_main:app'],
+        {'HYPER_VYPER_WEB_WORKERS': '1', 'HYPER_VYPER_WEB_THREADS': '1'},
+    ),
+    'gunicorn 1x8': (
+        [sys.executable, '-m', 'gunicorn', '-c', GUNICORN_CONFIG, 'bot_main:app'],
+        {'HYPER_VYPER_WEB_WORKERS': '1', 'HYPER_VYPER_WEB_THREADS': '8'},
+    ),
+    'gunicorn 4x8': (
+        [sys.executable, '-m', 'gunicorn', '-c', GUNICORN_CONFIG, 'bot_main:app'],
+        {'HYPER_VYPER_WEB_WORKERS': '4', 'HYPER_VYPER_WEB_THREADS': '8'},
+    ),
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout_seconds: float = 30.) -> None:
+    deadline = time.monotonic() + timeout_seconds
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=.5).close()
+            return
+        except OSError:
+            time.sleep(.1)
+    raise TimeoutError(f"the server did not listen on port {port} within {timeout_seconds:.0f}s")
+
+
+def _deliveries(texts):
+    """:returns (content type, body) of every delivery, alternating /classify commands with thread replies."""
+    for i, text in enumerate(texts):
+        if i % 2 == 0:
+            yield 'application/x-www-form-urlencoded', urlencode({
+                'command': '/classify', 'text': text, 'user_id': 'U1', 'team_id': 'T1',
+                'channel_id': f"C{i % 10}", 'channel_name': 'load-test',
+            })
+        else:
+            yield 'application/json', json.dumps({
+                'type': 'event_callback', 'team_id': 'T1', 'api_app_id': 'A1', 'event_id': f"Ev{uuid.uuid4().hex}",
+                'event': {
+                    'type': 'message', 'text': text, 'user': 'U2', 'channel': f"C{i % 10}",
+                    'ts': f"{time.time():.6f}", 'thread_ts': '1700000000.000100', 'client_msg_id': str(uuid.uuid4()),
+                },
+            })
+
+
+async def _post_all(events_url: str, deliveries, concurrency: int) -> list:
+    verifier = SignatureVerifier(FAKE_SIGNING_SECRET)
+    in_flight = asyncio.Semaphore(concurrency)
+
+    async def post(session: ClientSession, content_type: str, body: str) -> float:
+        async with in_flight:
+            timestamp = str(int(time.time()))
+            headers = {
+                'Content-Type': content_type,
+                'X-Slack-Request-Timestamp': timestamp,
+                'X-Slack-Signature': verifier.generate_signature(timestamp=timestamp, body=body),
+            }
+            start = time.perf_counter()
+            async with session.post(events_url, data=body, headers=headers) as response:
+                await response.read()
+                if response.status != 200:
+                    raise AssertionError(f"the server answered with {response.status}")
+            return time.perf_counter() - start
+
+    async with ClientSession() as session:
+        return await asyncio.gather(*(post(session, content_type, body) for content_type, body in deliveries))
+
+
+def _run_configuration(name: str, args, slack_api: FakeSlackApi, texts) -> None:
+    command, configuration_env = CONFIGURATIONS[name]
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as work_dir:
+        env = dict(
+            os.environ, PYTHONPATH=REPO_ROOT, PORT=str(port), SLACK_API_URL=slack_api.base_url,
+            SLACK_BOT_API_TOKEN=FAKE_TOKEN, SLACK_BOT_SIGNING_SECRET=FAKE_SIGNING_SECRET, **configuration_env
+        )
+        # the server keeps its audit log and conversation database in the work dir, and its output in a file there.
+        with open(os.path.join(work_dir, 'server.log'), 'w') as server_log:
+            server = subprocess.Popen(command, cwd=work_dir, env=env, stdout=server_log, stderr=subprocess.STDOUT)
+            try:
+                _wait_for_port(port)
+                events_url = f"http://127.0.0.1:{port}/hyper-vyper/events"
+                # warms up bolt, which asks slack who it is on its first request.
+                asyncio.run(_post_all(events_url, list(_deliveries(texts[:4])), 4))
+                start = time.perf_counter()
+                latencies = sorted(asyncio.run(_post_all(events_url, list(_deliveries(texts)), args.concurrency)))
+                elapsed = time.perf_counter() - start
+            finally:
+                server.terminate()
+                server.wait(timeout=60)
+    p50, p99 = latencies[len(latencies) // 2], latencies[int(len(latencies) * .99)]
+    print(
+        f"{name:<18}{len(latencies) / elapsed:>7.0f} requests/s, "
+        f"p50 {1e3 * p50:.1f}ms, p99 {1e3 * p99:.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=32, help='requests in flight at once')
+    parser.add_argument('--latency-ms', type=float, default=50., help='how long the fake slack api takes to answer')
+    parser.add_argument('--configurations', nargs='+', default=list(CONFIGURATIONS), choices=list(CONFIGURATIONS))
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    texts = (load_ticket_details() * (args.requests // 1000 + 1))[:args.requests]
+    with FakeSlackApi(args.latency_ms / 1e3) as slack_api:
+        for name in args.configurations:
+            _run_configuration(name, args, slack_api, texts)
+
+
+if __name__ == '__main__':
+    main()
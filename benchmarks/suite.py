@@ -0,0 +1,200 @@
+"""
+Measures the parsing and policy hot paths over the whole ticket archive, writes the results as json and compares them
+with a stored baseline, failing when any of them got slower than the baseline by more than the tolerance.
+
+the benchmarks:
+- classification and extraction of every message in the archive
+- merging a reply into the request pending in its thread, through fix_previously_submitted_request
+- risk scoring of every request parsed from the archive
+- classify_and_respond for every message in the archive, with a fake slack client
+- the cold start imports of bot_main and of the policy, each in a fresh interpreter
+
+timings are only comparable on the same machine, so the baseline should be saved where the comparison runs:
+`python -m benchmarks.suite --save-baseline` stores benchmarks/baseline.json, after which
+`python -m benchmarks.suite` compares against it and exits with 1 on a regression.
+
+run with `python -m benchmarks.suite`
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import timeit
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+from src import bot_policy
+from src.bot_policy import classify_and_respond, fix_previously_submitted_request
+from src.message_evaluation import decide_on_follow_up, evaluation_cache
+from src.parsing.constants import RequestFollowUp
+from src.parsing.regex_classifier import attempt_to_classify, construct_according_to_classification
+from src.security_estimator import calculate_security_risk
+from src.state.conversation_store import InMemoryConversationStore
+from benchmarks.async_load_benchmark import FakeSlackApi
+from benchmarks.import_time_benchmark import cumulative_import_us
+from benchmarks.ticket_archive import load_ticket_details
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_TOLERANCE = .2
+# a reply that fills the fields most requests leave out.
+COMPLETING_REPLY = 'it is for 30 days, on port 443 to 10.1.2.3, because the release needs it. the data is not PII.'
+
+
+class _FakeSlackClient(object):
+    """answers the calls the policy makes, without the cost of a MagicMock recording them."""
+
+    def __init__(self):
+        self._ts = 0
+
+    def chat_postMessage(self, **kwargs) -> dict:
+        self._ts += 1
+        return {'ok': True, 'ts': f"{self._ts}.000000"}
+
+
+@contextmanager
+def _isolated_policy():
+    """keeps the benchmarks off the audit log and off the conversations of whoever imported the policy."""
+    log, store = bot_policy.decision_logger.log, bot_policy.conversation_store
+    bot_policy.decision_logger.log = lambda decision: None
+    bot_policy.conversation_store = InMemoryConversationStore(capacity=100000)
+    try:
+        yield
+    finally:
+        bot_policy.decision_logger.log, bot_policy.conversation_store = log, store
+
+
+def _classify_and_extract(texts) -> Callable[[], None]:
+    def run():
+        for text in texts:
+            construct_according_to_classification(attempt_to_classify(text), text)
+    return run
+
+
+def _merge_replies(partial_requests) -> Callable[[], None]:
+    client, say = _FakeSlackClient(), (lambda **kwargs: None)
+    message = {'text': COMPLETING_REPLY, 'channel': 'C1'}
+
+    def run():
+        for thread_ts, request in enumerate(partial_requests):
+            bot_policy.conversation_store.put(thread_ts, request)
+        for thread_ts in range(len(partial_requests)):
+            fix_previously_submitted_request(message, say, thread_ts, 'U1', client)
+    return run
+
+
+def _score_risks(requests) -> Callable[[], None]:
+    def run():
+        for request in requests:
+            calculate_security_risk(request)
+    return run
+
+
+def _classify_and_respond(texts) -> Callable[[], None]:
+    client = _FakeSlackClient()
+    payloads = [{'text': text, 'channel_name': 'benchmark'} for text in texts]
+
+    def run():
+        # every pass starts cold, as the archive is mostly texts the bot sees once.
+        evaluation_cache.clear()
+        for payload in payloads:
+            classify_and_respond(payload, client)
+    return run
+
+
+def _measure(run: Callable[[], None], operations: int, repeats: int) -> dict:
+    run()  # warms up the caches of compiled patterns and rendered blocks, like a long running bot has them.
+    timings = [seconds / operations * 1e6 for seconds in timeit.repeat(run, number=1, repeat=repeats)]
+    return {
+        'operations': operations,
+        'repeats': repeats,
+        'best_us': min(timings),
+        'median_us': statistics.median(timings),
+    }
+
+
+def _measure_import(module: str, slack_api_url: str, repeats: int) -> dict:
+    timings = [cumulative_import_us(module, slack_api_url) for _ in range(repeats)]
+    return {'operations': 1, 'repeats': repeats, 'best_us': min(timings), 'median_us': statistics.median(timings)}
+
+
+def run_suite(repeats: int) -> Dict[str, dict]:
+    """:returns the results of every benchmark, by name, with the best and median time of an operation."""
+    texts = load_ticket_details()
+    requests = [construct_according_to_classification(attempt_to_classify(t), t) for t in texts]
+    partial_requests = [
+        r for r in requests
+        if decide_on_follow_up(r, calculate_security_risk(r), bot_policy.security_risk_threshold)
+        is RequestFollowUp.REQUEST_FURTHER_DETAILS
+    ]
+    benchmarks = {
+        'classify_and_extract': (_classify_and_extract(texts), len(texts)),
+        'merge_thread_reply': (_merge_replies(partial_requests), len(partial_requests)),
+        'score_risk': (_score_risks(requests), len(requests)),
+        'classify_and_respond': (_classify_and_respond(texts), len(texts)),
+    }
+    with _isolated_policy():
+        results = {name: _measure(run, operations, repeats) for name, (run, operations) in benchmarks.items()}
+    with FakeSlackApi(0) as slack_api:
+        for module in ['bot_main', 'src.bot_policy']:
+            results[f"import {module}"] = _measure_import(module, slack_api.base_url, repeats)
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """:returns a description of every benchmark slower than its baseline by more than the tolerance."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result['best_us'] / baseline[name]['best_us']
+        if ratio > 1 + tolerance:
+            regressions.append(
+                f"{name}: {result['best_us']:.2f}us per operation, {ratio - 1:.0%} slower than the baseline's "
+                f"{baseline[name]['best_us']:.2f}us"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--output', help='where to write the results as json')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='the results to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='how much slower is a regression')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    results = run_suite(args.repeats)
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'benchmarks': results,
+    }
+    for name, result in results.items():
+        print(f"{name:<24}{result['best_us']:>9.2f}us per operation (median {result['median_us']:.2f}us)")
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(report, file, indent=2)
+        return
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}, store one with --save-baseline")
+        return
+    with open(args.baseline) as file:
+        regressions = compare(results, json.load(file)['benchmarks'], args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+    print(f"no benchmark is more than {args.tolerance:.0%} slower than the baseline")
+
+
+if __name__ == '__main__':
+    main()
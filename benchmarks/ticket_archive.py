@@ -0,0 +1,20 @@
+"""Loads the historical ticket archive that the benchmarks replay against the bot."""
+import csv
+import os
+from typing import List
+
+TICKET_ARCHIVE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'resources', 'acme_security_tickets.csv'
+)
+
+
+def load_ticket_rows(path: str = TICKET_ARCHIVE_PATH) -> List[dict]:
+    """:returns every ticket in the archive as a dictionary of its columns."""
+    with open(path, newline='', encoding='utf-8') as file:
+        return list(csv.DictReader(file))
+
+
+def load_ticket_details(path: str = TICKET_ARCHIVE_PATH) -> List[str]:
+    """:returns the free text details of every ticket in the archive, in order."""
+    return [row['details'] for row in load_ticket_rows(path)]
@@ -1,16 +1,22 @@
 import logging
 import os
 
-from cachetools import TTLCache
-from flask import Flask, request
-from slack_bolt import App, Say
+from flask import Flask, Response, request
+from slack_bolt import App, BoltRequest, BoltResponse, Say
 from slack_bolt.adapter.flask import SlackRequestHandler
 from slack_sdk import WebClient
 
-from src.bot_policy import handle_message, help_command, classify_and_respond
+from src import instrumentation
+from src.bot_policy import (
+    handle_message, help_command, classify_and_respond, overloaded_command_reply, seen_deliveries
+)
 from src.conversational_user_interfaces.professional import Professional
+from src.slack_client import PooledWebClient
+from src.state.delivery_deduplication import retry_number
+from src.work_queue import work_queue_from_environment
 
-logging.basicConfig(level=logging.DEBUG)
+# HYPER_VYPER_LOG_LEVEL=DEBUG logs every payload, which costs time on every message.
+logging.basicConfig(level=os.environ.get('HYPER_VYPER_LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
@@ -19,10 +25,30 @@ bot_signature = os.environ.get("SLACK_BOT_SIGNING_SECRET")
 if None in [bot_token, bot_signature]:
     raise ValueError("Bot Token and Bot Signing Secret must be set")
 
-bolt_app = App(token=bot_token, signing_secret=bot_signature)
+# SLACK_API_URL points the bot at another slack api, like the fake one the load tests run against.
+# every worker process gunicorn runs, see gunicorn.conf, gets an equal share of slack's rate limits.
+bolt_app = App(
+    signing_secret=bot_signature,
+    client=PooledWebClient(
+        token=bot_token, base_url=os.environ.get('SLACK_API_URL', WebClient.BASE_URL),
+        rate_limit_share=1 / int(os.environ.get('HYPER_VYPER_WEB_WORKERS', 1))
+    ),
+)
+# commands are acked as soon as they are queued, and classified by the queue's consumers in their order per channel.
+classify_queue = work_queue_from_environment(lambda work: classify_and_respond(*work), name='classify-queue')
 attitude = Professional()
 
-requests_map = TTLCache(maxsize=100, ttl=3600)
+_event_intake_time = instrumentation.histogram(
+    'event_intake', 'Time taken to answer a delivery from slack, which is acked before it is handled.'
+)
+instrumentation.observe_gauge('classify_queue_depth', 'Commands waiting to be classified.',
+                              lambda: classify_queue.depth)
+instrumentation.observe_counter('classify_queue_rejections', 'Commands refused since the queue was full.',
+                                lambda: classify_queue.rejected)
+instrumentation.observe_counter('slack_rate_limited_calls', 'Calls slack answered with a rate limit.',
+                                lambda: bolt_app.client.rate_limited_calls)
+instrumentation.observe_counter('slack_rate_limit_wait_seconds', 'Time calls to slack waited for their turn.',
+                                lambda: bolt_app.client.waited_seconds)
 
 
 @app.route("/hyper-vyper/events", methods=["POST"])
@@ -32,7 +58,27 @@ def slack_events():
     # slack_event = request.json
     # logger.info(slack_event)
     # logger.info(f"recieved event via message: {slack_event['event']['text']}")
-    return handler.handle(request)
+    with _event_intake_time.time():
+        return handler.handle(request)
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """ Exposes the bot's timings and counters to prometheus """
+    return Response(instrumentation.render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+@bolt_app.middleware
+def skip_duplicate_deliveries(body: dict, request: BoltRequest, next):
+    """
+    slack re-delivers an event when it is not answered within 3 seconds. the deliveries already seen are answered
+    right away, without handling them again. this runs after bolt verified the request's signature, so that forged
+    requests cannot make us skip real events.
+    """
+    if seen_deliveries.is_duplicate(body, retry_number(request.headers)):
+        logger.info(f"Skipped a duplicate delivery of event {body.get('event_id')}")
+        return BoltResponse(status=200, body="")
+    next()
 
 
 @bolt_app.message()
@@ -53,12 +99,17 @@ def display_help(say, ack):
 @bolt_app.command("/classify")
 def forward_command_to_classification(payload, ack, client):
     """This initiates a conversation about a security request."""
-    ack()
-    classify_and_respond(payload, client)
+    if classify_queue.submit(payload.get('channel_id', payload.get('channel_name')), (payload, client)):
+        ack()
+    else:
+        ack(blocks=overloaded_command_reply())
 
 
 handler = SlackRequestHandler(bolt_app)
 
 if __name__ == '__main__':
-    # Creating an instance of the Webclient class
-    app.run(host='0.0.0.0', port=8080, debug=True)
+    # flask's own server is for development only, production runs under gunicorn, see gunicorn.conf.py.
+    app.run(
+        host='0.0.0.0', port=int(os.environ.get('PORT', 8080)),
+        debug=os.environ.get('HYPER_VYPER_DEBUG', '').lower() in ['1', 'true', 'yes']
+    )
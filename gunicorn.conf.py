@@ -0,0 +1,38 @@
+"""
+Runs bot_main in production, with `gunicorn bot_main:app` (gunicorn picks this file up by itself).
+The app is imported once, before the workers are forked, so the classifier's compiled patterns and the registered
+rules are shared by all of them. Every worker serves several requests at once on its own threads.
+Sending the master a HUP gracefully replaces the workers, letting each finish the requests it is in the middle of.
+
+HYPER_VYPER_WEB_WORKERS and HYPER_VYPER_WEB_THREADS size the server, and PORT is the port it listens on.
+Workers do not share memory, so a thread started on one of them has to be found by another through state they all
+share: with more than one worker, HYPER_VYPER_CONVERSATION_DB defaults to a sqlite database, which keeps the pending
+conversations, the events already delivered, so that a retry sent to another worker is not handled twice, and the
+threads known to be started by the bot or by someone else.
+The rest is still kept by every worker for itself:
+- slack's rate limits are per app, so every worker paces its calls to 1/workers of them. a worker whose share is used
+  up waits, even if the others are idle.
+- commands are classified in the order they came per channel only within a worker, so two commands sent to a channel
+  in quick succession and taken by different workers may be answered out of order.
+- /metrics shows the counters and timings of whichever worker answered it.
+When any of these matter more than using more cores, run a single worker with more threads.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+workers = int(os.environ.get('HYPER_VYPER_WEB_WORKERS', min(2 * multiprocessing.cpu_count() + 1, 8)))
+threads = int(os.environ.get('HYPER_VYPER_WEB_THREADS', 8))
+worker_class = 'gthread'
+preload_app = True
+# slack gives up on an ack after 3 seconds, so a worker stuck for much longer than that is better replaced.
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+accesslog = '-'
+
+# read by bot_main to give every worker its share of slack's rate limits.
+os.environ['HYPER_VYPER_WEB_WORKERS'] = str(workers)
+if workers > 1:
+    os.environ.setdefault('HYPER_VYPER_CONVERSATION_DB', 'state/conversations.sqlite')
+    os.makedirs(os.path.dirname(os.environ['HYPER_VYPER_CONVERSATION_DB']) or '.', exist_ok=True)
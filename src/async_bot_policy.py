@@ -0,0 +1,107 @@
+"""
+The asyncio twin of bot_policy, for running the bot on slack_bolt's AsyncApp.
+Every slack round trip is awaited instead of holding a worker thread, while the classification itself and all
+the conversation state (pending requests, attitude, threshold and audit log) are shared with bot_policy.
+That shared code blocks: classifying may wait on the fallback model, and the conversation store and the thread index
+may wait on their sqlite database. It is run with asyncio.to_thread, so that one message never stalls the event loop
+for every other. only the audit log is written to directly, since logging a decision only puts it on a queue.
+"""
+import asyncio
+import logging
+
+from slack_bolt.context.say.async_say import AsyncSay
+from slack_sdk.web.async_client import AsyncWebClient
+
+from src import bot_policy
+from src.auditing.bot_decision import BotDecisionResponse
+from src.bot_policy import (
+    generate_irrelevant_response, _complete_thread_request, _evaluate_new_request, _remember_thread_root,
+    _open_thread_for_request, _pending_request_of, _thread_closed_text
+)
+
+flow_logger = logging.getLogger(__name__)
+
+
+async def handle_message(message: dict, client: AsyncWebClient, say: AsyncSay, context) -> BotDecisionResponse:
+    """
+    Handles all incoming messages and checks if they are replies
+    to the bot's own messages within a thread.
+
+    Generic messages are ignored.
+    Replies to existing threads are treated as a chance to fix partial security requests.
+    """
+    flow_logger.info(f"Received message: {message}")
+
+    if 'thread_ts' in message and message['thread_ts'] != message['ts']:
+        thread_root_ts = message['thread_ts']
+        flow_logger.info(f"Message is a thread reply. Thread TS: {thread_root_ts}")
+
+        try:
+            if await _is_thread_ours(client, context, message['channel'], thread_root_ts):
+                return await fix_previously_submitted_request(
+                    message, say, thread_root_ts, message['user'], client
+                )
+
+        except Exception as e:
+            flow_logger.error(f"Error fetching thread history: {e}")
+
+    return generate_irrelevant_response(message['text'])
+
+
+async def fix_previously_submitted_request(message, say, thread_root_ts, user_id, client) -> BotDecisionResponse:
+    user_message = message['text']
+    flow_logger.info(
+        f"User '{user_id}' replied to our bot's message in thread: '{user_message}'"
+    )
+    thread_request = await asyncio.to_thread(_pending_request_of, thread_root_ts)
+
+    if thread_request is not None:
+        bot_response = await asyncio.to_thread(_complete_thread_request, message, thread_request, thread_root_ts)
+        await client.chat_postMessage(
+            channel=message['channel'],
+            thread_ts=thread_root_ts,
+            blocks=bot_response.response_in_chat,
+            text='hyper vyper has processed your request'
+        )
+        bot_policy.decision_logger.log(bot_response.bot_decision)
+        return bot_response
+    else:
+        await say(text=_thread_closed_text(user_id), thread_ts=thread_root_ts)
+        return generate_irrelevant_response(user_message)
+
+
+async def _is_thread_ours(client: AsyncWebClient, context, channel_id, thread_root_ts) -> bool:
+    """looks the thread up in our own index of bot threads, and only asks slack about threads it does not know."""
+    is_ours = await asyncio.to_thread(bot_policy.bot_threads.is_ours, thread_root_ts)
+    if is_ours is not None:
+        return is_ours
+    result = await client.conversations_history(
+        channel=channel_id,
+        latest=thread_root_ts,
+        inclusive=True,
+        limit=1
+    )
+    return await asyncio.to_thread(_remember_thread_root, result, context, thread_root_ts)
+
+
+async def help_command(say):
+    """returns the help output to the user"""
+    await say(blocks=[bot_policy.attitude.generate_help_block()])
+
+
+async def classify_and_respond(payload, client: AsyncWebClient) -> BotDecisionResponse:
+    """This initiates a conversation about a security request."""
+    bot_response = await asyncio.to_thread(_evaluate_new_request, payload)
+    try:
+        response_data = await client.chat_postMessage(
+            channel=payload.get('channel_name'),
+            blocks=bot_response.response_in_chat,
+            text='hyper vyper has processed your request'
+        )
+        await asyncio.to_thread(_open_thread_for_request, bot_response, response_data['ts'])
+    except Exception as e:
+        flow_logger.exception(e)
+        flow_logger.error(bot_response.response_in_chat)
+        flow_logger.error('Failed to respond to user')
+    bot_policy.decision_logger.log(bot_response.bot_decision)
+    return bot_response
@@ -0,0 +1,119 @@
+"""
+Rolls the json lines of the audit log into a parquet dataset partitioned by the day of the decision.
+Compaction is incremental: the dataset remembers how far into the log it got, so the job can run periodically
+while the bot keeps appending to the same log, and every run only reads the lines appended since the last one.
+
+run with `python -m src.auditing.audit_compaction logs/audit.log logs/audit`
+"""
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from src.auditing.audit_records import parse_records
+
+DATE_PARTITION = 'date'
+UNKNOWN_DATE = 'unknown'
+_CHECKPOINT_FILE = '_compaction_checkpoint.json'
+
+AUDIT_PARQUET_SCHEMA = pa.schema([
+    ('schema_version', pa.int32()),
+    ('ticket_id', pa.string()),
+    ('created_at', pa.timestamp('us', tz='UTC')),
+    ('request_type', pa.string()),
+    ('request_summary', pa.string()),
+    ('details', pa.string()),
+    ('mandatory_fields', pa.list_(pa.string())),
+    ('fields_provided', pa.list_(pa.string())),
+    ('outcome', pa.string()),
+    ('security_risk', pa.float64()),
+    (DATE_PARTITION, pa.string()),
+])
+AUDIT_PARTITIONING = ds.partitioning(pa.schema([(DATE_PARTITION, pa.string())]), flavor='hive')
+
+
+def compact_audit_log(log_path: str, dataset_dir: str) -> int:
+    """
+    appends the records logged since the last compaction to the dataset.
+    a log which shrank since then is taken to be a new log, and is read from its start.
+    :returns the number of records compacted.
+    """
+    checkpoint = _read_checkpoint(dataset_dir)
+    log_key = os.path.abspath(log_path)
+    start_offset = checkpoint.get(log_key, 0)
+    if os.path.getsize(log_path) < start_offset:
+        start_offset = 0
+
+    with open(log_path, 'rb') as file:
+        file.seek(start_offset)
+        appended = file.read()
+    # the last line may still be in the middle of being written, so it is left for the next run.
+    complete_length = appended.rfind(b'\n') + 1
+    lines = appended[:complete_length].decode('utf-8').splitlines()
+    records = list(parse_records(line for line in lines if line.strip()))
+
+    if records:
+        # the files are named after where in the log they start, so a run which fails before its checkpoint is
+        # saved gets overwritten by the next run instead of duplicating records.
+        ds.write_dataset(
+            _records_to_table(records), dataset_dir, format='parquet', partitioning=AUDIT_PARTITIONING,
+            basename_template=f"part-{os.path.basename(log_path)}-{start_offset}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore',
+        )
+    checkpoint[log_key] = start_offset + complete_length
+    _write_checkpoint(dataset_dir, checkpoint)
+    return len(records)
+
+
+def open_audit_dataset(dataset_dir: str) -> ds.Dataset:
+    """the checkpoint is left out of the dataset, as pyarrow ignores files whose name starts with an underscore."""
+    return ds.dataset(
+        dataset_dir, format='parquet', schema=AUDIT_PARQUET_SCHEMA, partitioning=AUDIT_PARTITIONING
+    )
+
+
+def _records_to_table(records) -> pa.Table:
+    created_at = [_as_utc(datetime.fromisoformat(r['created_at'])) if r.get('created_at') else None for r in records]
+    columns = {
+        name: [r.get(name) for r in records]
+        for name in AUDIT_PARQUET_SCHEMA.names if name not in ['created_at', DATE_PARTITION]
+    }
+    columns['created_at'] = created_at
+    columns[DATE_PARTITION] = [t.date().isoformat() if t is not None else UNKNOWN_DATE for t in created_at]
+    return pa.Table.from_pydict(columns, schema=AUDIT_PARQUET_SCHEMA)
+
+
+def _as_utc(time: datetime) -> datetime:
+    """decisions are timed in utc, so a time without a timezone is taken to be in utc as well."""
+    return time.astimezone(timezone.utc) if time.tzinfo is not None else time.replace(tzinfo=timezone.utc)
+
+
+def _read_checkpoint(dataset_dir: str) -> dict:
+    try:
+        with open(os.path.join(dataset_dir, _CHECKPOINT_FILE)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def _write_checkpoint(dataset_dir: str, checkpoint: dict) -> None:
+    os.makedirs(dataset_dir, exist_ok=True)
+    temporary_path = os.path.join(dataset_dir, _CHECKPOINT_FILE + '.tmp')
+    with open(temporary_path, 'w') as file:
+        json.dump(checkpoint, file)
+    os.replace(temporary_path, os.path.join(dataset_dir, _CHECKPOINT_FILE))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rolls an audit log into a parquet dataset partitioned by day.')
+    parser.add_argument('log_path')
+    parser.add_argument('dataset_dir')
+    args = parser.parse_args()
+    print(f"compacted {compact_audit_log(args.log_path, args.dataset_dir)} records into {args.dataset_dir}")
+
+
+if __name__ == '__main__':
+    main()
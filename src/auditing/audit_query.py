@@ -0,0 +1,55 @@
+"""
+Answers questions about the bot's decisions out of the compacted audit dataset, e.g. the reject rate by request type
+over the last week. Only the days asked about are read, and only the columns needed to answer.
+
+run with `python -m src.auditing.audit_query logs/audit --days 7 --by request_type`
+"""
+import argparse
+from datetime import date, datetime, timedelta, timezone
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from src.auditing.audit_compaction import DATE_PARTITION, open_audit_dataset
+from src.parsing.constants import RequestFollowUp
+
+DECISIONS_COLUMN = 'decisions'
+
+
+def outcome_rates(dataset_dir: str, since: date, until: date, by: list) -> pd.DataFrame:
+    """
+    :returns the number of decisions taken from since to until (inclusive) in every group,
+    and the share of every outcome among them.
+    """
+    dataset = open_audit_dataset(dataset_dir)
+    in_range = (ds.field(DATE_PARTITION) >= since.isoformat()) & (ds.field(DATE_PARTITION) <= until.isoformat())
+    decisions = dataset.to_table(columns=by + ['outcome'], filter=in_range).to_pandas()
+
+    outcomes = [f.value for f in RequestFollowUp]
+    if decisions.empty:
+        return pd.DataFrame(columns=[DECISIONS_COLUMN] + outcomes)
+    rates = pd.crosstab([decisions[column] for column in by], decisions['outcome'], normalize='index')
+    rates = rates.reindex(columns=outcomes, fill_value=0.)
+    rates.insert(0, DECISIONS_COLUMN, decisions.groupby(by).size())
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('dataset_dir')
+    parser.add_argument('--days', type=int, default=7, help='how many days back to look, today included')
+    parser.add_argument(
+        '--until', type=date.fromisoformat, default=datetime.now(timezone.utc).date(),
+        help='the last day, yyyy-mm-dd, in utc like the decisions'
+    )
+    parser.add_argument('--by', nargs='+', default=['request_type'], help='the columns to group decisions by')
+    args = parser.parse_args()
+
+    since = args.until - timedelta(days=args.days - 1)
+    rates = outcome_rates(args.dataset_dir, since, args.until, args.by)
+    print(f"decisions from {since} to {args.until}:")
+    print(rates.to_string(float_format=lambda rate: f"{rate:.1%}"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+The schema of the audit log: one json object per line, for every decision the bot took.
+The fields and their meaning only ever get added to, and the schema version goes up whenever they do.
+"""
+import json
+import logging
+from datetime import datetime
+from typing import Iterator
+
+from src.auditing.bot_decision import BotDecision
+from src.parsing.constants import RequestFollowUp
+
+AUDIT_SCHEMA_VERSION = 1
+AUDIT_RECORD_FIELDS = [
+    'schema_version', 'ticket_id', 'created_at', 'request_type', 'request_summary', 'details',
+    'mandatory_fields', 'fields_provided', 'outcome', 'security_risk',
+]
+
+records_logger = logging.getLogger(__name__)
+
+
+def decision_to_record(decision: BotDecision) -> dict:
+    """:returns the decision as a json-ready dict, with the time in iso 8601 and the outcome by its value."""
+    return {
+        'schema_version': AUDIT_SCHEMA_VERSION,
+        'ticket_id': decision.ticket_id,
+        'created_at': decision.created_at.isoformat() if decision.created_at is not None else None,
+        'request_type': decision.request_type,
+        'request_summary': decision.request_summary,
+        'details': decision.details,
+        'mandatory_fields': decision.mandatory_fields,
+        'fields_provided': decision.fields_provided,
+        'outcome': decision.outcome.value if decision.outcome is not None else None,
+        'security_risk': decision.security_risk,
+    }
+
+
+def record_to_decision(record: dict) -> BotDecision:
+    return BotDecision(
+        ticket_id=record['ticket_id'],
+        created_at=datetime.fromisoformat(record['created_at']) if record['created_at'] is not None else None,
+        request_type=record['request_type'],
+        request_summary=record['request_summary'],
+        details=record['details'],
+        mandatory_fields=record['mandatory_fields'],
+        fields_provided=record['fields_provided'],
+        outcome=RequestFollowUp(record['outcome']) if record['outcome'] is not None else None,
+        security_risk=record['security_risk'],
+    )
+
+
+def format_record(decision: BotDecision) -> str:
+    """:returns the decision as a line of the audit log."""
+    return json.dumps(decision_to_record(decision), separators=(',', ':'), ensure_ascii=False) + '\n'
+
+
+def parse_records(lines) -> Iterator[dict]:
+    """parses audit log lines, skipping those that are not json records, like the repr lines of older logs."""
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            records_logger.warning(f"skipped an audit log line which is not a json record: {line[:80]}")
+            continue
+        yield record
@@ -1,13 +1,186 @@
-from dataclasses import asdict
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
 
+from src.auditing.audit_records import format_record
 from src.auditing.bot_decision import BotDecision
 
+audit_logger = logging.getLogger(__name__)
+
+_STOP = object()
+_SYNC = object()
+
+# a writer that failed, like on a log path that cannot be opened, is not restarted more often than this.
+WRITER_RESTART_INTERVAL_SECONDS = 5.
+
 
 class DecisionLogger(object):
-    def __init__(self, log_path: str = 'logs/audit.log'):
+    """
+    Appends bot decisions to the audit log, as json lines, without making the caller wait for the disk.
+    Decisions are put in a bounded queue which a background thread drains in batches, syncing the file to disk at most
+    once every fsync interval. When the queue is full the decision is dropped and counted, rather than blocking.
+    The writer thread starts with the first decision logged in a process, and is flushed when the process exits.
+    A writer that fails drops, and counts, the decisions queued for it, and the next decision logged after the restart
+    interval starts another.
+    """
+
+    def __init__(
+            self, log_path: str = 'logs/audit.log', queue_size: int = 10000, batch_size: int = 256,
+            fsync_interval_seconds: float = 1.
+    ):
         self.log_path = log_path
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.fsync_interval_seconds = fsync_interval_seconds
+        self.dropped_records = 0
+        self.written_records = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer = None
+        self._writer_pid = None
+        self._writer_failed_at = None
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
 
     def log(self, decision: BotDecision) -> None:
-        with open(self.log_path, 'a') as file:
-            file.write(str(asdict(decision)))
-            file.write('\n')
\ No newline at end of file
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(decision)
+        except queue.Full:
+            with self._lock:
+                self.dropped_records += 1
+            audit_logger.warning(f"audit queue is full, dropped the decision on ticket {decision.ticket_id}")
+
+    def flush(self, timeout: float = 10.) -> bool:
+        """
+        blocks until every decision logged so far is written and synced to disk, or dropped since the writer failed.
+        :returns whether that happened within the timeout.
+        """
+        writer = self._writer
+        if writer is None or not writer.is_alive():
+            return self._queue.unfinished_tasks == 0
+        self._queue.put(_SYNC)
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not writer.is_alive():
+                    return False
+                self._queue.all_tasks_done.wait(min(remaining, .1))
+        return True
+
+    def close(self) -> None:
+        """flushes the queue and stops the writer thread. logging again starts a new one."""
+        with self._lock:
+            writer = self._writer
+            self._writer = None
+        if writer is not None and writer.is_alive():
+            self._queue.put(_STOP)
+            writer.join()
+
+    def _ensure_writer(self) -> None:
+        # a worker forked from a process which already logged inherits the queue, but not the thread draining it.
+        if self._writer is not None and self._writer_pid == os.getpid() and self._writer.is_alive():
+            return
+        with self._lock:
+            if self._writer is not None and self._writer_pid == os.getpid():
+                if self._writer.is_alive():
+                    return
+                failed_at = self._writer_failed_at
+                if failed_at is not None and time.monotonic() - failed_at < WRITER_RESTART_INTERVAL_SECONDS:
+                    return
+                audit_logger.warning('the audit log writer stopped unexpectedly, starting a new one')
+            if self._writer_pid is not None and self._writer_pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.queue_size)
+            self._writer_pid = os.getpid()
+            self._writer = threading.Thread(target=self._write_batches, name='audit-log-writer', daemon=True)
+            self._writer.start()
+
+    def _write_batches(self) -> None:
+        try:
+            self._write_batches_to_file()
+        except Exception as e:
+            self._writer_failed_at = time.monotonic()
+            audit_logger.exception(f"the audit log writer stopped: {e}")
+            self._drop_queued()
+
+    def _drop_queued(self) -> None:
+        """drops whatever is queued, so that nothing waits on a writer that failed for the decisions to be written."""
+        dropped = 0
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            dropped += item is not _STOP and item is not _SYNC
+            self._queue.task_done()
+        with self._lock:
+            self.dropped_records += dropped
+        if dropped:
+            audit_logger.error(f"dropped {dropped} decisions since the audit log writer stopped")
+
+    def _write_batches_to_file(self) -> None:
+        log_dir = os.path.dirname(self.log_path)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+        last_sync = time.monotonic()
+        is_synced = True
+        with open(self.log_path, 'a', encoding='utf-8') as file:
+            is_stopped = False
+            while not is_stopped:
+                batch = self._take_batch(timeout=self.fsync_interval_seconds)
+                is_stopped = _STOP in batch
+                decisions = [d for d in batch if d is not _STOP and d is not _SYNC]
+                try:
+                    records = self._format_records(decisions)
+                    if records:
+                        file.write(''.join(records))
+                        file.flush()
+                        is_synced = False
+                    is_sync_due = time.monotonic() - last_sync >= self.fsync_interval_seconds
+                    must_sync = is_stopped or _SYNC in batch or is_sync_due
+                    if must_sync and not is_synced:
+                        os.fsync(file.fileno())
+                        is_synced = True
+                    if must_sync:
+                        last_sync = time.monotonic()
+                    self.written_records += len(records)
+                except OSError as e:
+                    with self._lock:
+                        self.dropped_records += len(decisions)
+                    audit_logger.error(f"failed to write {len(decisions)} decisions to the audit log: {e}")
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+
+    def _format_records(self, decisions: list) -> list:
+        """:returns the records of the decisions, dropping and counting those that fail to format."""
+        records = []
+        for decision in decisions:
+            try:
+                records.append(format_record(decision))
+            except Exception as e:
+                with self._lock:
+                    self.dropped_records += 1
+                audit_logger.exception(f"failed to format the decision on ticket {decision.ticket_id}: {e}")
+        return records
+
+    def _take_batch(self, timeout: float) -> list:
+        """waits for a first item, then takes whatever else is already queued, up to the batch size."""
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size and batch[-1] is not _STOP and batch[-1] is not _SYNC:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
@@ -0,0 +1,142 @@
+"""
+Runs the bot's classification policy over many messages at once, e.g. to backfill the historical ticket archive
+whenever the rules change.
+
+run with `python -m src.batch_classification resources/acme_security_tickets.csv`
+"""
+import argparse
+import csv
+import itertools
+import logging
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List
+
+from src.auditing.bot_decision import BotDecision
+from src.message_evaluation import DEFAULT_SECURITY_RISK_THRESHOLD, create_bot_decision, evaluate_message
+
+batch_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchThroughput(object):
+    """Keeps track of how many messages a batch went through and how long it took."""
+    messages: int = 0
+    elapsed_seconds: float = 0.
+
+    @property
+    def messages_per_second(self) -> float:
+        return self.messages / self.elapsed_seconds if self.elapsed_seconds else 0.
+
+
+def classify_batch(
+        texts: Iterable[str], workers: int = None, chunk_size: int = 64,
+        security_risk_threshold: int = DEFAULT_SECURITY_RISK_THRESHOLD, throughput: BatchThroughput = None
+) -> Iterator[BotDecision]:
+    """
+    Streams a decision for every text, in the order of the texts.
+    The texts are split into chunks which are evaluated in a pool of worker processes,
+    only a few chunks ahead of the consumer so that arbitrarily long iterables can be streamed.
+    :param workers: the number of worker processes. defaults to the number of CPUs, and 1 evaluates in-process.
+    :param throughput: if given, it is updated with the number of messages handled and the time it took so far.
+    """
+    throughput = throughput if throughput is not None else BatchThroughput()
+    start = time.perf_counter() - throughput.elapsed_seconds
+    chunks = _split_to_chunks(texts, chunk_size)
+
+    if workers == 1:
+        decision_chunks = (_evaluate_chunk(chunk, security_risk_threshold) for chunk in chunks)
+        yield from _count_throughput(decision_chunks, throughput, start)
+        return
+
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque(
+            pool.submit(_evaluate_chunk, chunk, security_risk_threshold)
+            for chunk in itertools.islice(chunks, 2 * workers)
+        )
+
+        def decision_chunks():
+            while in_flight:
+                decisions = in_flight.popleft().result()
+                for chunk in itertools.islice(chunks, 1):
+                    in_flight.append(pool.submit(_evaluate_chunk, chunk, security_risk_threshold))
+                yield decisions
+
+        try:
+            yield from _count_throughput(decision_chunks(), throughput, start)
+        finally:
+            # the consumer may stop early, in which case there is no point in finishing the remaining chunks.
+            for future in in_flight:
+                future.cancel()
+
+
+def _split_to_chunks(texts: Iterable[str], chunk_size: int) -> Iterator[List[str]]:
+    texts = iter(texts)
+    chunk = list(itertools.islice(texts, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(itertools.islice(texts, chunk_size))
+
+
+def _evaluate_chunk(texts: List[str], security_risk_threshold: int) -> List[BotDecision]:
+    """evaluates every text like the bot would, without talking to slack. runs in the worker processes."""
+    decisions = []
+    for text in texts:
+        evaluation = evaluate_message(text, security_risk_threshold)
+        decisions.append(
+            create_bot_decision(
+                text, evaluation.request_type, evaluation.user_request, evaluation.security_risk,
+                evaluation.followup
+            )
+        )
+    return decisions
+
+
+def _count_throughput(
+        decision_chunks: Iterable[List[BotDecision]], throughput: BatchThroughput, start: float
+) -> Iterator[BotDecision]:
+    for decisions in decision_chunks:
+        throughput.messages += len(decisions)
+        throughput.elapsed_seconds = time.perf_counter() - start
+        yield from decisions
+    batch_logger.info(
+        f"classified {throughput.messages} messages in {throughput.elapsed_seconds:.2f}s "
+        f"({throughput.messages_per_second:.0f} messages per second)"
+    )
+
+
+def _read_ticket_details(csv_path: str) -> Iterator[str]:
+    with open(csv_path, newline='', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            yield row['details']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Classifies every ticket in a csv with a "details" column.')
+    parser.add_argument('csv_path')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=64)
+    parser.add_argument('--threshold', type=int, default=DEFAULT_SECURITY_RISK_THRESHOLD)
+    args = parser.parse_args()
+
+    throughput = BatchThroughput()
+    outcomes = Counter(
+        (decision.request_type, decision.outcome.value)
+        for decision in classify_batch(
+            _read_ticket_details(args.csv_path), args.workers, args.chunk_size, args.threshold, throughput
+        )
+    )
+    for (request_type, outcome), count in sorted(outcomes.items()):
+        print(f"{request_type:<25}{outcome:<25}{count}")
+    print(
+        f"classified {throughput.messages} messages in {throughput.elapsed_seconds:.2f}s "
+        f"({throughput.messages_per_second:.0f} messages per second)"
+    )
+
+
+if __name__ == '__main__':
+    main()
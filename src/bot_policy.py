@@ -1,30 +1,66 @@
 import logging
+import time
 import uuid
-from datetime import datetime, timezone
-
-from cachetools import TTLCache
-from slack_bolt import Say
-from slack_sdk import WebClient
+from typing import Optional, TYPE_CHECKING
 
+from src import instrumentation
 from src.auditing.bot_decision import BotDecision, BotDecisionResponse
 from src.auditing.decision_logging import DecisionLogger
 from src.conversational_user_interfaces.furry import Furry
 from src.conversational_user_interfaces.professional import Professional
+from src.message_evaluation import (
+    DEFAULT_SECURITY_RISK_THRESHOLD, create_bot_decision, decide_on_follow_up, evaluate_message
+)
 from src.parsing.constants import RequestFollowUp
-from src.parsing.regex_classifier import attempt_to_classify, construct_according_to_classification
-from src.parsing.requests import UnIdentifiedUserRequest, UserRequest
+from src.parsing.regex_classifier import complete_missing_fields
+from src.parsing.requests import UserRequest
 from src.security_estimator import calculate_security_risk
+from src.state.conversation_store import conversation_store_from_environment
+from src.state.delivery_deduplication import delivery_deduplicator_from_environment
+from src.state.thread_index import bot_thread_index_from_environment
+
+if TYPE_CHECKING:
+    # only named in annotations: importing slack_bolt takes longer than importing the whole policy.
+    from slack_bolt import Say
+    from slack_sdk import WebClient
 
-logging.basicConfig(level=logging.DEBUG)
 flow_logger = logging.getLogger(__name__)
 decision_logger = DecisionLogger()
 
-requests_map = TTLCache(maxsize=100, ttl=1000*3600)
+conversation_store = conversation_store_from_environment()
+bot_threads = bot_thread_index_from_environment()
+seen_deliveries = delivery_deduplicator_from_environment()
 attitude = Furry()
-security_risk_threshold = 75
-
-
-def handle_message(message: dict, client: WebClient, say: Say, context) -> BotDecisionResponse:
+security_risk_threshold = DEFAULT_SECURITY_RISK_THRESHOLD
+
+_request_evaluation_time = instrumentation.histogram(
+    'request_evaluation', 'Time taken to evaluate a request and build the reply to it, without talking to slack.',
+    ['request_type', 'conversation']
+)
+_block_rendering_time = instrumentation.histogram(
+    'block_rendering', 'Time taken to render the blocks of a reply.', ['request_type']
+)
+_conversation_lookups = instrumentation.counter(
+    'conversation_lookups', 'Thread replies looked up in the conversation store, by whether a request was pending.',
+    ['result']
+)
+# read through the module's globals when rendered, so that they follow objects replaced in tests.
+instrumentation.observe_counter('bot_thread_hits', 'Thread lookups answered by the bot thread index.',
+                                lambda: bot_threads.hits)
+instrumentation.observe_counter('bot_thread_misses', 'Thread lookups that had to ask slack.',
+                                lambda: bot_threads.misses)
+instrumentation.observe_counter('delivery_retries', 'Event deliveries slack retried.', lambda: seen_deliveries.retries)
+instrumentation.observe_counter('suppressed_duplicate_deliveries', 'Event deliveries skipped as already seen.',
+                                lambda: seen_deliveries.suppressed_duplicates)
+instrumentation.observe_counter('dropped_audit_records', 'Decisions dropped since the audit queue was full.',
+                                lambda: decision_logger.dropped_records)
+instrumentation.observe_gauge('audit_queue_depth', 'Decisions waiting to be written to the audit log.',
+                              lambda: decision_logger.queue_depth)
+instrumentation.observe_gauge('pending_conversations', 'Requests waiting for more details from their users.',
+                              lambda: len(conversation_store))
+
+
+def handle_message(message: dict, client: 'WebClient', say: 'Say', context) -> BotDecisionResponse:
     """
     Handles all incoming messages and checks if they are replies
     to the bot's own messages within a thread.
@@ -42,24 +78,9 @@ def handle_message(message: dict, client: WebClient, say: Say, context) -> BotDe
         flow_logger.info(f"Message is a thread reply. Thread TS: {thread_root_ts}")
 
         try:
-            result = client.conversations_history(
-                channel=channel_id,
-                latest=thread_root_ts,
-                inclusive=True,
-                limit=1
-            )
-
-            if result['ok'] and result['messages']:
-                root_message = result['messages'][0]
-                if __we_initiated_this_thread(context, root_message):
-                    return fix_previously_submitted_request(
-                        message, say, thread_root_ts, user_id, client
-                    )
-                else:
-                    flow_logger.info("Root message was not from this bot.")
-            else:
-                flow_logger.warning(
-                    f"Could not retrieve root message for thread_ts: {thread_root_ts}"
+            if _is_thread_ours(client, context, channel_id, thread_root_ts):
+                return fix_previously_submitted_request(
+                    message, say, thread_root_ts, user_id, client
                 )
 
         except Exception as e:
@@ -82,62 +103,21 @@ def fix_previously_submitted_request(message, say, thread_root_ts, user_id, clie
     flow_logger.info(
         f"User '{user_id}' replied to our bot's message in thread: '{user_message}'"
     )
-    thread_request = requests_map.get(str(thread_root_ts), None)
-    old_ticket_id = str(uuid.uuid3(uuid.NAMESPACE_URL, str(thread_root_ts)))
-
-    blocks = [
-        attitude.generate_acknowledgement_block(message),
-        attitude.generate_reflection_block(message),
-    ]
+    thread_request = _pending_request_of(thread_root_ts)
 
     if thread_request is not None:
-        completing_request = construct_according_to_classification(
-            thread_request.request_type, user_message
-        )
-
-        merged_request = thread_request.merge_with(completing_request)
-        security_risk = calculate_security_risk(merged_request)
-        flow_logger.info(f"formed request: {merged_request}\nsecurity_risk: {security_risk}")
-
-        followup = _decide_on_follow_up(merged_request, security_risk)
-        _manage_cache_according_to_follow_up(merged_request, followup, thread_root_ts)
-
-        blocks.append(
-            attitude.generate_user_request_description_block(merged_request)
-        )
-
-        reply_blocks = _formulate_reply_according_to_follow_up(merged_request, followup)
-        blocks.extend(reply_blocks)
-
+        bot_response = _complete_thread_request(message, thread_request, thread_root_ts)
         client.chat_postMessage(
             channel=message['channel'],
             thread_ts=thread_root_ts,
-            blocks=blocks,
+            blocks=bot_response.response_in_chat,
             text='hyper vyper has processed your request'
         )
-
-        mandatory_field_names = [f.name for f in merged_request.get_mandatory_fields()]
-        bot_decision = BotDecision(
-            ticket_id=old_ticket_id,
-            created_at=datetime.now(timezone.utc),
-            request_type=merged_request.request_type,
-            details=user_message,
-            mandatory_fields=mandatory_field_names,
-            fields_provided=[f for f in mandatory_field_names if
-                getattr(merged_request, f) is not None],
-            outcome=followup,
-            security_risk=security_risk
-        )
-        decision_logger.log(bot_decision)
-        bot_response = BotDecisionResponse(
-            user_request=merged_request,
-            response_in_chat=blocks,
-            bot_decision=bot_decision,
-        )
+        decision_logger.log(bot_response.bot_decision)
         return bot_response
     else:
         say(
-            text=f"Hey <@{user_id}>! I'm sorry, but I closed the request in this thread due to timeout or completion. let's start over.",
+            text=_thread_closed_text(user_id),
             thread_ts=thread_root_ts
             # Ensure the reply goes back into the same thread
         )
@@ -145,6 +125,93 @@ def fix_previously_submitted_request(message, say, thread_root_ts, user_id, clie
         return generate_irrelevant_response(user_message)
 
 
+def _pending_request_of(thread_root_ts) -> Optional[UserRequest]:
+    """looks up the request waiting for details in a thread, counting whether there was one."""
+    thread_request = conversation_store.get(thread_root_ts)
+    _conversation_lookups.inc('miss' if thread_request is None else 'hit')
+    return thread_request
+
+
+def _is_thread_ours(client: 'WebClient', context, channel_id, thread_root_ts) -> bool:
+    """looks the thread up in our own index of bot threads, and only asks slack about threads it does not know."""
+    is_ours = bot_threads.is_ours(thread_root_ts)
+    if is_ours is not None:
+        return is_ours
+    result = client.conversations_history(
+        channel=channel_id,
+        latest=thread_root_ts,
+        inclusive=True,
+        limit=1
+    )
+    return _remember_thread_root(result, context, thread_root_ts)
+
+
+def _remember_thread_root(history: dict, context, thread_root_ts) -> bool:
+    """
+    checks whether our bot started the thread by the result of fetching its root message, and indexes the thread as
+    ours or not. a thread whose root could not be fetched is not indexed, so that the next reply asks slack again.
+    """
+    if _is_thread_root_ours(history, context, thread_root_ts):
+        bot_threads.add(thread_root_ts)
+        return True
+    if history['ok'] and history['messages']:
+        bot_threads.add_not_ours(thread_root_ts)
+    return False
+
+
+def _is_thread_root_ours(history: dict, context, thread_root_ts) -> bool:
+    """checks the result of fetching a thread's root message to see whether our bot started that thread."""
+    if history['ok'] and history['messages']:
+        if __we_initiated_this_thread(context, history['messages'][0]):
+            return True
+        flow_logger.info("Root message was not from this bot.")
+    else:
+        flow_logger.warning(
+            f"Could not retrieve root message for thread_ts: {thread_root_ts}"
+        )
+    return False
+
+
+def _thread_closed_text(user_id) -> str:
+    return f"Hey <@{user_id}>! I'm sorry, but I closed the request in this thread due to timeout or completion. let's start over."
+
+
+def _complete_thread_request(message, thread_request: UserRequest, thread_root_ts) -> BotDecisionResponse:
+    """
+    merges a reply in a thread into the request pending in that thread and decides on it anew.
+    does everything but talking to slack, so that the sync and async policies can share it.
+    """
+    start = time.perf_counter()
+    user_message = message['text']
+    old_ticket_id = str(uuid.uuid3(uuid.NAMESPACE_URL, str(thread_root_ts)))
+
+    merged_request = complete_missing_fields(thread_request, user_message)
+    security_risk = calculate_security_risk(merged_request)
+    flow_logger.info(f"formed request: {merged_request}\nsecurity_risk: {security_risk}")
+
+    followup = _decide_on_follow_up(merged_request, security_risk)
+    _manage_cache_according_to_follow_up(merged_request, followup, thread_root_ts)
+
+    with _block_rendering_time.time(merged_request.request_type):
+        blocks = [
+            attitude.generate_acknowledgement_block(message),
+            attitude.generate_reflection_block(message),
+            attitude.generate_user_request_description_block(merged_request),
+        ]
+        blocks.extend(_formulate_reply_according_to_follow_up(merged_request, followup))
+
+    bot_decision = create_bot_decision(
+        user_message, merged_request.request_type, merged_request, security_risk, followup,
+        ticket_id=old_ticket_id
+    )
+    _request_evaluation_time.observe(time.perf_counter() - start, merged_request.request_type, 'thread_reply')
+    return BotDecisionResponse(
+        user_request=merged_request,
+        response_in_chat=blocks,
+        bot_decision=bot_decision,
+    )
+
+
 def __we_initiated_this_thread(context, root_message):
     """compares our bot's ID to the ID of whoever initiated this thread to verify that it's indeed us."""
     return 'bot_id' in root_message and root_message['bot_id'] == context.bot_id
@@ -155,6 +222,11 @@ def __is_message_inside_a_thread(payload):
     return 'thread_ts' in payload and payload['thread_ts'] != payload['ts']
 
 
+def overloaded_command_reply() -> list:
+    """the blocks to acknowledge a command with when it cannot be taken, since too many are waiting to be handled."""
+    return [attitude.generate_overloaded_block()]
+
+
 def help_command(say):
     """returns the help output to the user"""
     b = attitude.generate_help_block()
@@ -163,72 +235,70 @@ def help_command(say):
 
 def classify_and_respond(payload, client) -> BotDecisionResponse:
     """This initiates a conversation about a security request."""
-    blocks = [
-        attitude.generate_acknowledgement_block(payload),
-        attitude.generate_reflection_block(payload),
-    ]
-    new_ts = None
+    bot_response = _evaluate_new_request(payload)
+    try:
+        response_data = client.chat_postMessage(
+            channel=payload.get('channel_name'),
+            blocks=bot_response.response_in_chat,
+            text='hyper vyper has processed your request'
+        )
+        _open_thread_for_request(bot_response, response_data['ts'])
+    except Exception as e:
+        flow_logger.exception(e)
+        flow_logger.error(bot_response.response_in_chat)
+        flow_logger.error('Failed to respond to user')
+    decision_logger.log(bot_response.bot_decision)
+    return bot_response
+
 
+def _evaluate_new_request(payload) -> BotDecisionResponse:
+    """
+    classifies and evaluates a request sent with /classify and builds the reply to it.
+    does everything but talking to slack, so that the sync and async policies can share it.
+    """
+    start = time.perf_counter()
     flow_logger.debug(payload)
-    channel = payload.get('channel_name')
     user_message = payload.get('text')
-    request_type = attempt_to_classify(user_message)
-
-    formed_request = construct_according_to_classification(request_type, user_message)
+    evaluation = evaluate_message(user_message, security_risk_threshold)
+    request_type = evaluation.request_type
+    formed_request = evaluation.user_request
+    followup = evaluation.followup
     flow_logger.debug(f"identified_request_type: {request_type}\nfrom user_message: {user_message}")
 
-    blocks.append(attitude.generate_initial_classification_block(request_type))
-    blocks.append(attitude.generate_user_request_description_block(formed_request))
-    security_risk = calculate_security_risk(formed_request)
-
-    followup = _decide_on_follow_up(formed_request, security_risk)
-    reply_blocks = _formulate_reply_according_to_follow_up(formed_request, followup)
-    blocks.extend(reply_blocks)
-
-    mandatory_field_names = [f.name for f in formed_request.get_mandatory_fields()]
-    bot_decision = BotDecision(
-        ticket_id='invalid',
-        created_at=datetime.now(timezone.utc),
-        request_type=request_type,
-        details=user_message,
-        mandatory_fields=mandatory_field_names,
-        fields_provided=[f for f in mandatory_field_names if getattr(formed_request, f) is not None],
-        outcome=followup,
-        security_risk=security_risk
+    with _block_rendering_time.time(request_type):
+        blocks = [
+            attitude.generate_acknowledgement_block(payload),
+            attitude.generate_reflection_block(payload),
+            attitude.generate_initial_classification_block(request_type),
+            attitude.generate_user_request_description_block(formed_request),
+        ]
+        blocks.extend(_formulate_reply_according_to_follow_up(formed_request, followup))
+
+    bot_decision = create_bot_decision(
+        user_message, request_type, formed_request, evaluation.security_risk, followup
     )
-    bot_response = BotDecisionResponse(
+    _request_evaluation_time.observe(time.perf_counter() - start, request_type, 'new_request')
+    return BotDecisionResponse(
         user_request=formed_request,
         response_in_chat=blocks,
         bot_decision=bot_decision,
     )
-    try:
-        response_data = client.chat_postMessage(
-            channel=channel,
-            blocks=blocks,
-            text='hyper vyper has processed your request'
-        )
-        new_ts = response_data['ts']
-        flow_logger.info(f"New request: {new_ts}")
-        bot_response.thread_ts = new_ts
 
-        _manage_cache_according_to_follow_up(formed_request, followup, new_ts)
-        new_ticket_id = str(uuid.uuid3(uuid.NAMESPACE_URL, str(new_ts)))
-        bot_decision.ticket_id = new_ticket_id
-    except Exception as e:
-        flow_logger.exception(e)
-        flow_logger.error(blocks)
-        flow_logger.error('Failed to respond to user')
-    decision_logger.log(bot_decision)
-    return bot_response
+
+def _open_thread_for_request(bot_response: BotDecisionResponse, new_ts) -> None:
+    """ties a posted reply to the thread it started, so that the user can complete the request there."""
+    flow_logger.info(f"New request: {new_ts}")
+    bot_response.thread_ts = new_ts
+    bot_threads.add(new_ts)
+    _manage_cache_according_to_follow_up(
+        bot_response.user_request, bot_response.bot_decision.outcome, new_ts
+    )
+    bot_response.bot_decision.ticket_id = str(uuid.uuid3(uuid.NAMESPACE_URL, str(new_ts)))
 
 
 def _decide_on_follow_up(formed_request: UserRequest, security_risk: float) -> RequestFollowUp:
     """given a (possibly partial) request parsed from the user, decides what to do with it."""
-    if formed_request.is_valid() and security_risk < security_risk_threshold:
-        return RequestFollowUp.ACCEPT
-    if not isinstance(formed_request, UnIdentifiedUserRequest) and not formed_request.is_valid():
-        return RequestFollowUp.REQUEST_FURTHER_DETAILS
-    return RequestFollowUp.REJECT
+    return decide_on_follow_up(formed_request, security_risk, security_risk_threshold)
 
 
 def _formulate_reply_according_to_follow_up(
@@ -255,8 +325,8 @@ def _manage_cache_according_to_follow_up(
     or updates the cache in anticipation of more information from the user to be sent in a future message.
     """
     if followup in [RequestFollowUp.ACCEPT, RequestFollowUp.REJECT]:
-        requests_map.pop(str(thread_ts), None)
+        conversation_store.pop(thread_ts)
     elif followup is RequestFollowUp.REQUEST_FURTHER_DETAILS:
-        requests_map[str(thread_ts)] = formed_request
+        conversation_store.put(thread_ts, formed_request)
     else:
         flow_logger.error(f"Encountered unknown followup request: {followup}")
@@ -0,0 +1,171 @@
+"""
+Scores the security risk of many parsed requests at once, with column operations over a DataFrame.
+Every formula mirrors its scalar counterpart in security_estimator, so re-scoring a whole archive of requests
+after a rule or threshold change gives exactly what the bot would have decided for each of them.
+"""
+import math
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from src.parsing.constants import RequestFollowUp, RequestTypes
+from src.parsing.request_registry import column_risk_rule_of, registered_schemas, schema_of
+from src.parsing.requests import UserRequest
+
+REQUEST_TYPE_COLUMN = 'request_type'
+IS_VALID_COLUMN = 'is_valid'
+
+_REQUEST_CLASSES = [schema.request_class for schema in registered_schemas()]
+_MANDATORY_FIELDS = {
+    cls.request_type: [f.name for f in cls._field_details.values() if f.is_required] for cls in _REQUEST_CLASSES
+}
+_ALL_FIELDS = list(dict.fromkeys(name for cls in _REQUEST_CLASSES for name in cls._field_details))
+
+
+def requests_to_frame(requests: Iterable[UserRequest]) -> pd.DataFrame:
+    """lays out parsed requests as rows, with their type and a column for every field of every request type."""
+    rows = [
+        dict({name: getattr(r, name) for name in r._field_details}, **{REQUEST_TYPE_COLUMN: r.request_type})
+        for r in requests
+    ]
+    frame = pd.DataFrame(rows, columns=[REQUEST_TYPE_COLUMN] + _ALL_FIELDS, dtype=object)
+    frame[REQUEST_TYPE_COLUMN] = frame[REQUEST_TYPE_COLUMN].astype('category')
+    frame[IS_VALID_COLUMN] = find_valid_requests(frame)
+    return frame
+
+
+def find_valid_requests(frame: pd.DataFrame) -> np.ndarray:
+    """
+    :returns a mask of the rows in which all the mandatory fields of the row's request type are filled.
+    frames made by requests_to_frame already hold this mask, so it is not computed again for them.
+    """
+    if IS_VALID_COLUMN in frame:
+        return frame[IS_VALID_COLUMN].to_numpy(dtype=bool)
+    is_filled = frame[_ALL_FIELDS].notna().to_numpy()
+    is_valid = np.zeros(len(frame), dtype=bool)
+    for request_type, of_type in _split_by_request_type(frame):
+        mandatory_columns = [_ALL_FIELDS.index(name) for name in _MANDATORY_FIELDS.get(request_type, [])]
+        if mandatory_columns:
+            is_valid[of_type] = is_filled[of_type][:, mandatory_columns].all(axis=1)
+    return is_valid
+
+
+def calculate_security_risks(frame: pd.DataFrame) -> pd.Series:
+    """scores every row of the frame like calculate_security_risk would score the request it describes."""
+    risks = np.full(len(frame), 100.)
+    is_valid = find_valid_requests(frame)
+    for request_type, of_type in _split_by_request_type(frame):
+        rows = of_type & is_valid
+        schema = schema_of(request_type)
+        if schema is not None and schema.calculate_column_risks is not None and rows.any():
+            risks[rows] = schema.calculate_column_risks(frame[rows])
+    return pd.Series(risks, index=frame.index)
+
+
+def decide_on_follow_ups(frame: pd.DataFrame, risks: pd.Series, security_risk_threshold: int) -> pd.Series:
+    """decides on the follow up of every row of the frame like the bot would, given its security risk."""
+    is_valid = find_valid_requests(frame)
+    is_identified = (frame[REQUEST_TYPE_COLUMN] != RequestTypes.UNKNOWN).to_numpy()
+    return pd.Series(
+        np.select(
+            [is_valid & (risks.to_numpy() < security_risk_threshold), is_identified & ~is_valid],
+            [RequestFollowUp.ACCEPT, RequestFollowUp.REQUEST_FURTHER_DETAILS],
+            default=RequestFollowUp.REJECT
+        ),
+        index=frame.index
+    )
+
+
+def _split_by_request_type(frame: pd.DataFrame) -> Iterable:
+    """:returns pairs of every request type in the frame and a mask of its rows."""
+    request_types = frame[REQUEST_TYPE_COLUMN].astype('category')
+    codes = request_types.cat.codes.to_numpy()
+    return [(request_type, codes == code) for code, request_type in enumerate(request_types.cat.categories)]
+
+
+def _contains(column: pd.Series, word: str) -> np.ndarray:
+    """:returns a mask of the values containing the word, ignoring case."""
+    return column.str.lower().str.contains(word, regex=False).to_numpy(dtype=bool)
+
+
+def _is_truthy(column: pd.Series) -> np.ndarray:
+    return column.notna().to_numpy() & column.astype(bool).to_numpy()
+
+
+@column_risk_rule_of(RequestTypes.CLOUD_ACCESS)
+def _calculate_cloud_access_risks(requests: pd.DataFrame) -> np.ndarray:
+    return 55. + 10. * _contains(requests['sensitivity'], 'high')
+
+
+@column_risk_rule_of(RequestTypes.DATA_EXPORT)
+def _calculate_data_export_risks(requests: pd.DataFrame) -> np.ndarray:
+    return (
+        60.
+        + 30. * _is_truthy(requests['PII_involvement'])
+        + 10. * _contains(requests['destination'], 'external')
+    )
+
+
+@column_risk_rule_of(RequestTypes.DEVTOOL_INSTALL)
+def _calculate_devtool_install_risks(requests: pd.DataFrame) -> np.ndarray:
+    return 35. + 10. * _contains(requests['business_justification'], 'performance')
+
+
+@column_risk_rule_of(RequestTypes.FIREWALL_CHANGE)
+def _calculate_firewall_change_risks(requests: pd.DataFrame) -> np.ndarray:
+    port = requests['destination_ip'].str.split(':').str[-1].to_numpy()
+    return (
+        65.
+        + 10. * _contains(requests['business_justification'], 'third party')
+        + 10. * (port != '22')
+        + 10. * (port == '443')
+    )
+
+
+@column_risk_rule_of(RequestTypes.NETWORK_ACCESS)
+def _calculate_network_access_risks(requests: pd.DataFrame) -> np.ndarray:
+    subnet_size_estimation = requests['source_cidr'].str.split('/').str[-1].astype('int64').to_numpy()
+    return 65. + subnet_size_estimation
+
+
+@column_risk_rule_of(RequestTypes.PERMISSION_CHANGE)
+def _calculate_permissions_change_risks(requests: pd.DataFrame) -> np.ndarray:
+    hours = _calculate_durations_in_hours(requests['duration'])
+    is_indefinite = np.isinf(hours)
+    if (hours[~is_indefinite] <= 0).any():
+        raise ValueError('math domain error')
+    # numpy's log may differ from math.log in the last bit, so math.log is applied to every distinct duration.
+    distinct_hours, duration_indices = np.unique(hours, return_inverse=True)
+    log_hours = np.array([math.log(h) if not math.isinf(h) else h for h in distinct_hours])[duration_indices]
+    score = (
+        75.
+        + np.where(is_indefinite, 20., np.minimum(log_hours, 20.))
+        + 10. * _contains(requests['aws_account'].fillna(''), 'prod')
+    )
+    return np.minimum(score, 100.)
+
+
+def _calculate_durations_in_hours(durations: pd.Series) -> np.ndarray:
+    """mirrors PermissionsChangeRequest.get_duration_in_hours, whose unit checks are case sensitive."""
+    multiplier = np.select(
+        [durations.str.contains(unit, regex=False).to_numpy(dtype=bool) for unit in ['hour', 'day', 'minute', 'second']],
+        [1., 24., 1. / 60, 1. / 3600],
+        default=math.inf
+    )
+    hours = np.full(len(durations), math.inf)
+    has_unit = ~np.isinf(multiplier)
+    amount_of_units = durations[has_unit].str.split(' ').str[0].astype('int64').to_numpy()
+    hours[has_unit] = amount_of_units * multiplier[has_unit]
+    return hours
+
+
+@column_risk_rule_of(RequestTypes.VENDOR_APPROVAL)
+def _calculate_vendor_approval_risks(requests: pd.DataFrame) -> np.ndarray:
+    score = (
+        45.
+        + 20. * ~_is_truthy(requests['security_questionnaire_completed'])
+        + 10. * ~_is_truthy(requests['legal_review_completed'])
+        + 15. * _contains(requests['data_classification'], 'confidential')
+    )
+    return np.minimum(score, 100.)
@@ -3,11 +3,14 @@ An interface governing the conversational user interface of the chatbot.
 Different implementations of this class serve as "skins" of the application,
 allowing the user to pick the attitude that speaks best to them.
 """
+import functools
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Callable, List
 
 from src.parsing.requests import UserRequest, RequestField
 
+_MAX_CACHED_BLOCKS = 1024
+
 
 def _format_missing_field(missing_field: RequestField) -> str:
     """
@@ -23,8 +26,12 @@ class Attitude(ABC):
     An interface governing the conversational user interface of the chatbot.
     Different implementations of this class serve as "skins" of the application,
     allowing the user to pick the attitude that speaks best to them.
+    Blocks which only depend on the attitude and a few possible arguments are built once, see cached_block.
     """
 
+    def __init__(self):
+        self._block_cache = {}
+
     @abstractmethod
     def generate_acknowledgement_block(self, payload: dict) -> dict:
         """Generates a block that acknowledges the user's last message."""
@@ -54,8 +61,7 @@ class Attitude(ABC):
     @staticmethod
     def generate_reflection_block(payload: dict) -> dict:
         """Generates a block that reflects the user's last message as a quote."""
-        request_lines = payload.get('text').split('\n')
-        return wrap_with_markdown_block('>' + '\n>'.join(request_lines))
+        return wrap_with_markdown_block('>' + payload.get('text').replace('\n', '\n>'))
 
     @abstractmethod
     def generate_initial_classification_block(self, classification: str) -> dict:
@@ -77,6 +83,53 @@ class Attitude(ABC):
         """Generates a block that responds the user's closed request."""
         pass
 
+    @abstractmethod
+    def generate_overloaded_block(self) -> dict:
+        """Generates a block that asks the user to try again, when there are too many requests to take theirs."""
+        pass
+
+
+class FrozenBlock(dict):
+    """A block shared between replies, which refuses to be changed so that no reply can change it for the others."""
+
+    def _refuse_to_change(self, *args, **kwargs):
+        raise TypeError('a block shared between replies cannot be changed')
+
+    __setitem__ = __delitem__ = __ior__ = _refuse_to_change
+    clear = pop = popitem = setdefault = update = _refuse_to_change
+
+    def __reduce__(self):
+        return FrozenBlock, (dict(self),)
+
+
+def freeze_block(block):
+    """:returns a copy of the block which cannot be changed, along with everything nested in it."""
+    if isinstance(block, dict):
+        return FrozenBlock({key: freeze_block(value) for key, value in block.items()})
+    if isinstance(block, (list, tuple)):
+        return tuple(freeze_block(item) for item in block)
+    return block
+
+
+def cached_block(generate_block: Callable[..., dict]) -> Callable[..., dict]:
+    """
+    builds the block of an attitude method once per attitude and arguments, and shares it frozen between replies.
+    meant for blocks whose arguments have only a few possible values, like a request type or its missing fields.
+    """
+    name = generate_block.__name__
+
+    @functools.wraps(generate_block)
+    def generate_cached_block(self, *args):
+        key = (name, *[tuple(a) if type(a) is list else a for a in args]) if args else name
+        try:
+            return self._block_cache[key]
+        except KeyError:
+            if len(self._block_cache) >= _MAX_CACHED_BLOCKS:
+                self._block_cache.clear()
+            block = self._block_cache[key] = freeze_block(generate_block(self, *args))
+            return block
+    return generate_cached_block
+
 
 def wrap_with_markdown_block(txt: str) -> dict:
     """Wraps a text in a json markdown block"""
@@ -5,7 +5,7 @@ It should always be overly cutesy and sometimes downright bizarre.
 from typing import List
 
 from src.conversational_user_interfaces.attitude import (
-    Attitude, wrap_with_markdown_block, determine_indefinite_article
+    Attitude, cached_block, wrap_with_markdown_block, determine_indefinite_article
 )
 from src.parsing.requests import RequestField
 
@@ -16,6 +16,7 @@ class Furry(Attitude):
     It should always be overly cutesy and sometimes downright bizarre.
     """
 
+    @cached_block
     def generate_request_for_fields(self, missing_fields: List[RequestField]) -> dict:
         return wrap_with_markdown_block(
             "*OwO* ohnonono! senpai forgot some fields!\n" +
@@ -23,11 +24,13 @@ class Furry(Attitude):
             f"\n\nThis makes mesa sad!\n{_DOG}"
         )
 
+    @cached_block
     def generate_rejection_block(self) -> dict:
         return wrap_with_markdown_block(
             f"UwU I'm too good for you. consider yourself rejected.\n{_TOAD}"
         )
 
+    @cached_block
     def generate_approval_block(self) -> dict:
         return wrap_with_markdown_block(
             f"^w^ you are approved! here, have a bunny:\n{_BUNNY}"
@@ -39,6 +42,7 @@ class Furry(Attitude):
             f"<@{payload.get('user_id')}>:"
         )
 
+    @cached_block
     def generate_initial_classification_block(self, classification: str) -> dict:
         return wrap_with_markdown_block(
             "lemme guessy! you want a " +
@@ -46,6 +50,7 @@ class Furry(Attitude):
             classification + " request, right? mesa is amazeballs!"
         )
 
+    @cached_block
     def generate_help_block(self) -> dict:
         return wrap_with_markdown_block(
             "UwU My name is hypa vypa! Imma help senpai " +
@@ -55,11 +60,18 @@ class Furry(Attitude):
 
         )
 
+    @cached_block
     def generate_closed_request_block(self) -> dict:
         return wrap_with_markdown_block(
             "OwO it looks like I closed this request! tough luck!\nSenpai wanna try again?"
         )
 
+    @cached_block
+    def generate_overloaded_block(self) -> dict:
+        return wrap_with_markdown_block(
+            "x_x so many requests! mesa is all out of paws. Senpai try again in a bit?"
+        )
+
 
 _BUNNY = """
   //
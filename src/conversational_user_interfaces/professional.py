@@ -5,7 +5,7 @@ It should always be polite, informative and patient
 from typing import List
 
 from src.conversational_user_interfaces.attitude import (
-    Attitude, wrap_with_markdown_block, determine_indefinite_article
+    Attitude, cached_block, wrap_with_markdown_block, determine_indefinite_article
 )
 from src.parsing.requests import RequestField
 
@@ -16,17 +16,20 @@ class Professional(Attitude):
     It should always be polite, informative and patient
     """
 
+    @cached_block
     def generate_request_for_fields(self, missing_fields: List[RequestField]) -> dict:
         return wrap_with_markdown_block(
             "*ERROR* I must ask you to fill in the following fields:\n" +
             f"{self._format_entire_missing_fields_list(missing_fields)}"
         )
 
+    @cached_block
     def generate_rejection_block(self) -> dict:
         return wrap_with_markdown_block(
             "I regret to inform you that your request has been rejected."
         )
 
+    @cached_block
     def generate_approval_block(self) -> dict:
         return wrap_with_markdown_block(
             "I am delighted to inform you that your request has been approved."
@@ -38,6 +41,7 @@ class Professional(Attitude):
             f"<@{payload.get('user_id')}>:"
         )
 
+    @cached_block
     def generate_initial_classification_block(self, classification: str) -> dict:
         return wrap_with_markdown_block(
             "from what I gather, this is " +
@@ -45,11 +49,19 @@ class Professional(Attitude):
             classification + " request."
         )
 
+    @cached_block
     def generate_help_block(self) -> dict:
         return wrap_with_markdown_block("I'm sorry, but you cannot be helped.")
 
+    @cached_block
     def generate_closed_request_block(self) -> dict:
         return wrap_with_markdown_block(
             "I'm sorry, but I closed the request in this thread due to timeout or completion. " +
             "let's start over."
-        )
\ No newline at end of file
+        )
+
+    @cached_block
+    def generate_overloaded_block(self) -> dict:
+        return wrap_with_markdown_block(
+            "I'm sorry, but I am handling too many requests at the moment. please try again in a minute."
+        )
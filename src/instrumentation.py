@@ -0,0 +1,234 @@
+"""
+Times the steps of the message pipeline and counts what happens in it, in histograms and counters kept in memory,
+and renders them in prometheus' text format for the /metrics endpoint.
+Timing a step costs about a microsecond, a perf_counter call at either end and a bucket increment, which is cheap
+enough to leave on in production. Every gunicorn worker keeps, and exposes, metrics of its own.
+"""
+import bisect
+import threading
+import time
+import weakref
+from typing import Callable, Dict, List, Sequence, Tuple
+
+METRIC_PREFIX = 'hyper_vyper_'
+# from 10 microseconds, which a classification of a short message takes, to 10 seconds, which a slow slack call may.
+DEFAULT_BUCKETS = (
+    .00001, .000025, .00005, .0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1., 2.5, 5., 10.
+)
+
+
+class Histogram(object):
+    """
+    Counts observed durations in cumulative buckets, apart for every combination of label values.
+    Every thread counts into series of its own, which are only added up when read, so that observing takes no lock.
+    The series of a thread that ended are folded into the series of the threads that ended before it, so that a
+    process whose threads come and go keeps a bounded number of series.
+    """
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._thread_series = threading.local()
+        self._all_thread_series: List[Dict[Tuple[str, ...], list]] = []
+        self._ended_threads_series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, *label_values) -> None:
+        index = bisect.bisect_left(self.buckets, seconds)
+        try:
+            thread_series = self._thread_series.series
+        except AttributeError:
+            thread_series = self._series_of_new_thread()
+        series = thread_series.get(label_values)
+        if series is None:
+            # a count per bucket and one for the values above the last bucket, then the sum of all values.
+            series = thread_series[label_values] = [0] * (len(self.buckets) + 1) + [0.]
+        series[index] += 1
+        series[-1] += seconds
+
+    def _series_of_new_thread(self) -> Dict[Tuple[str, ...], list]:
+        thread_series = self._thread_series.series = {}
+        # the thread's locals are dropped when it ends, and the marker with them, which folds its series.
+        marker = self._thread_series.marker = _ThreadMarker()
+        weakref.finalize(marker, self._fold_series_of_ended_thread, thread_series).atexit = False
+        with self._lock:
+            self._all_thread_series.append(thread_series)
+        return thread_series
+
+    def _fold_series_of_ended_thread(self, thread_series: Dict[Tuple[str, ...], list]) -> None:
+        with self._lock:
+            _add_series(self._ended_threads_series, thread_series)
+            self._all_thread_series.remove(thread_series)
+
+    def time(self, *label_values) -> 'Span':
+        return Span(self, label_values)
+
+    def count(self, *label_values) -> int:
+        series = self._merged_series().get(tuple(label_values))
+        return sum(series[:-1]) if series else 0
+
+    def _merged_series(self) -> Dict[Tuple[str, ...], list]:
+        with self._lock:
+            all_thread_series = list(self._all_thread_series)
+            merged = {label_values: list(series) for label_values, series in self._ended_threads_series.items()}
+        for thread_series in all_thread_series:
+            _add_series(merged, thread_series)
+        return merged
+
+    def render(self) -> List[str]:
+        lines = _header(self.name, self.description, 'histogram')
+        for label_values, series in sorted(self._merged_series().items()):
+            labels = list(zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-1]!r}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class _ThreadMarker(object):
+    """lives in a thread's locals, so that a weak reference to it tells when the thread ended."""
+    __slots__ = ('__weakref__',)
+
+
+def _add_series(total_series: Dict[Tuple[str, ...], list], added_series: Dict[Tuple[str, ...], list]) -> None:
+    for label_values, series in list(added_series.items()):
+        total = total_series.get(label_values)
+        total_series[label_values] = list(series) if total is None else [a + b for a, b in zip(total, series)]
+
+
+class Span(object):
+    """
+    Times the code in its with block into a histogram, whether the code returns or raises.
+    Entering and leaving the block costs about as much again as observing, so steps that take only a few
+    microseconds are better timed by hand, with perf_counter and observe.
+    """
+    __slots__ = ('_histogram', '_label_values', '_start')
+
+    def __init__(self, histogram: Histogram, label_values: tuple):
+        self._histogram = histogram
+        self._label_values = label_values
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._start, *self._label_values)
+
+
+class Counter(object):
+    """Counts events, apart for every combination of label values."""
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._counts: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        with self._lock:
+            self._counts[label_values] = self._counts.get(label_values, 0) + amount
+
+    def count(self, *label_values) -> float:
+        return self._counts.get(tuple(label_values), 0)
+
+    def render(self) -> List[str]:
+        lines = _header(self.name, self.description, 'counter')
+        with self._lock:
+            counts = sorted(self._counts.items())
+        for label_values, count in counts:
+            lines.append(f"{self.name}{_format_labels(list(zip(self.label_names, label_values)))} {count!r}")
+        return lines
+
+
+class ObservedValue(object):
+    """A counter or gauge kept by some other object, which is read from it when the metrics are rendered."""
+
+    def __init__(self, name: str, description: str, metric_type: str, read: Callable[[], float]):
+        self.name = name
+        self.description = description
+        self.metric_type = metric_type
+        self.read = read
+
+    def render(self) -> List[str]:
+        return _header(self.name, self.description, self.metric_type) + [f"{self.name} {float(self.read())!r}"]
+
+
+_METRICS: Dict[str, object] = {}
+_metrics_lock = threading.Lock()
+
+
+def histogram(name: str, description: str, label_names: Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+    """:returns the histogram of the name, creating it on first use."""
+    return _registered(Histogram(METRIC_PREFIX + name + '_seconds', description, label_names, buckets))
+
+
+def counter(name: str, description: str, label_names: Sequence[str] = ()) -> Counter:
+    """:returns the counter of the name, creating it on first use."""
+    return _registered(Counter(METRIC_PREFIX + name + '_total', description, label_names))
+
+
+def observe_counter(name: str, description: str, read: Callable[[], float]) -> None:
+    """exposes a count kept elsewhere, like the hits of a cache, as a counter read when the metrics are rendered."""
+    metric = ObservedValue(METRIC_PREFIX + name + '_total', description, 'counter', read)
+    with _metrics_lock:
+        _METRICS[metric.name] = metric
+
+
+def observe_gauge(name: str, description: str, read: Callable[[], float]) -> None:
+    """exposes a value kept elsewhere, like the depth of a queue, as a gauge read when the metrics are rendered."""
+    metric = ObservedValue(METRIC_PREFIX + name, description, 'gauge', read)
+    with _metrics_lock:
+        _METRICS[metric.name] = metric
+
+
+def timed(histogram_to_fill: Histogram) -> Callable:
+    """times every call of the decorated function into the histogram."""
+    def decorate(function: Callable) -> Callable:
+        def timed_function(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram_to_fill.observe(time.perf_counter() - start)
+        timed_function.__name__ = function.__name__
+        timed_function.__qualname__ = function.__qualname__
+        timed_function.__doc__ = function.__doc__
+        timed_function.__wrapped__ = function
+        return timed_function
+    return decorate
+
+
+def render_metrics() -> str:
+    """:returns every metric in prometheus' text exposition format."""
+    with _metrics_lock:
+        metrics = list(_METRICS.values())
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def _registered(metric):
+    with _metrics_lock:
+        return _METRICS.setdefault(metric.name, metric)
+
+
+def _header(name: str, description: str, metric_type: str) -> List[str]:
+    return [f"# HELP {name} {description}", f"# TYPE {name} {metric_type}"]
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ''
+    escaped = [
+        (name, str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')) for name, value in labels
+    ]
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
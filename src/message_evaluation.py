@@ -0,0 +1,162 @@
+"""
+Evaluates a single user message: parses it into a request, scores its security risk and decides how to follow up.
+This is the part of the bot's policy that does not talk to slack, so it can be shared by batch jobs.
+"""
+import copy
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Optional, Tuple, Union
+
+from src import instrumentation
+from src.auditing.bot_decision import BotDecision
+from src.parsing.constants import RequestFollowUp, RequestTypes
+from src.parsing.cascade import CascadeRouter, CascadeTier
+from src.parsing.regex_classifier import (
+    MAX_MESSAGE_LENGTH, classify_with_confidence, construct_according_to_classification
+)
+from src.parsing.request_registry import rules_version
+from src.parsing.requests import UnIdentifiedUserRequest, UserRequest
+from src.security_estimator import calculate_security_risk
+from src.state.evaluation_cache import MessageEvaluationCache
+
+if TYPE_CHECKING:
+    from src.parsing.learned_classifier import LearnedClassifier
+    from src.parsing.micro_batching import MicroBatchingClassifier
+
+evaluation_logger = logging.getLogger(__name__)
+
+DEFAULT_SECURITY_RISK_THRESHOLD = 75
+
+# how sure the keyword rules have to be of a request type, see score_request_types, to not consult the fallback model.
+DEFAULT_KEYWORD_RULES_MIN_CONFIDENCE = .75
+
+
+@dataclass
+class MessageEvaluation(object):
+    request_type: str
+    user_request: UserRequest
+    security_risk: int
+    followup: RequestFollowUp
+
+
+def evaluate_message(
+        user_message: str, security_risk_threshold: int = DEFAULT_SECURITY_RISK_THRESHOLD
+) -> MessageEvaluation:
+    """
+    classifies a message, parses it into a request and decides on the follow up according to its risk.
+    the parsing and scoring of a text are cached, while the follow up is decided on every call, so that a change of
+    the threshold applies to texts that were already seen.
+    texts are cached by their first MAX_MESSAGE_LENGTH characters, the only ones parsed, and every call gets a copy
+    of the cached request, so that merging into it or filling it in does not change what the next call gets.
+    """
+    request_type, formed_request, security_risk = evaluation_cache.get_or_evaluate(
+        user_message[:MAX_MESSAGE_LENGTH], _parse_and_score
+    )
+    followup = decide_on_follow_up(formed_request, security_risk, security_risk_threshold)
+    # field values are strings and numbers, so a shallow copy is as good as a deep one, and much cheaper.
+    return MessageEvaluation(request_type, copy.copy(formed_request), security_risk, followup)
+
+
+def fallback_classifier_from_environment() -> Optional[Union['LearnedClassifier', 'MicroBatchingClassifier']]:
+    """
+    loads the model in the directory HYPER_VYPER_FALLBACK_MODEL points at, if it does, to classify the messages the
+    keyword rules miss or are unsure of: a transformer saved by transformer_classifier, which is served by an inference
+    worker, or else a model saved by learned_classifier. HYPER_VYPER_FALLBACK_MIN_CONFIDENCE is how sure it has to be
+    of a type.
+    numpy, or torch, is only imported by bots that use a model.
+    """
+    model_directory = os.environ.get('HYPER_VYPER_FALLBACK_MODEL')
+    if not model_directory:
+        return None
+    from src.parsing.learned_classifier import DEFAULT_MIN_CONFIDENCE, LearnedClassifier
+    min_confidence = float(os.environ.get('HYPER_VYPER_FALLBACK_MIN_CONFIDENCE', DEFAULT_MIN_CONFIDENCE))
+    if os.path.exists(os.path.join(model_directory, 'config.json')):
+        from src.parsing.transformer_classifier import micro_batching_classifier_from_environment
+        return micro_batching_classifier_from_environment(model_directory, min_confidence)
+    return LearnedClassifier.load(model_directory, min_confidence)
+
+
+fallback_classifier = fallback_classifier_from_environment()
+
+# the fallback model is part of the version, rather than its id, so that a new model cannot be taken for an old one
+# that was garbage collected and left its id free.
+evaluation_cache = MessageEvaluationCache(version=lambda: (rules_version(), fallback_classifier))
+instrumentation.observe_counter('evaluation_cache_hits', 'Message evaluations answered from the cache.',
+                                lambda: evaluation_cache.hits)
+instrumentation.observe_counter('evaluation_cache_misses', 'Message evaluations that parsed and scored the text.',
+                                lambda: evaluation_cache.misses)
+
+
+
+classification_cascade = CascadeRouter([
+    CascadeTier(
+        'keyword_rules', classify_with_confidence,
+        float(os.environ.get('HYPER_VYPER_KEYWORD_RULES_MIN_CONFIDENCE', DEFAULT_KEYWORD_RULES_MIN_CONFIDENCE))
+    ),
+    CascadeTier('fallback_model', lambda text: _classify_by_fallback_model(text)),
+])
+instrumentation.observe_gauge(
+    'keyword_rules_escalation_rate',
+    'Share of the classified messages the keyword rules missed or were unsure of, for the fallback model to classify.',
+    lambda: classification_cascade.escalation_rate('keyword_rules')
+)
+
+
+def classify_message(user_message: str) -> str:
+    """
+    classifies a message by the keyword rules. if there is a fallback model, the messages the rules miss or are unsure
+    of, when several of them match, are escalated to it through the classification cascade.
+    without a model the messages still go through the cascade, which then keeps the keyword rules' answer, so that
+    how many messages a model would get is known before there is one.
+    """
+    request_type, _ = classification_cascade.classify(user_message)
+    return request_type
+
+
+def _classify_by_fallback_model(user_message: str) -> Tuple[str, float]:
+    # read on every call, so that a model loaded, or patched in, after the cascade was built is used.
+    if fallback_classifier is None:
+        return RequestTypes.UNKNOWN, 0.
+    try:
+        return fallback_classifier.classify(user_message)
+    except Exception as e:
+        # a model that is too slow or broken leaves the message to the keyword rules, rather than to no reply at all.
+        evaluation_logger.exception(f"the fallback model failed to classify a message, keeping the keyword rules': {e}")
+        return RequestTypes.UNKNOWN, 0.
+
+
+def _parse_and_score(user_message: str) -> Tuple[str, UserRequest, int]:
+    request_type = classify_message(user_message)
+    formed_request = construct_according_to_classification(request_type, user_message)
+    return request_type, formed_request, calculate_security_risk(formed_request)
+
+
+def decide_on_follow_up(
+        formed_request: UserRequest, security_risk: float, security_risk_threshold: int
+) -> RequestFollowUp:
+    """given a (possibly partial) request parsed from the user, decides what to do with it."""
+    if formed_request.is_valid() and security_risk < security_risk_threshold:
+        return RequestFollowUp.ACCEPT
+    if not isinstance(formed_request, UnIdentifiedUserRequest) and not formed_request.is_valid():
+        return RequestFollowUp.REQUEST_FURTHER_DETAILS
+    return RequestFollowUp.REJECT
+
+
+def create_bot_decision(
+        user_message: str, request_type: str, formed_request: UserRequest, security_risk: int,
+        followup: RequestFollowUp, ticket_id: str = 'invalid'
+) -> BotDecision:
+    """records a decision taken about a request, listing which of its mandatory fields were provided."""
+    mandatory_field_names = [f.name for f in formed_request.get_mandatory_fields()]
+    return BotDecision(
+        ticket_id=ticket_id,
+        created_at=datetime.now(timezone.utc),
+        request_type=request_type,
+        details=user_message,
+        mandatory_fields=mandatory_field_names,
+        fields_provided=[f for f in mandatory_field_names if getattr(formed_request, f) is not None],
+        outcome=followup,
+        security_risk=security_risk
+    )
@@ -0,0 +1,76 @@
+"""
+Routes the classification of a message through tiers of classifiers, from the cheapest to the costliest, such as the
+keyword rules of regex_classifier and then a learned model, escalating to the next tier only when a tier is not
+confident enough of its answer.
+The time every tier takes, what every tier answered and how often it escalated are exported, so that the confidence
+each tier needs can be tuned between how much classification costs and how accurate it is.
+"""
+import threading
+import time
+from typing import Callable, List, Tuple
+
+from src import instrumentation
+from src.parsing.constants import RequestTypes
+
+_tier_time = instrumentation.histogram(
+    'cascade_tier', 'Time taken by a tier of the classification cascade to classify a message.', ['tier']
+)
+_tier_answers = instrumentation.counter(
+    'cascade_answers', 'Messages whose request type the classification cascade took from a tier.', ['tier']
+)
+_tier_escalations = instrumentation.counter(
+    'cascade_escalations', 'Messages a tier of the classification cascade was not confident enough of to answer.',
+    ['tier']
+)
+
+
+class CascadeTier(object):
+    """A classifier that returns a request type and its confidence in it, and how confident it has to be to answer."""
+
+    def __init__(self, name: str, classify: Callable[[str], Tuple[str, float]], min_confidence: float = 0.):
+        self.name = name
+        self.classify = classify
+        self.min_confidence = min_confidence
+
+
+class CascadeRouter(object):
+    """
+    Classifies a message by the first tier confident enough of a request type other than UNKNOWN.
+    When no tier is, the message gets the request type the tiers were most confident of, so that a costlier tier that
+    is unsure of a message never overrides a cheaper one that was merely less sure; it is UNKNOWN only when every tier
+    said so.
+    Counts the messages classified and the ones every tier escalated, whose ratio is the tier's escalation rate.
+    """
+
+    def __init__(self, tiers: List[CascadeTier]):
+        self.tiers = tiers
+        self.classified = 0
+        self.escalations = {tier.name: 0 for tier in tiers}
+        self._lock = threading.Lock()
+
+    def classify(self, text: str) -> Tuple[str, float]:
+        """:returns the request type of the text, and the confidence in it of the tier it was taken from."""
+        with self._lock:
+            self.classified += 1
+        best = (RequestTypes.UNKNOWN, 0.)
+        best_tier = self.tiers[0].name
+        for tier in self.tiers:
+            start = time.perf_counter()
+            request_type, confidence = tier.classify(text)
+            _tier_time.observe(time.perf_counter() - start, tier.name)
+            if request_type != RequestTypes.UNKNOWN:
+                if confidence >= tier.min_confidence:
+                    _tier_answers.inc(tier.name)
+                    return request_type, confidence
+                if best[0] == RequestTypes.UNKNOWN or confidence > best[1]:
+                    best, best_tier = (request_type, confidence), tier.name
+            if tier is not self.tiers[-1]:
+                with self._lock:
+                    self.escalations[tier.name] += 1
+                _tier_escalations.inc(tier.name)
+        _tier_answers.inc(best_tier)
+        return best
+
+    def escalation_rate(self, tier_name: str) -> float:
+        """:returns the share of the messages classified so far that the tier escalated."""
+        return self.escalations[tier_name] / self.classified if self.classified else 0.
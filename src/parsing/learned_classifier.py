@@ -0,0 +1,223 @@
+"""
+Classifies the requests the keyword rules of regex_classifier miss, with a linear model over the tf-idf weights of
+the words and word pairs of a message, trained offline on the ticket archive.
+The model is saved as a directory of .npy arrays that are memory mapped when loaded, so that loading it is instant and
+gunicorn's forked workers share a single copy of it. Serving only needs numpy: the vectorization of scikit-learn's
+TfidfVectorizer is reproduced over the saved vocabulary, and scikit-learn is only imported for training.
+
+run with `python -m src.parsing.learned_classifier resources/acme_security_tickets.csv models/request_types`
+"""
+import argparse
+import csv
+import os
+import random
+import re
+import statistics
+import time
+from collections import Counter
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from src.parsing.constants import RequestTypes
+from src.parsing.regex_classifier import MAX_MESSAGE_LENGTH, attempt_to_classify
+
+DEFAULT_MIN_CONFIDENCE = .6
+# TfidfVectorizer's default tokenization, which the model is trained with and served with.
+_TOKEN_PATTERN = re.compile(r'(?u)\b\w\w+\b')
+_NGRAM_RANGE = (1, 2)
+_ARRAY_NAMES = ['vocabulary', 'idf', 'coefficients', 'intercepts', 'classes']
+
+
+class LearnedClassifier(object):
+    """
+    A multinomial logistic regression over sublinear, l2 normalized tf-idf weights.
+    Its terms are kept sorted, so a term is looked up by binary search in the vocabulary array itself and the
+    vocabulary, like every other part of the model, stays in its memory mapped file.
+    A message is only given a request type when the model is at least min_confidence sure of it, and is UNKNOWN
+    otherwise, as is any message that shares no term with the archive.
+    """
+
+    def __init__(
+            self, vocabulary: np.ndarray, idf: np.ndarray, coefficients: np.ndarray, intercepts: np.ndarray,
+            classes: np.ndarray, min_confidence: float = DEFAULT_MIN_CONFIDENCE
+    ):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.coefficients = coefficients
+        self.intercepts = intercepts
+        self.classes = [str(c) for c in classes]
+        self.min_confidence = min_confidence
+
+    @classmethod
+    def load(cls, directory: str, min_confidence: float = DEFAULT_MIN_CONFIDENCE) -> 'LearnedClassifier':
+        arrays = [np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r') for name in _ARRAY_NAMES]
+        return cls(*arrays, min_confidence=min_confidence)
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        arrays = [self.vocabulary, self.idf, self.coefficients, self.intercepts, np.array(self.classes)]
+        for name, array in zip(_ARRAY_NAMES, arrays):
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array))
+
+    def classify(self, text: str) -> Tuple[str, float]:
+        """:returns the request type of the text and the model's confidence in it."""
+        return self.classify_batch([text])[0]
+
+    def classify_batch(self, texts: Sequence[str]) -> List[Tuple[str, float]]:
+        """:returns the request type of every text and the model's confidence in it, vectorizing them all at once."""
+        scores, has_terms = self.decision_scores(texts)
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        best = probabilities.argmax(axis=1)
+        confidences = probabilities[np.arange(len(texts)), best]
+        return [
+            (self.classes[b] if known and confidence >= self.min_confidence else RequestTypes.UNKNOWN,
+             float(confidence))
+            for b, confidence, known in zip(best, confidences, has_terms)
+        ]
+
+    def decision_scores(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """:returns the linear score of every class for every text, and which of the texts had any known term."""
+        documents, columns = self._known_terms(texts)
+        scores = np.tile(np.asarray(self.intercepts, dtype=np.float64), (len(texts), 1))
+        if len(columns) == 0:
+            return scores, np.zeros(len(texts), dtype=bool)
+        # the terms of every document are counted together, and come out sorted by document.
+        keys, counts = np.unique(documents * len(self.vocabulary) + columns, return_counts=True)
+        documents, columns = keys // len(self.vocabulary), keys % len(self.vocabulary)
+        weights = (1. + np.log(counts)) * self.idf[columns]
+        weights /= np.sqrt(np.bincount(documents, weights ** 2, minlength=len(texts)))[documents]
+        starts = np.flatnonzero(np.r_[True, documents[1:] != documents[:-1]])
+        scores[documents[starts]] += np.add.reduceat(weights[:, None] * self.coefficients[columns], starts, axis=0)
+        has_terms = np.zeros(len(texts), dtype=bool)
+        has_terms[documents[starts]] = True
+        return scores, has_terms
+
+    def _known_terms(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """:returns the document and vocabulary column of every occurrence of a known term in the texts."""
+        documents, terms = [], []
+        for document, text in enumerate(texts):
+            text_terms = _terms_of(text[:MAX_MESSAGE_LENGTH])
+            terms.extend(text_terms)
+            documents.extend([document] * len(text_terms))
+        if not terms:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        terms = np.array(terms)
+        columns = np.minimum(np.searchsorted(self.vocabulary, terms), len(self.vocabulary) - 1)
+        known = self.vocabulary[columns] == terms
+        return np.array(documents, dtype=np.int64)[known], columns[known]
+
+
+def _terms_of(text: str) -> List[str]:
+    tokens = _TOKEN_PATTERN.findall(text.lower())
+    terms = list(tokens)
+    for n in range(2, _NGRAM_RANGE[1] + 1):
+        terms.extend(' '.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+    return terms
+
+
+def train(texts: Sequence[str], request_types: Sequence[str], min_document_frequency: int = 2) -> LearnedClassifier:
+    """fits the classifier to the texts of requests and their types."""
+    vectorizer, model = _fit(texts, request_types, min_document_frequency)
+    return _from_fitted(vectorizer, model)
+
+
+def _fit(texts: Sequence[str], request_types: Sequence[str], min_document_frequency: int = 2):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
+    vectorizer = TfidfVectorizer(
+        ngram_range=_NGRAM_RANGE, min_df=min_document_frequency, sublinear_tf=True, dtype=np.float32
+    )
+    features = vectorizer.fit_transform([t[:MAX_MESSAGE_LENGTH] for t in texts])
+    model = LogisticRegression(C=10., max_iter=1000)
+    model.fit(features, request_types)
+    return vectorizer, model
+
+
+def _from_fitted(vectorizer, model) -> LearnedClassifier:
+    terms = vectorizer.get_feature_names_out()
+    order = np.argsort(terms)
+    coefficients = model.coef_.T
+    intercepts = model.intercept_
+    if len(model.classes_) == 2:
+        # a binary model only scores the second class, against a score of zero for the first.
+        coefficients = np.hstack([np.zeros_like(coefficients), coefficients])
+        intercepts = np.r_[0., intercepts]
+    return LearnedClassifier(
+        vocabulary=np.array(terms[order], dtype=str),
+        idf=vectorizer.idf_[order].astype(np.float32),
+        coefficients=coefficients[order].astype(np.float32),
+        intercepts=intercepts.astype(np.float32),
+        classes=model.classes_,
+    )
+
+
+def read_labeled_tickets(csv_path: str) -> Tuple[List[str], List[str]]:
+    """:returns the details of every ticket in the csv and its request type, named like RequestTypes names it."""
+    with open(csv_path, newline='', encoding='utf-8') as file:
+        rows = list(csv.DictReader(file))
+    return [row['details'] for row in rows], [row['request_type'].upper() for row in rows]
+
+
+def split_holdout(texts: Sequence[str], labels: Sequence[str], holdout_fraction: float, seed: int = 0):
+    """:returns the texts and labels to train on and the ones held out, split at random."""
+    indices = list(range(len(texts)))
+    random.Random(seed).shuffle(indices)
+    held_out = set(indices[:int(len(indices) * holdout_fraction)])
+    train_split = [(texts[i], labels[i]) for i in range(len(texts)) if i not in held_out]
+    holdout_split = [(texts[i], labels[i]) for i in range(len(texts)) if i in held_out]
+    return [list(column) for column in zip(*train_split)], [list(column) for column in zip(*holdout_split)]
+
+
+def _report(classifier: LearnedClassifier, texts: List[str], labels: List[str]) -> None:
+    predictions = [request_type for request_type, _ in classifier.classify_batch(texts)]
+    print(f"holdout accuracy: {_accuracy(predictions, labels):.3f} over {len(texts)} tickets, "
+          f"{predictions.count(RequestTypes.UNKNOWN)} left unknown")
+    keyword_accuracy = _accuracy([attempt_to_classify(t) for t in texts], labels)
+    print(f"keyword rules accuracy on the same tickets: {keyword_accuracy:.3f}")
+    for (label, prediction), count in sorted(Counter(zip(labels, predictions)).items()):
+        if label != prediction:
+            print(f"  {count} {label} classified as {prediction}")
+
+    single = []
+    for text in texts:
+        start = time.perf_counter()
+        classifier.classify(text)
+        single.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    classifier.classify_batch(texts)
+    batch = time.perf_counter() - start
+    print(f"single message: {statistics.median(single) * 1e6:.0f}us median, "
+          f"{sorted(single)[int(len(single) * .99)] * 1e6:.0f}us p99")
+    print(f"batch of {len(texts)}: {batch / len(texts) * 1e6:.1f}us per message")
+
+
+def _accuracy(predictions: Iterable[str], labels: Iterable[str]) -> float:
+    pairs = list(zip(predictions, labels))
+    return sum(p == l for p, l in pairs) / len(pairs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Trains the classifier of requests the keyword rules miss.')
+    parser.add_argument('csv_path', help='a csv of tickets with "details" and "request_type" columns')
+    parser.add_argument('model_directory', help='where to save the model')
+    parser.add_argument('--holdout', type=float, default=.2, help='the fraction of tickets to evaluate on')
+    parser.add_argument('--min-df', type=int, default=2, help='in how many tickets a term must appear to be kept')
+    args = parser.parse_args()
+
+    texts, labels = read_labeled_tickets(args.csv_path)
+    (train_texts, train_labels), (holdout_texts, holdout_labels) = split_holdout(texts, labels, args.holdout)
+    classifier = train(train_texts, train_labels, args.min_df)
+    classifier.save(args.model_directory)
+    classifier = LearnedClassifier.load(args.model_directory)
+    size = sum(os.path.getsize(os.path.join(args.model_directory, f"{name}.npy")) for name in _ARRAY_NAMES)
+    print(f"saved {len(classifier.vocabulary)} terms and {len(classifier.classes)} classes "
+          f"to {args.model_directory} ({size / 1024:.0f}KB)")
+    _report(classifier, holdout_texts, holdout_labels)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+Collects the classifications asked for concurrently by the bot's threads into micro-batches for a single inference
+worker, so that a model that classifies many messages in about the time it classifies one, like a transformer,
+is not run once per message.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent import futures
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from src import instrumentation
+
+batching_logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_WAIT_SECONDS = .005
+# a message still not classified by then is given up on, rather than holding up the thread that handles it forever.
+# long enough for the first message, which waits for the model to warm up.
+DEFAULT_RESULT_TIMEOUT_SECONDS = 10.
+
+_STOP = object()
+
+_batch_inference_time = instrumentation.histogram(
+    'micro_batch_inference', 'Time taken by the model to classify a micro-batch of messages.'
+)
+_batch_wait_time = instrumentation.histogram(
+    'micro_batch_wait', 'Time a message waited for its micro-batch to be classified.'
+)
+_batched_messages = instrumentation.counter('micro_batched_messages', 'Messages classified in micro-batches.')
+_batches = instrumentation.counter('micro_batches', 'Micro-batches classified.')
+
+
+class MicroBatchingClassifier(object):
+    """
+    Classifies messages with a model that classifies a batch of them at once, on an inference worker thread of its own.
+    The worker takes the first message waiting and whatever others arrive within max_wait_seconds of it, up to
+    max_batch_size, so that a message waits at most max_wait_seconds for others when the bot is quiet, and batches
+    fill up without waiting when it is busy.
+    The worker starts with the first classification in a process, after warming the model up, and is stopped when the
+    process exits. A classification that takes longer than result_timeout_seconds raises a
+    concurrent.futures.TimeoutError, and the worker skips its message if it did not get to it yet.
+    """
+
+    def __init__(
+            self, predict_batch: Callable[[Sequence[str]], List[Tuple[str, float]]],
+            max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait_seconds: float = DEFAULT_MAX_WAIT_SECONDS,
+            warm_up: Optional[Callable[[], None]] = None, name: str = 'inference-worker',
+            result_timeout_seconds: float = DEFAULT_RESULT_TIMEOUT_SECONDS
+    ):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.warm_up = warm_up
+        self.name = name
+        self.result_timeout_seconds = result_timeout_seconds
+        self.batches = 0
+        self.batched_messages = 0
+        self._queue: Optional[queue.Queue] = None
+        self._worker: Optional[threading.Thread] = None
+        self._worker_pid = None
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def __call__(self, text: str) -> str:
+        """classifies the text into a request type, so that the classifier can stand in for attempt_to_classify."""
+        return self.classify(text)[0]
+
+    def classify(self, text: str) -> Tuple[str, float]:
+        """:returns the request type of the text and the model's confidence in it, once its micro-batch is done."""
+        return self._result_of(self.submit(text), time.monotonic() + self.result_timeout_seconds)
+
+    def classify_batch(self, texts: Sequence[str]) -> List[Tuple[str, float]]:
+        """:returns the request type of every text and the model's confidence in it, batched with everyone else's."""
+        deadline = time.monotonic() + self.result_timeout_seconds
+        return [self._result_of(future, deadline) for future in [self.submit(text) for text in texts]]
+
+    def submit(self, text: str) -> 'Future[Tuple[str, float]]':
+        future = Future()
+        # under the lock, so that a close cannot stop the worker between finding its queue and putting the message.
+        with self._lock:
+            self._ensure_worker()
+            self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    @staticmethod
+    def _result_of(future: Future, deadline: float) -> Tuple[str, float]:
+        try:
+            return future.result(timeout=max(deadline - time.monotonic(), 0.))
+        # only an alias of the builtin TimeoutError from python 3.11 on.
+        except futures.TimeoutError:
+            future.cancel()
+            raise
+
+    @property
+    def average_batch_size(self) -> float:
+        return self.batched_messages / self.batches if self.batches else 0.
+
+    def close(self) -> None:
+        """classifies the messages already submitted and stops the worker. classifying again starts a new one."""
+        with self._lock:
+            worker, pending = self._worker, self._queue
+            self._worker, self._queue, self._worker_pid = None, None, None
+            if worker is not None and worker.is_alive():
+                pending.put(_STOP)
+        if worker is not None and worker.is_alive():
+            worker.join()
+
+    def _ensure_worker(self) -> None:
+        """starts the worker of this process, if it has none. called with the lock held."""
+        # a process forked from one that already classified inherits the queue, but not the worker.
+        if self._worker_pid != os.getpid():
+            self._queue = queue.Queue()
+            self._worker = threading.Thread(target=self._infer, args=(self._queue,), name=self.name, daemon=True)
+            self._worker.start()
+            self._worker_pid = os.getpid()
+
+    def _infer(self, pending: queue.Queue) -> None:
+        if self.warm_up is not None:
+            try:
+                self.warm_up()
+            except Exception as e:
+                batching_logger.exception(f"{self.name} failed to warm up, the first batches will be slower: {e}")
+        while True:
+            batch = self._next_batch(pending)
+            if not batch:
+                return
+            self._classify(batch)
+            if batch[-1] is _STOP:
+                return
+
+    def _next_batch(self, pending: queue.Queue) -> list:
+        """:returns the messages of the next batch, ending with _STOP if the worker should stop after it."""
+        first = pending.get()
+        if first is _STOP:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = pending.get(timeout=remaining) if remaining > 0 else pending.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item is _STOP:
+                break
+        return batch
+
+    def _classify(self, batch: list) -> None:
+        # the messages whose classification was given up on are cancelled, and skipped.
+        messages = [item for item in batch if item is not _STOP and item[1].set_running_or_notify_cancel()]
+        if not messages:
+            return
+        start = time.perf_counter()
+        for _, _, submitted_at in messages:
+            _batch_wait_time.observe(start - submitted_at)
+        try:
+            results = self.predict_batch([text for text, _, _ in messages])
+        except Exception as e:
+            batching_logger.exception(f"{self.name} failed to classify a batch of {len(messages)}: {e}")
+            for _, future, _ in messages:
+                future.set_exception(e)
+            return
+        finally:
+            _batch_inference_time.observe(time.perf_counter() - start)
+        if len(results) != len(messages):
+            error = RuntimeError(f"{self.name} got {len(results)} results for a batch of {len(messages)}")
+            batching_logger.error(str(error))
+            for _, future, _ in messages:
+                future.set_exception(error)
+            return
+        self.batches += 1
+        self.batched_messages += len(messages)
+        _batches.inc()
+        _batched_messages.inc(amount=len(messages))
+        for (_, future, _), result in zip(messages, results):
+            future.set_result(result)
@@ -1,50 +1,162 @@
 """Classifies users' security requests via regex matching."""
+import functools
 import re
-from typing import Callable, Any
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
+from src import instrumentation
 from src.parsing.constants import RequestTypes
+from src.parsing.request_registry import (
+    extractor_of, register_extraction_plan, register_trigger_rule, registered_schemas, rules_version, schema_of
+)
 from src.parsing.requests import (
     UserRequest, UnIdentifiedUserRequest, CloudResourceAccessRequest,
     DataExportRequest, DevToolInstallRequest, FireWallChangeRequest, NetworkAccessRequest,
     PermissionsChangeRequest, VendorApprovalRequest
 )
 
+MAX_MESSAGE_LENGTH = 4000
+"""
+Messages are only parsed up to this many characters, which bounds the worst case running time of every pattern.
+Slack recommends keeping messages under 4,000 characters, so real requests are never cut short.
+"""
+
+
+def _within_message_budget(parser: Callable[..., Any]) -> Callable[..., Any]:
+    """Makes a parser ignore whatever part of its text exceeds MAX_MESSAGE_LENGTH."""
+    @functools.wraps(parser)
+    def bounded_parser(text: str) -> Any:
+        return parser(text[:MAX_MESSAGE_LENGTH])
+    return bounded_parser
+
+
+_classification_time = instrumentation.histogram('classification', 'Time taken to classify a message.')
+_extraction_time = instrumentation.histogram(
+    'extraction', 'Time taken to parse a message into a request of its type.', ['request_type']
+)
+
 
+@instrumentation.timed(_classification_time)
+@_within_message_budget
 def attempt_to_classify(text: str) -> str:
-    if __firewall_preamble.search(text):
-        return RequestTypes.FIREWALL_CHANGE
-    if 'install' in text:
-        return RequestTypes.DEVTOOL_INSTALL
-    if 'role' in text:
-        return RequestTypes.PERMISSION_CHANGE
-    if 'export' in text:
-        return RequestTypes.DATA_EXPORT
-    if 'access' in text.lower():
-        return RequestTypes.CLOUD_ACCESS
-    if __allow_traffic.search(text):
-        return RequestTypes.NETWORK_ACCESS
-    if __provide_services.search(text):
-        return RequestTypes.VENDOR_APPROVAL
+    """
+    Classifies a request in a single scan of the text.
+    Every trigger rule is folded into one keyword alternation which is matched against a lowercased copy
+    of the text, and the highest priority rule found wins, so the result is identical to
+    attempt_to_classify_sequentially. Texts that are not pure ASCII fall back to the sequential rules,
+    since lowercasing them does not preserve the semantics of the case-insensitive regexes, and so do all texts
+    while a rule without keywords is registered.
+    """
+    rules = _classification_rules()
+    if not text.isascii() or not rules.are_keyworded:
+        return attempt_to_classify_sequentially(text)
+    lowered_text = text.lower()
+    best_priority = len(rules.request_types)
+    refuted_priorities = set()
+    keyword_match = rules.keywords.search(lowered_text)
+    while keyword_match is not None:
+        position = keyword_match.start()
+        priority, confirmation = rules.keyword_rules[keyword_match.group()]
+        if priority < best_priority and priority not in refuted_priorities:
+            if confirmation(text, position):
+                best_priority = priority
+                if best_priority == 0:
+                    break
+            elif confirmation.refutes_rule:
+                refuted_priorities.add(priority)
+        # keywords may overlap, so the next search starts right after this keyword's first character.
+        keyword_match = rules.keywords.search(lowered_text, position + 1)
+    if best_priority < len(rules.request_types):
+        return rules.request_types[best_priority]
     return RequestTypes.UNKNOWN
 
 
+@_within_message_budget
+def attempt_to_classify_sequentially(text: str) -> str:
+    """Classifies a request by checking every trigger rule one after the other, in order of priority."""
+    rules = _classification_rules()
+    for priority, rule in enumerate(rules.rules):
+        if rule.matches(text):
+            return rules.request_types[priority]
+    return RequestTypes.UNKNOWN
+
+
+def score_request_types(text: str) -> Dict[str, float]:
+    """
+    Scores every request type whose trigger rule matches the text by how specific its rule is, see _TriggerRule.
+    When rules of several types match, like 'access' and 'install' in "I need access to install X", every one of them
+    scores half of that, as only the priority of the rules tells them apart. Types whose rules do not match are left out.
+    """
+    rules = _classification_rules()
+    triggered = __triggered_priorities(rules, text)
+    return {rules.request_types[priority]: __score_of(rules, priority, triggered) for priority in triggered}
+
+
+@instrumentation.timed(_classification_time)
+def classify_with_confidence(text: str) -> Tuple[str, float]:
+    """
+    :returns what attempt_to_classify would, and how confident the rules are in it by score_request_types,
+    which is 0 for UNKNOWN.
+    """
+    rules = _classification_rules()
+    triggered = __triggered_priorities(rules, text)
+    if not triggered:
+        return RequestTypes.UNKNOWN, 0.
+    return rules.request_types[triggered[0]], __score_of(rules, triggered[0], triggered)
+
+
+def __score_of(rules: '_ClassificationRules', priority: int, triggered: List[int]) -> float:
+    strength = rules.rules[priority].strength
+    return strength / 2 if len(triggered) > 1 else strength
+
+
+def __triggered_priorities(rules: '_ClassificationRules', text: str) -> List[int]:
+    """:returns the priorities of all the trigger rules that match the text, highest first."""
+    text = text[:MAX_MESSAGE_LENGTH]
+    if not text.isascii() or not rules.are_keyworded:
+        return [priority for priority, rule in enumerate(rules.rules) if rule.matches(text)]
+    lowered_text = text.lower()
+    triggered, refuted = set(), set()
+    keyword_match = rules.keywords.search(lowered_text)
+    while keyword_match is not None:
+        position = keyword_match.start()
+        priority, confirmation = rules.keyword_rules[keyword_match.group()]
+        if priority not in triggered and priority not in refuted:
+            if confirmation(text, position):
+                triggered.add(priority)
+            elif confirmation.refutes_rule:
+                refuted.add(priority)
+        keyword_match = rules.keywords.search(lowered_text, position + 1)
+    return sorted(triggered)
+
+
 def construct_according_to_classification(classification: str, txt: str) -> UserRequest:
-    if classification == RequestTypes.CLOUD_ACCESS:
-        return attempt_to_construct_cloud_access(txt)
-    elif classification == RequestTypes.DATA_EXPORT:
-        return attempt_to_construct_data_export(txt)
-    elif classification == RequestTypes.DEVTOOL_INSTALL:
-        return attempt_to_construct_devtool_install(txt)
-    elif classification == RequestTypes.FIREWALL_CHANGE:
-        return attempt_to_construct_firewall_change(txt)
-    elif classification == RequestTypes.NETWORK_ACCESS:
-        return attempt_to_construct_network_access(txt)
-    elif classification == RequestTypes.PERMISSION_CHANGE:
-        return attempt_to_construct_permissions_change(txt)
-    elif classification == RequestTypes.VENDOR_APPROVAL:
-        return attempt_to_construct_vendor_approval(txt)
-    else:
+    schema = schema_of(classification)
+    if schema is None or schema.construct is None:
         return UnIdentifiedUserRequest()
+    start = time.perf_counter()
+    try:
+        return schema.construct(txt)
+    finally:
+        _extraction_time.observe(time.perf_counter() - start, classification)
+
+
+def complete_missing_fields(pending_request: UserRequest, txt: str) -> UserRequest:
+    """
+    Fills in the fields a request pending in a thread is missing from a reply in that thread. Only the patterns of the
+    missing fields are searched for, so every reply costs less than the one before it, and a reply to a request that
+    misses nothing costs nothing. The fields the request has keep their values, whatever the reply says about them.
+    Request types that have no extraction plan are parsed in full and merged into the pending request.
+    """
+    schema = schema_of(pending_request.request_type)
+    plan = None if schema is None else schema.extraction_plan
+    if plan is None:
+        return pending_request.merge_with(construct_according_to_classification(pending_request.request_type, txt))
+    start = time.perf_counter()
+    try:
+        return plan.complete(pending_request, txt[:MAX_MESSAGE_LENGTH])
+    finally:
+        _extraction_time.observe(time.perf_counter() - start, pending_request.request_type)
 
 
 def extract_if_found(regex: re.Pattern, text: str, extractor: Callable[[re.Match], Any]) -> Any:
@@ -55,146 +167,172 @@ def extract_if_found(regex: re.Pattern, text: str, extractor: Callable[[re.Match
         return None
 
 
-def attempt_to_construct_cloud_access(text: str) -> CloudResourceAccessRequest:
-    access_reason = extract_if_found(
-        __request_justification_pattern, text,
-        lambda m: m.group('justification')
+class _Field(object):
+    """
+    Extracts a field of a request: the pattern that finds it, and how to read the field's value off its match.
+    A field may be gated by words that every match of its pattern holds one of, in lowercase, or by a cheaper pattern
+    that every match of its pattern holds a match of, so that the pattern is not searched for in texts without them.
+    When a match never starts more than max_lead characters before the first of the words, the search starts there.
+    Gates only pay off for patterns that are slow to fail or rarely match, the other fields are searched right away.
+    """
+
+    def __init__(
+            self, pattern: re.Pattern, read: Callable[[re.Match], Any], required_words: Sequence[str] = (),
+            max_lead: Optional[int] = None, required_pattern: Optional[re.Pattern] = None
+    ):
+        self.pattern = pattern
+        self.read = read
+        self.required_words = required_words
+        self.max_lead = max_lead
+        self.required_pattern = required_pattern
+        self.is_gated = bool(required_words) or required_pattern is not None
+
+    def search_start(self, text: str, lowered_text: str) -> Optional[int]:
+        """:returns where in the text a match may start, or None if the text cannot hold one."""
+        if self.required_pattern is not None and self.required_pattern.search(text) is None:
+            return None
+        if not self.required_words:
+            return 0
+        positions = [p for p in (lowered_text.find(word) for word in self.required_words) if p >= 0]
+        if not positions:
+            return None
+        return 0 if self.max_lead is None else max(0, min(positions) - self.max_lead)
+
+
+class _ExtractionPlan(object):
+    """
+    Extracts every field of a type of request, in the order of its constructor.
+    The text is lowercased at most once, for the gates of all the fields, so that only the patterns that can match are
+    searched for, and each from where its match can start. The results are those of extract_sequentially, which
+    searches the whole text for every field.
+    Lowercasing preserves the semantics of the case-insensitive patterns unless the text holds one of the few
+    characters which fold into ascii letters, and such texts are extracted sequentially.
+    """
+
+    def __init__(self, request_class: type, fields: List[_Field]):
+        self.request_class = request_class
+        self.fields = fields
+
+    def extract(self, text: str) -> UserRequest:
+        return self.request_class(*self._extract_missing([None] * len(self.fields), text))
+
+    def complete(self, request: UserRequest, text: str) -> UserRequest:
+        """:returns the request with the fields it is missing extracted from the text, searching for those alone."""
+        values = [getattr(request, name) for name in self.request_class._field_details]
+        if None not in values:
+            return request
+        return self.request_class(*self._extract_missing(values, text))
+
+    def _extract_missing(self, values: list, text: str) -> list:
+        """fills in the values that are None with the fields extracted from the text, in place."""
+        if not text.isascii() and _ASCII_FOLDING_CHARACTERS.search(text):
+            for index, field in enumerate(self.fields):
+                if values[index] is None:
+                    values[index] = extract_if_found(field.pattern, text, field.read)
+            return values
+        lowered_text = None
+        for index, field in enumerate(self.fields):
+            if values[index] is not None:
+                continue
+            if field.is_gated:
+                if lowered_text is None:
+                    lowered_text = text.lower()
+                start = field.search_start(text, lowered_text)
+                match = None if start is None else field.pattern.search(text, start)
+            else:
+                match = field.pattern.search(text)
+            if match is not None:
+                values[index] = field.read(match)
+        return values
+
+    def extract_sequentially(self, text: str) -> UserRequest:
+        return self.request_class(*[extract_if_found(field.pattern, text, field.read) for field in self.fields])
+
+    def searches(self, text: str) -> int:
+        """:returns how many pattern searches extract makes over the text, counting those of the gates."""
+        if not text.isascii() and _ASCII_FOLDING_CHARACTERS.search(text):
+            return len(self.fields)
+        lowered_text = text.lower()
+        return sum(
+            (field.required_pattern is not None) + (field.search_start(text, lowered_text) is not None)
+            for field in self.fields
         )
-    sensitivity = extract_if_found(
-        __data_sensitivity_pattern, text,
-        lambda m: m.group('sensitivity')
-        )
-    return CloudResourceAccessRequest(access_reason, sensitivity)
 
 
-def attempt_to_construct_data_export(text: str) -> DataExportRequest:
-    export_reason = extract_if_found(
-        __request_justification_pattern, text,
-        lambda m: m.group('justification')
-        )
-    is_sensitive = extract_if_found(
-        __data_sensitivity_pattern, text,
-        lambda m: not m.group('sensitivity').lower().startswith('no')
-        )
-    destination = extract_if_found(
-        __export_destination_pattern, text,
-        lambda m: m.group('destination')
-        )
+# the only characters that re.IGNORECASE matches with ascii letters: dotted and dotless i, long s and kelvin sign.
+_ASCII_FOLDING_CHARACTERS = re.compile('[\u0130\u0131\u017f\u212a]')
+
+
+@extractor_of(RequestTypes.CLOUD_ACCESS)
+@_within_message_budget
+def attempt_to_construct_cloud_access(text: str) -> CloudResourceAccessRequest:
+    return schema_of(RequestTypes.CLOUD_ACCESS).extraction_plan.extract(text)
+
 
-    return DataExportRequest(export_reason, is_sensitive, destination)
+@extractor_of(RequestTypes.DATA_EXPORT)
+@_within_message_budget
+def attempt_to_construct_data_export(text: str) -> DataExportRequest:
+    return schema_of(RequestTypes.DATA_EXPORT).extraction_plan.extract(text)
 
 
+@extractor_of(RequestTypes.DEVTOOL_INSTALL)
+@_within_message_budget
 def attempt_to_construct_devtool_install(text: str) -> DevToolInstallRequest:
-    installation_reason = extract_if_found(
-        __request_justification_pattern, text,
-        lambda m: m.group('justification')
-        )
-    team_leader_approval = extract_if_found(__approval_pattern, text, lambda m: m.group('approval'))
-    return DevToolInstallRequest(installation_reason, team_leader_approval)
+    return schema_of(RequestTypes.DEVTOOL_INSTALL).extraction_plan.extract(text)
 
 
+@extractor_of(RequestTypes.FIREWALL_CHANGE)
+@_within_message_budget
 def attempt_to_construct_firewall_change(text: str) -> FireWallChangeRequest:
-    firewall_change_source = extract_if_found(__firewall_source, text, lambda m: m.group('source'))
-    firewall_change_destination = extract_if_found(
-        __firewall_destination, text,
-        lambda m: f"{m.group('ip')}:{m.group('port')}"
-        )
-    firewall_change_reason = extract_if_found(
-        __request_justification_pattern, text,
-        lambda m: m.group('justification')
-        )
-    return FireWallChangeRequest(
-        firewall_change_reason, firewall_change_source,
-        firewall_change_destination
-        )
+    return schema_of(RequestTypes.FIREWALL_CHANGE).extraction_plan.extract(text)
 
 
+@extractor_of(RequestTypes.NETWORK_ACCESS)
+@_within_message_budget
 def attempt_to_construct_network_access(text: str) -> NetworkAccessRequest:
-    network_access_reason = extract_if_found(
-        __request_justification_pattern, text,
-        lambda m: m.group('justification')
-        )
-    network_access_source = extract_if_found(__network_cidr_pattern, text, lambda m: m.group('ip'))
-    is_sensitive = extract_if_found(
-        __data_sensitivity_pattern, text,
-        lambda m: not m.group('sensitivity').lower().startswith('no')
-        )
-    firewall_change_destination = extract_if_found(
-        __firewall_destination, text,
-        lambda m: f"{m.group('ip')}:{m.group('port')}"
-        )
-    return NetworkAccessRequest(
-        network_access_reason, network_access_source,
-        firewall_change_destination
-        )
+    return schema_of(RequestTypes.NETWORK_ACCESS).extraction_plan.extract(text)
 
 
+@extractor_of(RequestTypes.PERMISSION_CHANGE)
+@_within_message_budget
 def attempt_to_construct_permissions_change(text: str) -> PermissionsChangeRequest:
-    permissions_reason = extract_if_found(
-        __request_justification_pattern, text,
-        lambda m: m.group('justification')
-        )
-    duration = extract_if_found(__duration_pattern, text, lambda m: m.group('duration'))
-    manager_approval = extract_if_found(__approval_pattern, text, lambda m: m.group('approval'))
-    cloud_resource = extract_if_found(
-        __cloud_resource_pattern, text,
-        lambda m: m.group('cloud_resource')
-        )
-    role = extract_if_found(__access_role_pattern, text, lambda m: m.group('role'))
-
-    return PermissionsChangeRequest(
-        permissions_reason, duration, manager_approval, cloud_resource,
-        role
-        )
+    return schema_of(RequestTypes.PERMISSION_CHANGE).extraction_plan.extract(text)
 
 
+@extractor_of(RequestTypes.VENDOR_APPROVAL)
+@_within_message_budget
 def attempt_to_construct_vendor_approval(text: str) -> VendorApprovalRequest:
-    vendor_name = extract_if_found(
-        __vendor_name_pattern, text,
-        lambda m: m.group('vendor_name').strip()
-        )
-    pii_involvement = extract_if_found(
-        __pii_involvement_pattern, text,
-        lambda m: m.group('pii_involvement').strip()
-        )
-    vendor_security_questionnaire_result = extract_if_found(
-        __vendor_security_questionnaire_pattern,
-        text, lambda m: 'pass' in m.group(
-            'score'
-        ).strip().lower()
-        )
-    legal_review_status = extract_if_found(
-        __legal_review_pattern, text, lambda m: all(
-            [negative_indication not in m.group(0).strip().lower() for negative_indication in
-                ['don\'t', 'invalid']]
-        )
-        )
-    return VendorApprovalRequest(
-        vendor_name, vendor_security_questionnaire_result, pii_involvement,
-        legal_review_status
-        )
+    return schema_of(RequestTypes.VENDOR_APPROVAL).extraction_plan.extract(text)
 
 
 __allow_traffic = re.compile(r'allow\s*\w*\s*traffic', flags=re.IGNORECASE)
-__provide_services = re.compile(r'provides? (\w*\s*)+services', flags=re.IGNORECASE)
+# only the first 'provide' in every run of words is considered, since any later one would find the same services.
+__provide_services = re.compile(
+    r'(?:^|(?<=[^\w\s]))(?=(?P<lead>[\w\s]*?provides? ))(?P=lead)[\w\s]*services',
+    flags=re.IGNORECASE
+)
 
 __firewall_preamble = re.compile(
     r'temporary firewall rule|allow ssh to external ip',
     flags=re.IGNORECASE
     )
-__firewall_source = re.compile(r'from (?P<source>(\w+\s*)*)', flags=re.IGNORECASE)
+__firewall_source = re.compile(r'from (?P<source>(?:\w[\w\s]*)?)', flags=re.IGNORECASE)
+# the address must end the run of words that holds the 'to', which is checked once per run before looking for it.
 __firewall_destination = re.compile(
-    r'to (\w+\s+)*(?P<ip>(\d+\.){3}\d+)( on port |:)(?P<port>\d+)',
+    r'(?:^|(?<=[^\w\s]))(?=[\w\s]*?(?<!\S)(?:\d+\.){3}\d+(?: on port |:)\d+)'
+    r'[\w\s]*?to (\w+\s+)*(?P<ip>(\d+\.){3}\d+)( on port |:)(?P<port>\d+)',
     flags=re.IGNORECASE
     )
 
+# the justification spans the rest of a run of words that ends the sentence. matching starts only at the
+# beginning of such a run, which is checked once, so the pattern never rescans the same run.
 __request_justification_pattern = re.compile(
-    r'((for)|(to)) (?P<justification>(\w+\s*)+)(\.|$)',
+    r'(?:^|(?<=[^\w\s]))(?=[\w\s]*(?:\.|$))[\w\s]*?(?:for|to) (?P<justification>\w[\w\s]*)(?:\.|$)',
     flags=re.IGNORECASE
     )
 
 __data_sensitivity_pattern = re.compile(
-    r'data classification: (?P<sensitivity>((\w|\.)+\s*)+|((no )?direct identifiers present))',
+    r'data classification: (?P<sensitivity>[\w.][\w.\s]*)',
     flags=re.IGNORECASE
 )
 __pii_involvement_pattern = re.compile(
@@ -224,7 +362,11 @@ __network_cidr_pattern = re.compile(
     flags=re.IGNORECASE
     )
 
-__vendor_name_pattern = re.compile(r'(?P<vendor_name>((\w|,)+\s+)+)provide', flags=re.IGNORECASE)
+# the vendor name starts a run of words and commas, so matching only starts at the beginning of such a run.
+__vendor_name_pattern = re.compile(
+    r'(?:^|(?<=[^\w,\s]))\s*(?P<vendor_name>[\w,][\w,\s]*\s)provide',
+    flags=re.IGNORECASE
+)
 __vendor_security_questionnaire_pattern = re.compile(
     r'questionnaire with a (?P<score>(\w)+\s*) score', flags=re.IGNORECASE
 )
@@ -232,3 +374,172 @@ __legal_review_pattern = re.compile(
     r'(don\'t )?have a(n in| )valid soc (2|II) type (2|II) report',
     flags=re.IGNORECASE
     )
+
+
+# a field is only gated in the plans of the request types whose messages usually lack it, judging by the ticket archive:
+# elsewhere the gate is extra work on top of a search that is bound to happen anyway.
+__justification_field = _Field(__request_justification_pattern, lambda m: m.group('justification'))
+__sensitivity_field = _Field(__data_sensitivity_pattern, lambda m: m.group('sensitivity'))
+__gated_is_sensitive_field = _Field(
+    __data_sensitivity_pattern, lambda m: not m.group('sensitivity').lower().startswith('no'),
+    ['data classification: '], max_lead=0
+)
+__approval_field = _Field(__approval_pattern, lambda m: m.group('approval'))
+__gated_approval_field = _Field(__approval_pattern, lambda m: m.group('approval'), ['jira ticket: '], max_lead=0)
+__firewall_destination_field = _Field(__firewall_destination, lambda m: f"{m.group('ip')}:{m.group('port')}")
+# the address and port are cheap to look for, while the whole pattern is slow to fail on texts that have neither.
+__gated_firewall_destination_field = _Field(
+    __firewall_destination, lambda m: f"{m.group('ip')}:{m.group('port')}",
+    required_pattern=re.compile(r'(?:\d+\.){3}\d+(?: on port |:)\d+', flags=re.IGNORECASE)
+)
+
+register_extraction_plan(RequestTypes.CLOUD_ACCESS, _ExtractionPlan(CloudResourceAccessRequest, [
+    __justification_field,
+    __sensitivity_field,
+]))
+register_extraction_plan(RequestTypes.DATA_EXPORT, _ExtractionPlan(DataExportRequest, [
+    __justification_field,
+    __gated_is_sensitive_field,
+    _Field(__export_destination_pattern, lambda m: m.group('destination')),
+]))
+register_extraction_plan(RequestTypes.DEVTOOL_INSTALL, _ExtractionPlan(DevToolInstallRequest, [
+    __justification_field,
+    __gated_approval_field,
+]))
+register_extraction_plan(RequestTypes.FIREWALL_CHANGE, _ExtractionPlan(FireWallChangeRequest, [
+    __justification_field,
+    _Field(__firewall_source, lambda m: m.group('source')),
+    __firewall_destination_field,
+]))
+register_extraction_plan(RequestTypes.NETWORK_ACCESS, _ExtractionPlan(NetworkAccessRequest, [
+    __justification_field,
+    _Field(__network_cidr_pattern, lambda m: m.group('ip')),
+    __gated_firewall_destination_field,
+]))
+register_extraction_plan(RequestTypes.PERMISSION_CHANGE, _ExtractionPlan(PermissionsChangeRequest, [
+    __justification_field,
+    _Field(__duration_pattern, lambda m: m.group('duration')),
+    __approval_field,
+    _Field(__cloud_resource_pattern, lambda m: m.group('cloud_resource')),
+    _Field(__access_role_pattern, lambda m: m.group('role')),
+]))
+register_extraction_plan(RequestTypes.VENDOR_APPROVAL, _ExtractionPlan(VendorApprovalRequest, [
+    _Field(__vendor_name_pattern, lambda m: m.group('vendor_name').strip()),
+    _Field(__vendor_security_questionnaire_pattern, lambda m: 'pass' in m.group('score').strip().lower()),
+    _Field(
+        __pii_involvement_pattern, lambda m: m.group('pii_involvement').strip(),
+        ['direct identifiers present', 'pii involve'], max_lead=len('no ')
+    ),
+    _Field(
+        __legal_review_pattern,
+        lambda m: all(negative not in m.group(0).strip().lower() for negative in ["don't", 'invalid']),
+        ['valid soc '], max_lead=len("don't have an in")
+    ),
+]))
+
+
+
+class _KeywordConfirmation(object):
+    """
+    Checks whether the rule triggered by a keyword really matches the text.
+    A failed check refutes the rule altogether only if it searched the whole text rather than the keyword's position.
+    """
+
+    def __init__(self, check: Callable[[str, int], bool], refutes_rule: bool):
+        self.check = check
+        self.refutes_rule = refutes_rule
+
+    def __call__(self, text: str, position: int) -> bool:
+        return self.check(text, position)
+
+
+def __case_sensitive_keyword(keyword: str) -> _KeywordConfirmation:
+    return _KeywordConfirmation(lambda text, position: text.startswith(keyword, position), refutes_rule=False)
+
+
+def __searched_by(pattern: re.Pattern) -> _KeywordConfirmation:
+    return _KeywordConfirmation(lambda text, position: pattern.search(text) is not None, refutes_rule=True)
+
+
+__always_confirmed = _KeywordConfirmation(lambda text, position: True, refutes_rule=False)
+
+
+class _TriggerRule(object):
+    """
+    Recognizes the messages of a request type. Of all the rules that match a text, the one with the lowest priority
+    decides its type, and the strength of a rule is how specific it is, see score_request_types.
+    A rule only matches texts holding one of its keywords, in lowercase, and each keyword comes with a check of the rule
+    itself against the original text, so that attempt_to_classify can look for the keywords of all the rules at once.
+    """
+
+    def __init__(
+            self, priority: int, strength: float, matches: Callable[[str], bool],
+            keywords: Dict[str, _KeywordConfirmation]
+    ):
+        self.priority = priority
+        self.strength = strength
+        self.matches = matches
+        self.keywords = keywords
+
+
+class _ClassificationRules(object):
+    """
+    The trigger rules registered with the request schemas, in order of priority, and the keywords of all of them
+    folded into one alternation. Made again whenever anything is registered, see _classification_rules.
+    """
+
+    def __init__(self):
+        self.version = rules_version()
+        schemas = sorted(
+            (schema for schema in registered_schemas() if schema.trigger_rule is not None),
+            key=lambda schema: schema.trigger_rule.priority
+        )
+        self.request_types = [schema.request_type for schema in schemas]
+        self.rules = [schema.trigger_rule for schema in schemas]
+        # maps every lowercase keyword to the priority of the rule it triggers and a check of the rule itself
+        # against the original text.
+        self.keyword_rules = {
+            keyword: (priority, confirmation)
+            for priority, rule in enumerate(self.rules) for keyword, confirmation in rule.keywords.items()
+        }
+        self.are_keyworded = bool(self.rules) and all(rule.keywords for rule in self.rules)
+        # longer keywords come first so that a keyword is never shadowed by one of its own prefixes.
+        self.keywords = re.compile(
+            '|'.join(re.escape(k) for k in sorted(self.keyword_rules, key=len, reverse=True))
+        )
+
+
+_classification_rules_in_use: Optional[_ClassificationRules] = None
+
+
+def _classification_rules() -> _ClassificationRules:
+    global _classification_rules_in_use
+    if _classification_rules_in_use is None or _classification_rules_in_use.version != rules_version():
+        _classification_rules_in_use = _ClassificationRules()
+    return _classification_rules_in_use
+
+
+# a phrase or pattern is more telling than a word, and 'access', which matches in any case and is part of many requests
+# for something else, is the least telling.
+register_trigger_rule(RequestTypes.FIREWALL_CHANGE, _TriggerRule(
+    0, 1., lambda text: __firewall_preamble.search(text) is not None,
+    {'temporary firewall rule': __always_confirmed, 'allow ssh to external ip': __always_confirmed}
+))
+register_trigger_rule(RequestTypes.DEVTOOL_INSTALL, _TriggerRule(
+    1, .9, lambda text: 'install' in text, {'install': __case_sensitive_keyword('install')}
+))
+register_trigger_rule(RequestTypes.PERMISSION_CHANGE, _TriggerRule(
+    2, .9, lambda text: 'role' in text, {'role': __case_sensitive_keyword('role')}
+))
+register_trigger_rule(RequestTypes.DATA_EXPORT, _TriggerRule(
+    3, .9, lambda text: 'export' in text, {'export': __case_sensitive_keyword('export')}
+))
+register_trigger_rule(RequestTypes.CLOUD_ACCESS, _TriggerRule(
+    4, .8, lambda text: 'access' in text.lower(), {'access': __always_confirmed}
+))
+register_trigger_rule(RequestTypes.NETWORK_ACCESS, _TriggerRule(
+    5, 1., lambda text: __allow_traffic.search(text) is not None, {'allow': __searched_by(__allow_traffic)}
+))
+register_trigger_rule(RequestTypes.VENDOR_APPROVAL, _TriggerRule(
+    6, 1., lambda text: __provide_services.search(text) is not None, {'provide': __searched_by(__provide_services)}
+))
@@ -0,0 +1,84 @@
+"""
+Where every request type is registered: the class holding its fields, the rule that recognizes its messages, the
+extractor constructing it from a message and the rules estimating its security risk, one request or a column of them
+at a time. Each of them registers itself where it is defined, and everything that has to act per request type looks it
+up here with a single dict access, instead of comparing the type to every known type in turn.
+"""
+from typing import Callable, Dict, List, Optional, Type
+
+
+class RequestSchema(object):
+    """All there is to know about handling one type of request."""
+
+    def __init__(self, request_type: str):
+        self.request_type = request_type
+        self.request_class: Optional[Type] = None
+        # how the keyword rules recognize messages of the type and extract its fields, see regex_classifier.
+        self.trigger_rule: Optional[object] = None
+        self.extraction_plan: Optional[object] = None
+        self.construct: Optional[Callable[[str], object]] = None
+        self.calculate_risk: Optional[Callable[[object], float]] = None
+        # scores a DataFrame of valid requests of the type at once, see columnar_security_estimator.
+        self.calculate_column_risks: Optional[Callable[[object], object]] = None
+
+
+_SCHEMAS: Dict[str, RequestSchema] = {}
+_rules_version = 0
+
+
+def schema_of(request_type: str) -> Optional[RequestSchema]:
+    return _SCHEMAS.get(request_type)
+
+
+def registered_schemas() -> List[RequestSchema]:
+    """:returns the schemas of all the request types, in the order in which they were registered."""
+    return list(_SCHEMAS.values())
+
+
+def rules_version() -> int:
+    """goes up whenever anything is registered for a request type, so caches of what was made of it can tell."""
+    return _rules_version
+
+
+def _schema_to_register(request_type: str) -> RequestSchema:
+    global _rules_version
+    _rules_version += 1
+    if request_type not in _SCHEMAS:
+        _SCHEMAS[request_type] = RequestSchema(request_type)
+    return _SCHEMAS[request_type]
+
+
+def register_request_class(request_type: str, request_class: Type) -> None:
+    _schema_to_register(request_type).request_class = request_class
+
+
+def register_trigger_rule(request_type: str, trigger_rule: object) -> None:
+    _schema_to_register(request_type).trigger_rule = trigger_rule
+
+
+def register_extraction_plan(request_type: str, extraction_plan: object) -> None:
+    _schema_to_register(request_type).extraction_plan = extraction_plan
+
+
+def extractor_of(request_type: str) -> Callable:
+    """registers the decorated function as the one constructing requests of the type from a message."""
+    def register(construct: Callable[[str], object]) -> Callable[[str], object]:
+        _schema_to_register(request_type).construct = construct
+        return construct
+    return register
+
+
+def risk_rule_of(request_type: str) -> Callable:
+    """registers the decorated function as the one estimating the security risk of valid requests of the type."""
+    def register(calculate_risk: Callable[[object], float]) -> Callable[[object], float]:
+        _schema_to_register(request_type).calculate_risk = calculate_risk
+        return calculate_risk
+    return register
+
+
+def column_risk_rule_of(request_type: str) -> Callable:
+    """registers the decorated function as the one estimating the security risks of a column of valid requests."""
+    def register(calculate_column_risks: Callable[[object], object]) -> Callable[[object], object]:
+        _schema_to_register(request_type).calculate_column_risks = calculate_column_risks
+        return calculate_column_risks
+    return register
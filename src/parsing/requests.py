@@ -3,10 +3,11 @@ Details generic security requests and their specific implementations.
 """
 import math
 from abc import ABC, abstractmethod
-from copy import deepcopy
-from typing import List, Dict
+from dataclasses import dataclass, field, fields
+from typing import Callable, Dict, Iterable, List, Optional
 
 from src.parsing.constants import RequestTypes
+from src.parsing.request_registry import register_request_class
 
 
 class RequestField(object):
@@ -19,10 +20,18 @@ class RequestField(object):
 
 
 class UserRequest(ABC):
-    """A base class for all user security requests."""
-
-    def __init__(self, field_details: Dict[str, RequestField]):
-        self._field_details = field_details
+    """
+    A base class for all user security requests.
+    The fields of every request type are described once, in its class-level _field_details, in the order of its
+    constructor's arguments. instances only hold the field values, in slots. see request_schema.
+    """
+    __slots__ = ()
+    _field_details: Dict[str, RequestField] = {}
+    _content_template: Optional[str] = None
+
+    def __init__(self, field_details: Dict[str, RequestField] = None):
+        if field_details is not None:
+            self._field_details = field_details
 
     def get_mandatory_fields(self) -> List[RequestField]:
         """:returns a list with the values of all the mandatory fields for this request, whatever they are"""
@@ -45,10 +54,11 @@ class UserRequest(ABC):
 
     def pretty_print_content(self) -> str:
         """prints a legible description of the request."""
-        formatted_fields = '\n\t' + '\n\t'.join(
-            [self._pretty_print_field_content(f) for f in (self._field_details.values())]
-        )
-        return f"{self.__class__.__name__}\n{formatted_fields}"
+        template = self._content_template
+        if template is None or self._field_details is not type(self)._field_details:
+            template = _build_content_template(self.__class__.__name__, self._field_details.values())
+        field_values = [getattr(self, name) for name in self._field_details]
+        return template.format(*[str(value) if value is not None else "_<empty>_" for value in field_values])
 
     @staticmethod
     def _pretty_print_field_description(field: RequestField) -> str:
@@ -56,14 +66,6 @@ class UserRequest(ABC):
             'mandatory' if field.is_required else '_optional_'
         ) + f"\n{field.description}"
 
-    def _pretty_print_field_content(self, field: RequestField) -> str:
-        field_value = getattr(self, field.name)
-        return f"*<{field.name.replace('_', ' ')}>* (" + (
-            'mandatory' if field.is_required else '_optional_'
-        ) + f"): " + (
-            str(field_value) if field_value is not None else "_<empty>_"
-        )
-
     @abstractmethod
     def merge_with(self, new_request: 'UserRequest') -> 'UserRequest':
         if not isinstance(new_request, self.__class__):
@@ -72,14 +74,24 @@ class UserRequest(ABC):
             )
         return new_request
 
+    def _merge_field_values(self, new_request: 'UserRequest') -> list:
+        """:returns the values of the new request's fields, or of this request's where the new request has none."""
+        merged_values = []
+        for name in self._field_details:
+            new_value = getattr(new_request, name)
+            merged_values.append(new_value if new_value is not None else getattr(self, name))
+        return merged_values
+
     @property
     def request_type(self) -> str:
         return RequestTypes.UNKNOWN
 
 
 class UnIdentifiedUserRequest(UserRequest):
+    __slots__ = ()
+
     def __init__(self):
-        super().__init__({})
+        super().__init__()
 
     @property
     def request_type(self) -> str:
@@ -102,302 +114,101 @@ class UnIdentifiedUserRequest(UserRequest):
         return isinstance(other, UnIdentifiedUserRequest)
 
 
-class CloudResourceAccessRequest(UserRequest):
-    __fields = [
-        RequestField(
-            name="business_justification",
-            description="The reason for this request.",
-            is_required=True
-        ),
-        RequestField(
-            name="sensitivity",
-            description="A description of how sensitive is the data being accessed.",
-            is_required=True
-        )
-    ]
-
-    def __init__(self, business_justification: str, sensitivity: str):
-        super().__init__({f.name: f for f in self.__fields})
-        self.business_justification = business_justification
-        self.sensitivity = sensitivity
+def field_described_as(description: str, is_required: bool = True):
+    """declares a field of a request in a class decorated by request_schema."""
+    return field(metadata={'description': description, 'is_required': is_required})
 
-    @property
-    def request_type(self) -> str:
-        return RequestTypes.CLOUD_ACCESS
 
-    def merge_with(self, new_request: 'CloudResourceAccessRequest') -> 'CloudResourceAccessRequest':
-        super().merge_with(new_request)
-        merged_request = deepcopy(self)
-        if new_request.business_justification is not None:
-            merged_request.business_justification = new_request.business_justification
-        if new_request.sensitivity is not None:
-            merged_request.sensitivity = new_request.sensitivity
-        return merged_request
-
-    def __eq__(self, other: 'CloudResourceAccessRequest') -> bool:
-        return (
-                isinstance(other, CloudResourceAccessRequest)
-                and self.business_justification == other.business_justification
-                and self.sensitivity == other.sensitivity
+def request_schema(request_type: str) -> Callable[[type], type]:
+    """
+    declares a type of request from a class listing its fields with field_described_as.
+    generates the constructor, taking the fields in the order they are listed, as well as equality and merging,
+    keeps the field values in slots and registers the class as the one of the request type.
+    """
+    def declare(request_class: type) -> type:
+        request_class.request_type = request_type
+        request_class.merge_with = _merge_requests_of_the_same_type
+        request_class = dataclass(slots=True)(request_class)
+        request_class._field_details = {
+            f.name: RequestField(f.name, f.metadata['description'], f.metadata['is_required'])
+            for f in fields(request_class)
+        }
+        request_class._content_template = _build_content_template(
+            request_class.__name__, request_class._field_details.values()
         )
+        register_request_class(request_type, request_class)
+        return request_class
+    return declare
 
 
-class DataExportRequest(UserRequest):
-    __fields = [
-        RequestField(
-            name="business_justification",
-            description="The reason for this request.",
-            is_required=True
-        ),
-        RequestField(
-            name="PII_involvement",
-            description="An indication whether personal identifiable customer data is being accessed.",
-            is_required=True
-        ),
-        RequestField(
-            name="destination",
-            description="Where the data should be exported.",
-            is_required=True
-        )
-    ]
-
-    def __init__(self, business_justification: str, PII_involvment: bool, destination: str):
-        super().__init__({f.name: f for f in self.__fields})
-        self.business_justification = business_justification
-        self.PII_involvement = PII_involvment
-        self.destination = destination
+def _build_content_template(class_name: str, field_details: Iterable[RequestField]) -> str:
+    """
+    :returns the text of pretty_print_content with a str.format placeholder for every field value,
+    which is the same for every request of a type, so request_schema builds it once per type.
+    """
+    def escape(text: str) -> str:
+        return text.replace('{', '{{').replace('}', '}}')
 
-    @property
-    def request_type(self) -> str:
-        return RequestTypes.DATA_EXPORT
+    formatted_fields = '\n\t' + '\n\t'.join([
+        escape(f"*<{f.name.replace('_', ' ')}>* (" + ('mandatory' if f.is_required else '_optional_') + "): ") + '{}'
+        for f in field_details
+    ])
+    return f"{escape(class_name)}\n{formatted_fields}"
 
-    def merge_with(self, new_request: 'DataExportRequest') -> 'DataExportRequest':
-        super().merge_with(new_request)
-        merged_request = deepcopy(self)
-        if new_request.business_justification is not None:
-            merged_request.business_justification = new_request.business_justification
-        if new_request.PII_involvement is not None:
-            merged_request.PII_involvement = new_request.PII_involvement
-        if new_request.destination is not None:
-            merged_request.destination = new_request.destination
-        return merged_request
-
-    def __eq__(self, other: 'DataExportRequest') -> bool:
-        return (
-                isinstance(other, DataExportRequest)
-                and self.business_justification == other.business_justification
-                and self.PII_involvement == other.PII_involvement
-                and self.destination == other.destination
-        )
 
+def _merge_requests_of_the_same_type(self: UserRequest, new_request: UserRequest) -> UserRequest:
+    UserRequest.merge_with(self, new_request)
+    return type(self)(*self._merge_field_values(new_request))
 
-class DevToolInstallRequest(UserRequest):
-    __fields = [
-        RequestField(
-            name="business_justification",
-            description="The reason for this request.",
-            is_required=True
-        ),
-        RequestField(
-            name="team_leader_approval",
-            description="A jira ticket listing your team leader's approval of this request.",
-            is_required=True
-        )
-    ]
 
-    def __init__(self, business_justification: str, team_leader_approval: str):
-        super().__init__({f.name: f for f in self.__fields})
-        self.business_justification = business_justification
-        self.team_leader_approval = team_leader_approval
+@request_schema(RequestTypes.CLOUD_ACCESS)
+class CloudResourceAccessRequest(UserRequest):
+    business_justification: str = field_described_as("The reason for this request.")
+    sensitivity: str = field_described_as("A description of how sensitive is the data being accessed.")
 
-    @property
-    def request_type(self) -> str:
-        return RequestTypes.DEVTOOL_INSTALL
 
-    def merge_with(self, new_request: 'DevToolInstallRequest') -> 'DevToolInstallRequest':
-        super().merge_with(new_request)
-        merged_request = deepcopy(self)
-        if new_request.business_justification is not None:
-            merged_request.business_justification = new_request.business_justification
-        if new_request.team_leader_approval is not None:
-            merged_request.team_leader_approval = new_request.team_leader_approval
-        return merged_request
-
-    def __eq__(self, other: 'DevToolInstallRequest') -> bool:
-        return (
-                isinstance(other, DevToolInstallRequest)
-                and self.business_justification == other.business_justification
-                and self.team_leader_approval == other.team_leader_approval
-        )
+@request_schema(RequestTypes.DATA_EXPORT)
+class DataExportRequest(UserRequest):
+    business_justification: str = field_described_as("The reason for this request.")
+    PII_involvement: bool = field_described_as(
+        "An indication whether personal identifiable customer data is being accessed."
+    )
+    destination: str = field_described_as("Where the data should be exported.")
 
 
-class FireWallChangeRequest(UserRequest):
-    __fields = [
-        RequestField(
-            name="business_justification",
-            description="The reason for this request.",
-            is_required=True
-        ),
-        RequestField(
-            name="source_system",
-            description="The system for which network access should be granted.",
-            is_required=True
-        ),
-        RequestField(
-            name="destination_ip",
-            description="The IP address which the system needs to access and on port which we intend to communicate with it.",
-            is_required=True
-        )
-    ]
-
-    def __init__(self, business_justification, source_system, destination_ip):
-        super().__init__({f.name: f for f in self.__fields})
-        self.business_justification = business_justification
-        self.source_system = source_system
-        self.destination_ip = destination_ip
+@request_schema(RequestTypes.DEVTOOL_INSTALL)
+class DevToolInstallRequest(UserRequest):
+    business_justification: str = field_described_as("The reason for this request.")
+    team_leader_approval: str = field_described_as("A jira ticket listing your team leader's approval of this request.")
 
-    @property
-    def request_type(self) -> str:
-        return RequestTypes.FIREWALL_CHANGE
 
-    def merge_with(self, new_request: 'FireWallChangeRequest') -> 'FireWallChangeRequest':
-        super().merge_with(new_request)
-        merged_request = deepcopy(self)
-        if new_request.business_justification is not None:
-            merged_request.business_justification = new_request.business_justification
-        if new_request.source_system is not None:
-            merged_request.source_system = new_request.source_system
-        if new_request.destination_ip is not None:
-            merged_request.destination_ip = new_request.destination_ip
-        return merged_request
-
-    def __eq__(self, other: 'FireWallChangeRequest') -> bool:
-        return (
-                isinstance(other, FireWallChangeRequest)
-                and self.business_justification == other.business_justification
-                and self.source_system == other.source_system
-                and self.destination_ip == other.destination_ip
-        )
+@request_schema(RequestTypes.FIREWALL_CHANGE)
+class FireWallChangeRequest(UserRequest):
+    business_justification: str = field_described_as("The reason for this request.")
+    source_system: str = field_described_as("The system for which network access should be granted.")
+    destination_ip: str = field_described_as(
+        "The IP address which the system needs to access and on port which we intend to communicate with it."
+    )
 
 
+@request_schema(RequestTypes.NETWORK_ACCESS)
 class NetworkAccessRequest(UserRequest):
-    __fields = [
-        RequestField(
-            name="business_justification",
-            description="The reason for this request.",
-            is_required=True
-        ),
-        RequestField(
-            name="source_cidr",
-            description="The Classless Inter-Domain Routing (AKA IP segment) which requires network access.",
-            is_required=True
-        ),
-        RequestField(
-            name="engineering_approval",
-            description="A jira ticket listing the engineering team's approval of this request.",
-            is_required=True
-        )
-    ]
-
-    def __init__(self, business_justification, source_cidr, engineering_approval):
-        super().__init__({f.name: f for f in self.__fields})
-        self.business_justification = business_justification
-        self.source_cidr = source_cidr
-        self.engineering_approval = engineering_approval
-
-    @property
-    def request_type(self) -> str:
-        return RequestTypes.NETWORK_ACCESS
-
-    def merge_with(self, new_request: 'NetworkAccessRequest') -> 'NetworkAccessRequest':
-        super().merge_with(new_request)
-        merged_request = deepcopy(self)
-        if new_request.business_justification is not None:
-            merged_request.business_justification = new_request.business_justification
-        if new_request.source_cidr is not None:
-            merged_request.source_cidr = new_request.source_cidr
-        if new_request.engineering_approval is not None:
-            merged_request.engineering_approval = new_request.engineering_approval
-        return merged_request
-
-    def __eq__(self, other: 'NetworkAccessRequest') -> bool:
-        return (
-                isinstance(other, NetworkAccessRequest)
-                and self.business_justification == other.business_justification
-                and self.source_cidr == other.source_cidr
-                and self.engineering_approval == other.engineering_approval
-        )
+    business_justification: str = field_described_as("The reason for this request.")
+    source_cidr: str = field_described_as(
+        "The Classless Inter-Domain Routing (AKA IP segment) which requires network access."
+    )
+    engineering_approval: str = field_described_as(
+        "A jira ticket listing the engineering team's approval of this request."
+    )
 
 
+@request_schema(RequestTypes.PERMISSION_CHANGE)
 class PermissionsChangeRequest(UserRequest):
-    __fields = [
-        RequestField(
-            name="business_justification",
-            description="The reason for this request.",
-            is_required=True
-        ),
-        RequestField(
-            name="duration",
-            description="How long should access be granted.",
-            is_required=True
-        ),
-        RequestField(
-            name="manager_approval",
-            description="A jira ticket listing your manager's approval of this request.",
-            is_required=True
-        ),
-        RequestField(
-            name="aws_account",
-            description="the AWS account to which permissions should be changed.",
-            is_required=False
-        ),
-        RequestField(
-            name="role_requested",
-            description="The role which should temporarily be granted.",
-            is_required=False
-        )
-    ]
-
-    def __init__(
-            self, business_justification: str, duration: str, manager_approval: str,
-            aws_account: str,
-            role_requested: str
-    ):
-        super().__init__({f.name: f for f in self.__fields})
-        self.business_justification = business_justification
-        self.duration = duration
-        self.manager_approval = manager_approval
-        self.aws_account = aws_account
-        self.role_requested = role_requested
-
-    @property
-    def request_type(self) -> str:
-        return RequestTypes.PERMISSION_CHANGE
-
-    def merge_with(self, new_request: 'PermissionsChangeRequest') -> 'PermissionsChangeRequest':
-        super().merge_with(new_request)
-        merged_request = deepcopy(self)
-        if new_request.business_justification is not None:
-            merged_request.business_justification = new_request.business_justification
-        if new_request.duration is not None:
-            merged_request.duration = new_request.duration
-        if new_request.manager_approval is not None:
-            merged_request.manager_approval = new_request.manager_approval
-        if new_request.aws_account is not None:
-            merged_request.aws_account = new_request.aws_account
-        if new_request.role_requested is not None:
-            merged_request.role_requested = new_request.role_requested
-        return merged_request
-
-    def __eq__(self, other: 'PermissionsChangeRequest') -> bool:
-        return (
-                isinstance(other, PermissionsChangeRequest)
-                and self.business_justification == other.business_justification
-                and self.duration == other.duration
-                and self.manager_approval == other.manager_approval
-                and self.aws_account == other.aws_account
-                and self.role_requested == other.role_requested
-        )
+    business_justification: str = field_described_as("The reason for this request.")
+    duration: str = field_described_as("How long should access be granted.")
+    manager_approval: str = field_described_as("A jira ticket listing your manager's approval of this request.")
+    aws_account: str = field_described_as("the AWS account to which permissions should be changed.", is_required=False)
+    role_requested: str = field_described_as("The role which should temporarily be granted.", is_required=False)
 
     def get_duration_in_hours(self) -> float:
         multiplier = math.inf
@@ -415,63 +226,13 @@ class PermissionsChangeRequest(UserRequest):
         return amount_of_units * multiplier
 
 
+@request_schema(RequestTypes.VENDOR_APPROVAL)
 class VendorApprovalRequest(UserRequest):
-    __fields = [
-        RequestField(
-            name="vendor_name",
-            description="The vendor which requires onboarding.",
-            is_required=False
-        ),
-        RequestField(
-            name="security_questionnaire_completed",
-            description="An indication whether said vendor completed our security questionnaire.",
-            is_required=True
-        ),
-        RequestField(
-            name="data_classification",
-            description="A description of how sensitive is the data being accessed.",
-            is_required=True
-        ),
-        RequestField(
-            name="legal_review_completed",
-            description="An indication that the company passed the required legal review.",
-            is_required=True
-        )
-    ]
-
-    def __init__(
-            self, vendor_name: str, security_questionnaire_completed: bool,
-            data_classification: str,
-            legal_review_completed: bool
-    ):
-        super().__init__({f.name: f for f in self.__fields})
-        self.vendor_name = vendor_name
-        self.security_questionnaire_completed = security_questionnaire_completed
-        self.data_classification = data_classification
-        self.legal_review_completed = legal_review_completed
-
-    @property
-    def request_type(self) -> str:
-        return RequestTypes.VENDOR_APPROVAL
-
-    def merge_with(self, new_request: 'VendorApprovalRequest') -> 'VendorApprovalRequest':
-        super().merge_with(new_request)
-        merged_request = deepcopy(self)
-        if new_request.vendor_name is not None:
-            merged_request.vendor_name = new_request.vendor_name
-        if new_request.security_questionnaire_completed is not None:
-            merged_request.security_questionnaire_completed = new_request.security_questionnaire_completed
-        if new_request.data_classification is not None:
-            merged_request.data_classification = new_request.data_classification
-        if new_request.legal_review_completed is not None:
-            merged_request.legal_review_completed = new_request.legal_review_completed
-        return merged_request
-
-    def __eq__(self, other: 'VendorApprovalRequest') -> bool:
-        return (
-                isinstance(other, VendorApprovalRequest)
-                and self.vendor_name == other.vendor_name
-                and self.security_questionnaire_completed == other.security_questionnaire_completed
-                and self.data_classification == other.data_classification
-                and self.legal_review_completed == other.legal_review_completed
-        )
+    vendor_name: str = field_described_as("The vendor which requires onboarding.", is_required=False)
+    security_questionnaire_completed: bool = field_described_as(
+        "An indication whether said vendor completed our security questionnaire."
+    )
+    data_classification: str = field_described_as("A description of how sensitive is the data being accessed.")
+    legal_review_completed: bool = field_described_as(
+        "An indication that the company passed the required legal review."
+    )
@@ -0,0 +1,164 @@
+"""
+Classifies requests with a small transformer fine-tuned on the ticket archive, on the cpu, for the messages the keyword
+rules of regex_classifier miss. The model is served behind a MicroBatchingClassifier, since running it once per
+message would cost about as much as running it on a whole batch.
+Importing this module imports torch and transformers, so the bot only does so when HYPER_VYPER_FALLBACK_MODEL points
+at a transformer, see message_evaluation.fallback_classifier_from_environment.
+
+run with `python -m src.parsing.transformer_classifier resources/acme_security_tickets.csv models/request_transformer`
+"""
+import argparse
+import os
+import random
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+from src.parsing.constants import RequestTypes
+from src.parsing.learned_classifier import DEFAULT_MIN_CONFIDENCE, read_labeled_tickets, split_holdout
+from src.parsing.micro_batching import (
+    DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT_SECONDS, DEFAULT_RESULT_TIMEOUT_SECONDS, MicroBatchingClassifier
+)
+
+DEFAULT_BASE_MODEL = 'distilbert-base-uncased'
+# the longest ticket in the archive is well under this many tokens, and attention costs grow with its square.
+MAX_TOKENS = 128
+_WARM_UP_TEXTS = ['please install a tool for my work.', 'allow traffic from 10.0.0.0/8 to 10.1.2.3 on port 443.']
+
+
+class TransformerClassifier(object):
+    """
+    A sequence classification transformer, in inference mode on the cpu, optionally with its linear layers
+    dynamically quantized to int8, which makes it about twice as fast at a small cost in accuracy.
+    Like LearnedClassifier, a message is only given a request type when the model is at least min_confidence sure
+    of it, and is UNKNOWN otherwise.
+    """
+
+    def __init__(self, tokenizer, model, min_confidence: float = DEFAULT_MIN_CONFIDENCE):
+        self.tokenizer = tokenizer
+        self.model = model.eval()
+        self.min_confidence = min_confidence
+        self.classes = [model.config.id2label[i] for i in range(model.config.num_labels)]
+
+    @classmethod
+    def load(
+            cls, directory: str, min_confidence: float = DEFAULT_MIN_CONFIDENCE, quantize: bool = True,
+            threads: Optional[int] = None
+    ) -> 'TransformerClassifier':
+        """
+        loads a model saved by fine_tune.
+        :param threads: how many threads torch runs an inference on. a single inference worker per process
+        rarely gains from more than the cores a process gets, and the bot's other threads need some of them too.
+        """
+        if threads is not None:
+            torch.set_num_threads(threads)
+        model = AutoModelForSequenceClassification.from_pretrained(directory)
+        if quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return cls(AutoTokenizer.from_pretrained(directory), model, min_confidence)
+
+    def predict_batch(self, texts: Sequence[str]) -> List[Tuple[str, float]]:
+        """:returns the request type of every text and the model's confidence in it."""
+        inputs = self.tokenizer(list(texts), padding=True, truncation=True, max_length=MAX_TOKENS, return_tensors='pt')
+        with torch.inference_mode():
+            probabilities = torch.softmax(self.model(**inputs).logits, dim=-1)
+        confidences, best = probabilities.max(dim=-1)
+        return [
+            (self.classes[b] if confidence >= self.min_confidence else RequestTypes.UNKNOWN, confidence)
+            for b, confidence in zip(best.tolist(), confidences.tolist())
+        ]
+
+    def warm_up(self) -> None:
+        """runs a few inferences, so that torch allocates its buffers and threads before the first real message."""
+        for batch_size in [1, len(_WARM_UP_TEXTS)]:
+            self.predict_batch(_WARM_UP_TEXTS[:batch_size])
+
+
+def micro_batching_classifier_from_environment(
+        model_directory: str, min_confidence: float = DEFAULT_MIN_CONFIDENCE
+) -> MicroBatchingClassifier:
+    """
+    serves the transformer in the directory behind an inference worker, configured by the environment:
+    HYPER_VYPER_TRANSFORMER_THREADS is the number of threads torch uses, HYPER_VYPER_TRANSFORMER_QUANTIZE=0 keeps the
+    model in float32, HYPER_VYPER_TRANSFORMER_MAX_BATCH and HYPER_VYPER_TRANSFORMER_MAX_WAIT_MS bound a micro-batch,
+    and HYPER_VYPER_TRANSFORMER_TIMEOUT_MS is how long a message waits for its classification before giving up.
+    """
+    threads = os.environ.get('HYPER_VYPER_TRANSFORMER_THREADS')
+    transformer = TransformerClassifier.load(
+        model_directory, min_confidence,
+        quantize=os.environ.get('HYPER_VYPER_TRANSFORMER_QUANTIZE', '1').lower() not in ['0', 'false', 'no'],
+        threads=int(threads) if threads else None
+    )
+    return MicroBatchingClassifier(
+        transformer.predict_batch,
+        max_batch_size=int(os.environ.get('HYPER_VYPER_TRANSFORMER_MAX_BATCH', DEFAULT_MAX_BATCH_SIZE)),
+        max_wait_seconds=float(
+            os.environ.get('HYPER_VYPER_TRANSFORMER_MAX_WAIT_MS', DEFAULT_MAX_WAIT_SECONDS * 1e3)
+        ) / 1e3,
+        warm_up=transformer.warm_up, name='transformer-inference',
+        result_timeout_seconds=float(
+            os.environ.get('HYPER_VYPER_TRANSFORMER_TIMEOUT_MS', DEFAULT_RESULT_TIMEOUT_SECONDS * 1e3)
+        ) / 1e3
+    )
+
+
+def fine_tune(
+        texts: Sequence[str], request_types: Sequence[str], output_directory: str,
+        base_model: str = DEFAULT_BASE_MODEL, epochs: int = 3, batch_size: int = 16, learning_rate: float = 5e-5
+) -> None:
+    """fine-tunes the base model to classify the texts into their request types, on the cpu, and saves it."""
+    classes = sorted(set(request_types))
+    tokenizer = AutoTokenizer.from_pretrained(base_model)
+    model = AutoModelForSequenceClassification.from_pretrained(
+        base_model, num_labels=len(classes),
+        id2label=dict(enumerate(classes)), label2id={c: i for i, c in enumerate(classes)}
+    )
+    optimizer = torch.optim.AdamW(model.parameters(), lr=learning_rate)
+    examples = list(zip(texts, [classes.index(t) for t in request_types]))
+    model.train()
+    for epoch in range(epochs):
+        random.Random(epoch).shuffle(examples)
+        total_loss = 0.
+        for start in range(0, len(examples), batch_size):
+            batch_texts, labels = zip(*examples[start:start + batch_size])
+            inputs = tokenizer(
+                list(batch_texts), padding=True, truncation=True, max_length=MAX_TOKENS, return_tensors='pt'
+            )
+            loss = model(**inputs, labels=torch.tensor(labels)).loss
+            loss.backward()
+            optimizer.step()
+            optimizer.zero_grad()
+            total_loss += loss.item() * len(labels)
+        print(f"epoch {epoch + 1}: loss {total_loss / len(examples):.4f}")
+    model.save_pretrained(output_directory)
+    tokenizer.save_pretrained(output_directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fine-tunes a transformer to classify requests on the cpu.')
+    parser.add_argument('csv_path', help='a csv of tickets with "details" and "request_type" columns')
+    parser.add_argument('model_directory', help='where to save the model')
+    parser.add_argument('--base-model', default=DEFAULT_BASE_MODEL)
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--holdout', type=float, default=.2, help='the fraction of tickets to evaluate on')
+    parser.add_argument('--no-quantize', action='store_true', help='evaluate the model in float32')
+    args = parser.parse_args()
+
+    texts, labels = read_labeled_tickets(args.csv_path)
+    (train_texts, train_labels), (holdout_texts, holdout_labels) = split_holdout(texts, labels, args.holdout)
+    fine_tune(train_texts, train_labels, args.model_directory, args.base_model, args.epochs)
+
+    classifier = TransformerClassifier.load(args.model_directory, quantize=not args.no_quantize)
+    classifier.warm_up()
+    start = time.perf_counter()
+    predictions = [request_type for request_type, _ in classifier.predict_batch(holdout_texts)]
+    elapsed = time.perf_counter() - start
+    accuracy = sum(p == l for p, l in zip(predictions, holdout_labels)) / len(holdout_labels)
+    print(f"holdout accuracy: {accuracy:.3f} over {len(holdout_texts)} tickets, "
+          f"{elapsed / len(holdout_texts) * 1e3:.1f}ms per message in a single batch")
+
+
+if __name__ == '__main__':
+    main()
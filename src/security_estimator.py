@@ -1,41 +1,40 @@
 import math
+import time
 
+from src import instrumentation
 from src.parsing.constants import RequestTypes
+from src.parsing.request_registry import risk_rule_of, schema_of
 from src.parsing.requests import (
     UserRequest, CloudResourceAccessRequest, DataExportRequest,
     NetworkAccessRequest, DevToolInstallRequest, FireWallChangeRequest, VendorApprovalRequest,
     PermissionsChangeRequest
 )
 
+_risk_scoring_time = instrumentation.histogram(
+    'risk_scoring', 'Time taken to score the security risk of a request.', ['request_type']
+)
+
 
-# noinspection PyTypeChecker
 def calculate_security_risk(request: UserRequest) -> int:
     if not request.is_valid():
         return 100
-    req_type = request.request_type
-    if req_type == RequestTypes.CLOUD_ACCESS:
-        return _calculate_cloud_access_risk(request)
-    elif req_type == RequestTypes.DATA_EXPORT:
-        return _calculate_data_export_risk(request)
-    elif req_type == RequestTypes.DEVTOOL_INSTALL:
-        return _calculate_devtool_install_risk(request)
-    elif req_type == RequestTypes.FIREWALL_CHANGE:
-        return _calculate_firewall_change_risk(request)
-    elif req_type == RequestTypes.NETWORK_ACCESS:
-        return _calculate_network_access_risk(request)
-    elif req_type == RequestTypes.PERMISSION_CHANGE:
-        return _calculate_permissions_change_risk(request)
-    elif req_type == RequestTypes.VENDOR_APPROVAL:
-        return _calculate_vendor_approval_risk(request)
-    else:
+    schema = schema_of(request.request_type)
+    if schema is None or schema.calculate_risk is None:
         return 100
+    start = time.perf_counter()
+    try:
+        return schema.calculate_risk(request)
+    finally:
+        _risk_scoring_time.observe(time.perf_counter() - start, request.request_type)
 
+@risk_rule_of(RequestTypes.CLOUD_ACCESS)
 def _calculate_cloud_access_risk(request: CloudResourceAccessRequest) -> int:
     score = 55
     if request.sensitivity is not None and 'high' in request.sensitivity.lower():
         score += 10
     return score
 
+@risk_rule_of(RequestTypes.DATA_EXPORT)
 def _calculate_data_export_risk(request: DataExportRequest) -> int:
     score = 60
     if request.PII_involvement:
@@ -44,12 +43,14 @@ def _calculate_data_export_risk(request: DataExportRequest) -> int:
         score += 10
     return score
 
+@risk_rule_of(RequestTypes.DEVTOOL_INSTALL)
 def _calculate_devtool_install_risk(request: DevToolInstallRequest) -> int:
     score = 35
     if 'performance' in request.business_justification.lower():
         score += 10
     return score
 
+@risk_rule_of(RequestTypes.FIREWALL_CHANGE)
 def _calculate_firewall_change_risk(request: FireWallChangeRequest) -> int:
     score = 65
     if 'third party' in request.business_justification.lower():
@@ -60,12 +61,14 @@ def _calculate_firewall_change_risk(request: FireWallChangeRequest) -> int:
         score += 10
     return score
 
+@risk_rule_of(RequestTypes.NETWORK_ACCESS)
 def _calculate_network_access_risk(request: NetworkAccessRequest) -> int:
     score = 65
     subnet_size_estimation = int(request.source_cidr.split('/')[-1])
     score += subnet_size_estimation
     return score
 
+@risk_rule_of(RequestTypes.PERMISSION_CHANGE)
 def _calculate_permissions_change_risk(request: PermissionsChangeRequest) -> int:
     score = 75
     permissions_change_duration = request.get_duration_in_hours()
@@ -77,6 +80,7 @@ def _calculate_permissions_change_risk(request: PermissionsChangeRequest) -> int
         score += 10
     return min(score, 100)
 
+@risk_rule_of(RequestTypes.VENDOR_APPROVAL)
 def _calculate_vendor_approval_risk(request: VendorApprovalRequest) -> int:
     score = 45
     if not request.security_questionnaire_completed:
@@ -0,0 +1,208 @@
+"""
+A slack web client that keeps its connections to slack open and stays within slack's rate limits.
+slack_sdk's WebClient opens a new connection, with a new tls handshake, for every call, and leaves rate limiting to
+the caller. Calls that slack would refuse with a 429 wait their turn here instead.
+"""
+import http.client
+import io
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.error import HTTPError, URLError
+from urllib.request import Request
+
+import urllib3
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackRequestError
+from slack_sdk.http_retry import ConnectionErrorRetryHandler, RateLimitErrorRetryHandler
+from slack_sdk.web import SlackResponse
+
+from src import instrumentation
+
+# calls per minute, by slack's rate limit tiers: https://api.slack.com/apis/rate-limits
+TIER_CALLS_PER_MINUTE = {1: 1, 2: 20, 3: 50, 4: 100}
+METHOD_TIERS = {
+    'auth.test': 4,
+    'conversations.history': 3,
+    'conversations.replies': 3,
+    'users.info': 4,
+}
+DEFAULT_TIER = 3
+# chat.postMessage is limited per channel rather than by tier, to about a message a second with short bursts.
+POST_MESSAGE_CALLS_PER_SECOND = 1.
+POST_MESSAGE_BURST = 5
+# past this many token buckets, the idle ones are dropped whenever another is made, see PooledWebClient._bucket_of.
+MAX_BUCKETS = 1024
+
+_api_call_time = instrumentation.histogram(
+    'slack_api_call', 'Time taken by a call to slack, including the wait for its turn and any retries.', ['method']
+)
+
+
+class TokenBucket(object):
+    """
+    Lets calls through at a steady rate, allowing a burst of them after a quiet period.
+    A call waits for the token it takes, so calls over the rate are spread out in the order they came, never dropped.
+    """
+
+    def __init__(self, rate_per_second: float, burst: int = 1):
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """waits for a token. :returns how long it waited, in seconds."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate_per_second)
+            self._updated_at = now
+            # the token is taken right away, even if it only comes later, so that later calls queue up behind it.
+            self._tokens -= 1
+            wait = max(-self._tokens / self.rate_per_second, self._paused_until - now, 0.)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def is_idle(self) -> bool:
+        """checks whether the bucket is full again and not paused, so that a new one would pace calls the same."""
+        with self._lock:
+            now = time.monotonic()
+            is_full = self._tokens + (now - self._updated_at) * self.rate_per_second >= self.burst
+            return is_full and self._paused_until <= now
+
+    def pause(self, seconds: float) -> None:
+        """holds every call back for the given time, as when slack asks us to retry after it."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class PooledWebClient(WebClient):
+    """
+    A WebClient whose calls go through a pool of kept-alive connections, are paced by a token bucket per api method
+    (per channel, for chat.postMessage), and are retried after the time slack asks for when they are rate limited.
+    Slack's limits are per app, so when several processes call slack with the same token, each should only be given
+    its rate_limit_share of them.
+    Counts the calls made, the ones that were rate limited, and the total time calls waited for their turn.
+    """
+
+    def __init__(
+            self, *args, pool_size: int = 16, rate_limit_retries: int = 3, rate_limit_share: float = 1., **kwargs
+    ):
+        kwargs.setdefault('retry_handlers', [
+            ConnectionErrorRetryHandler(), RateLimitErrorRetryHandler(max_retry_count=rate_limit_retries)
+        ])
+        super().__init__(*args, **kwargs)
+        self.pool_size = pool_size
+        self._pool = _pool_for(self.proxy, pool_size, self.ssl)
+        self._pool_pid = os.getpid()
+        self._buckets: Dict[Tuple[str, Optional[str]], TokenBucket] = {}
+        self._buckets_lock = threading.Lock()
+        self.rate_limit_share = rate_limit_share
+        self.calls = 0
+        self.rate_limited_calls = 0
+        self.waited_seconds = 0.
+
+    def api_call(self, api_method: str, **kwargs) -> SlackResponse:
+        self._ensure_pool_of_this_process()
+        with _api_call_time.time(api_method):
+            waited = self._bucket_of(api_method, _channel_of(kwargs)).acquire()
+            with self._buckets_lock:
+                self.calls += 1
+                self.waited_seconds += waited
+            return super().api_call(api_method, **kwargs)
+
+    def _ensure_pool_of_this_process(self) -> None:
+        # a worker forked from a process which already called slack, like gunicorn's master loading the app, inherits
+        # its kept-alive sockets, which the workers must not share. it opens connections, and paces calls, of its own.
+        if self._pool_pid == os.getpid():
+            return
+        with self._buckets_lock:
+            if self._pool_pid == os.getpid():
+                return
+            self._pool = _pool_for(self.proxy, self.pool_size, self.ssl)
+            self._buckets = {}
+            self._pool_pid = os.getpid()
+
+    def _bucket_of(self, api_method: str, channel: Optional[str] = None) -> TokenBucket:
+        key = (api_method, channel if api_method == 'chat.postMessage' else None)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._buckets_lock:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    if len(self._buckets) >= MAX_BUCKETS:
+                        self._drop_idle_buckets()
+                    bucket = self._buckets[key] = _bucket_for(api_method, self.rate_limit_share)
+        return bucket
+
+    def _drop_idle_buckets(self) -> None:
+        """forgets the buckets of the channels no message was posted to lately. called with the buckets' lock held."""
+        # the dict is replaced rather than changed, since _bucket_of reads it without the lock.
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if not bucket.is_idle()}
+
+    def _perform_urllib_http_request_internal(self, url: str, req: Request) -> dict:
+        """
+        sends the request prepared by WebClient over a pooled connection, instead of a new urllib connection, and
+        answers the way WebClient's own urllib request does, for its retry handlers and response parsing.
+        """
+        # like WebClient, never lets a manipulated url open anything but http(s), such as a local file.
+        if not url.lower().startswith('http'):
+            raise SlackRequestError(f"Invalid URL detected: {url}")
+        request_headers = {name: str(value) for name, value in req.header_items()}
+        try:
+            response = self._pool.request('POST', url, body=req.data, headers=request_headers, timeout=self.timeout)
+        except urllib3.exceptions.HTTPError as e:
+            # WebClient's retry handlers only retry the connection errors of urllib, like a dropped connection.
+            raise URLError(e) from e
+        headers = http.client.HTTPMessage()
+        for name, value in response.headers.items():
+            headers[name] = value
+        if response.status >= 400:
+            if response.status == 429:
+                self._pause_for_rate_limit(url, headers)
+            # WebClient's retry handlers and error handling expect urllib's errors.
+            raise HTTPError(url, response.status, response.reason, headers, io.BytesIO(response.data))
+        if headers.get_content_type() == 'application/gzip':
+            # the files of admin.analytics.getFile are returned as they are.
+            return {'status': response.status, 'headers': headers, 'body': response.data}
+        charset = headers.get_content_charset() or 'utf-8'
+        return {'status': response.status, 'headers': headers, 'body': response.data.decode(charset)}
+
+    def _pause_for_rate_limit(self, url: str, headers: http.client.HTTPMessage) -> None:
+        with self._buckets_lock:
+            self.rate_limited_calls += 1
+        api_method = url.rsplit('/', 1)[-1]
+        retry_after = float(headers.get('Retry-After', 1))
+        for (method, _), bucket in list(self._buckets.items()):
+            if method == api_method:
+                bucket.pause(retry_after)
+
+    def close(self) -> None:
+        self._pool.clear()
+
+
+def _pool_for(proxy: Optional[str], pool_size: int, ssl_context) -> urllib3.PoolManager:
+    """:returns a pool that connects through the proxy WebClient was given, or found in the environment, if any."""
+    if proxy is not None and not isinstance(proxy, str):
+        raise SlackRequestError(f"Invalid proxy detected: {proxy} must be a str value")
+    if proxy is None or not proxy.strip():
+        return urllib3.PoolManager(maxsize=pool_size, ssl_context=ssl_context, retries=False)
+    return urllib3.ProxyManager(proxy, maxsize=pool_size, ssl_context=ssl_context, retries=False)
+
+
+def _bucket_for(api_method: str, share: float = 1.) -> TokenBucket:
+    if api_method == 'chat.postMessage':
+        return TokenBucket(POST_MESSAGE_CALLS_PER_SECOND * share, burst=max(1, int(POST_MESSAGE_BURST * share)))
+    calls_per_minute = TIER_CALLS_PER_MINUTE[METHOD_TIERS.get(api_method, DEFAULT_TIER)] * share
+    return TokenBucket(calls_per_minute / 60, burst=max(1, int(calls_per_minute // 10)))
+
+
+def _channel_of(api_call_kwargs: dict) -> Optional[str]:
+    for arguments in [api_call_kwargs.get('json'), api_call_kwargs.get('params'), api_call_kwargs.get('data')]:
+        if isinstance(arguments, dict) and 'channel' in arguments:
+            return arguments['channel']
+    return None
@@ -0,0 +1,194 @@
+"""
+Keeps the partial requests the bot is waiting on, by the ts of the thread in which it asked for the missing details.
+The in-memory store lives and dies with its process, while the sqlite store survives restarts and is shared by
+every worker process pointed at the same database file.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+from src.parsing.constants import RequestTypes
+from src.parsing.request_registry import schema_of
+from src.parsing.requests import UserRequest, UnIdentifiedUserRequest
+from src.state.sqlite_connections import PerThreadConnections
+
+DEFAULT_CAPACITY = 10000
+DEFAULT_TTL_SECONDS = 1000 * 3600
+
+store_logger = logging.getLogger(__name__)
+
+
+def serialize_request(request: UserRequest) -> str:
+    """
+    :returns a compact json of the request's type and its field values, in the order of its constructor's arguments.
+    the field descriptions are left out, as they are the same for every request of a type.
+    """
+    values = [getattr(request, name) for name in request._field_details]
+    return json.dumps([request.request_type, values], separators=(',', ':'))
+
+
+def deserialize_request(serialized: str) -> UserRequest:
+    request_type, values = json.loads(serialized)
+    if request_type == RequestTypes.UNKNOWN:
+        return UnIdentifiedUserRequest()
+    return schema_of(request_type).request_class(*values)
+
+
+class ConversationStore(ABC):
+    """A bounded store of the requests pending in threads, which forgets requests left unanswered for too long."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+
+    @abstractmethod
+    def get(self, thread_ts) -> Optional[UserRequest]:
+        """:returns the request pending in the thread, or None if there is none or it expired."""
+
+    @abstractmethod
+    def put(self, thread_ts, request: UserRequest) -> None:
+        """stores the request as pending in the thread, evicting the requests closest to expiry if at capacity."""
+
+    @abstractmethod
+    def pop(self, thread_ts) -> Optional[UserRequest]:
+        """removes the request pending in the thread, if there is one, and returns it."""
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """removes all the expired requests. :returns how many were removed."""
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+
+class InMemoryConversationStore(ConversationStore):
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        super().__init__(capacity, ttl_seconds)
+        # kept in order of expiry, since every request lives for the same ttl from the moment it is stored.
+        self._requests = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, thread_ts) -> Optional[UserRequest]:
+        with self._lock:
+            expires_at, request = self._requests.get(str(thread_ts), (0., None))
+            return request if expires_at > time.time() else None
+
+    def put(self, thread_ts, request: UserRequest) -> None:
+        with self._lock:
+            self._requests.pop(str(thread_ts), None)
+            self._requests[str(thread_ts)] = (time.time() + self.ttl_seconds, request)
+            self._sweep()
+            while len(self._requests) > self.capacity:
+                evicted_ts, _ = self._requests.popitem(last=False)
+                store_logger.warning(f"conversation store is full, evicted the request in thread {evicted_ts}")
+
+    def pop(self, thread_ts) -> Optional[UserRequest]:
+        with self._lock:
+            expires_at, request = self._requests.pop(str(thread_ts), (0., None))
+            return request if expires_at > time.time() else None
+
+    def sweep(self) -> int:
+        with self._lock:
+            return self._sweep()
+
+    def _sweep(self) -> int:
+        now = time.time()
+        swept = 0
+        while self._requests and next(iter(self._requests.values()))[0] <= now:
+            self._requests.popitem(last=False)
+            swept += 1
+        return swept
+
+    def __len__(self):
+        return len(self._requests)
+
+
+class SqliteConversationStore(ConversationStore):
+    """
+    Stores requests serialized in a sqlite database, so that any worker process can pick up a thread.
+    every thread gets its own connection, and expired requests are swept at most once every sweep interval.
+    """
+
+    def __init__(
+            self, db_path: str, capacity: int = DEFAULT_CAPACITY, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+            sweep_interval_seconds: float = 60.
+    ):
+        super().__init__(capacity, ttl_seconds)
+        self.db_path = db_path
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._last_sweep = 0.
+        self._connections = PerThreadConnections(db_path)
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS conversations ('
+                'thread_ts TEXT PRIMARY KEY, request TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS conversations_expiry ON conversations (expires_at)')
+
+    def _connection(self) -> sqlite3.Connection:
+        return self._connections.get()
+
+    def get(self, thread_ts) -> Optional[UserRequest]:
+        row = self._connection().execute(
+            'SELECT request FROM conversations WHERE thread_ts = ? AND expires_at > ?', (str(thread_ts), time.time())
+        ).fetchone()
+        return deserialize_request(row[0]) if row else None
+
+    def put(self, thread_ts, request: UserRequest) -> None:
+        row = (serialize_request(request), time.time() + self.ttl_seconds, str(thread_ts))
+        excess = 0
+        with self._connection() as connection:
+            # only a thread new to the store can take it past its capacity, so only then are its requests counted.
+            if not connection.execute(
+                    'UPDATE conversations SET request = ?, expires_at = ? WHERE thread_ts = ?', row
+            ).rowcount:
+                connection.execute(
+                    'INSERT OR REPLACE INTO conversations (request, expires_at, thread_ts) VALUES (?, ?, ?)', row
+                )
+                excess = connection.execute('SELECT COUNT(*) FROM conversations').fetchone()[0] - self.capacity
+            if excess > 0:
+                connection.execute(
+                    'DELETE FROM conversations WHERE thread_ts IN ('
+                    'SELECT thread_ts FROM conversations ORDER BY expires_at LIMIT ?)', (excess,)
+                )
+        if excess > 0:
+            store_logger.warning(f"conversation store is full, evicted {excess} requests")
+        if time.time() - self._last_sweep > self.sweep_interval_seconds:
+            self.sweep()
+
+    def pop(self, thread_ts) -> Optional[UserRequest]:
+        with self._connection() as connection:
+            row = connection.execute(
+                'SELECT request, expires_at FROM conversations WHERE thread_ts = ?', (str(thread_ts),)
+            ).fetchone()
+            connection.execute('DELETE FROM conversations WHERE thread_ts = ?', (str(thread_ts),))
+        return deserialize_request(row[0]) if row and row[1] > time.time() else None
+
+    def sweep(self) -> int:
+        self._last_sweep = time.time()
+        with self._connection() as connection:
+            return connection.execute('DELETE FROM conversations WHERE expires_at <= ?', (self._last_sweep,)).rowcount
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM conversations').fetchone()[0]
+
+
+def conversation_store_from_environment() -> ConversationStore:
+    """
+    picks the store according to the environment:
+    HYPER_VYPER_CONVERSATION_DB is a path to a sqlite database shared by all workers. without it, state is in-memory.
+    HYPER_VYPER_CONVERSATION_CAPACITY and HYPER_VYPER_CONVERSATION_TTL_SECONDS bound either store.
+    """
+    capacity = int(os.environ.get('HYPER_VYPER_CONVERSATION_CAPACITY', DEFAULT_CAPACITY))
+    ttl_seconds = float(os.environ.get('HYPER_VYPER_CONVERSATION_TTL_SECONDS', DEFAULT_TTL_SECONDS))
+    db_path = os.environ.get('HYPER_VYPER_CONVERSATION_DB')
+    if db_path:
+        return SqliteConversationStore(db_path, capacity, ttl_seconds)
+    return InMemoryConversationStore(capacity, ttl_seconds)
@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from typing import Optional
+
+from cachetools import TTLCache
+
+from src.state.sqlite_connections import PerThreadConnections
+
+RETRY_NUMBER_HEADER = 'x-slack-retry-num'
+
+
+def delivery_key(body: dict) -> Optional[str]:
+    """
+    :returns what identifies the delivered event across its deliveries: the event id slack puts on every event
+    it sends, or else the client message id of the message in it. slash commands have neither, as slack never
+    re-delivers them.
+    """
+    event_id = body.get('event_id')
+    if event_id is not None:
+        return event_id
+    event = body.get('event')
+    return event.get('client_msg_id') if isinstance(event, dict) else None
+
+
+def retry_number(headers: dict) -> Optional[str]:
+    """:returns the number of the retry slack marked the delivery with, out of headers as bolt keeps them."""
+    values = headers.get(RETRY_NUMBER_HEADER)
+    return values[0] if values else None
+
+
+class DeliveryDeduplicator(object):
+    """
+    Remembers the events slack delivered in the last ttl seconds, so that the retries slack sends when we were slow to
+    answer are acknowledged without being handled again, which would post a second reply and log a second decision.
+    Slack may send a retry to any worker process, so with a db_path the events are claimed in a table of a sqlite
+    database every worker shares, where only the first to insert an event's key handles it. the events this process
+    already knows were delivered are also kept in memory, so that their retries are suppressed without the database.
+    Counts the retries received and the duplicates suppressed; a retry of an event that was never seen, like one
+    delivered before a restart to a process that kept its events in memory, is handled as a first delivery.
+    """
+
+    def __init__(
+            self, maxsize: int = 10000, ttl: float = 3600, db_path: Optional[str] = None,
+            sweep_interval_seconds: float = 60.
+    ):
+        self._seen = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.ttl = ttl
+        self.retries = 0
+        self.suppressed_duplicates = 0
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._last_sweep = 0.
+        self._connections = None
+        if db_path:
+            self._connections = PerThreadConnections(db_path)
+            with self._connections.get() as connection:
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS deliveries (delivery_key TEXT PRIMARY KEY, expires_at REAL NOT NULL)'
+                )
+                connection.execute('CREATE INDEX IF NOT EXISTS deliveries_expiry ON deliveries (expires_at)')
+
+    def is_duplicate(self, body: dict, retry: Optional[str] = None) -> bool:
+        """checks whether the event was delivered before, remembering it if it was not."""
+        key = delivery_key(body)
+        with self._lock:
+            if retry is not None:
+                self.retries += 1
+            if key is None:
+                return False
+            if key in self._seen:
+                self.suppressed_duplicates += 1
+                return True
+            if self._connections is None:
+                self._seen[key] = True
+                return False
+        is_claimed = self._claim(key)
+        with self._lock:
+            self._seen[key] = True
+            if not is_claimed:
+                self.suppressed_duplicates += 1
+        return not is_claimed
+
+    def _claim(self, key: str) -> bool:
+        """:returns whether this process is the first to be delivered the event, in the last ttl seconds."""
+        now = time.time()
+        with self._connections.get() as connection:
+            connection.execute('DELETE FROM deliveries WHERE delivery_key = ? AND expires_at <= ?', (key, now))
+            is_claimed = connection.execute(
+                'INSERT OR IGNORE INTO deliveries (delivery_key, expires_at) VALUES (?, ?)', (key, now + self.ttl)
+            ).rowcount == 1
+        if now - self._last_sweep > self.sweep_interval_seconds:
+            self.sweep()
+        return is_claimed
+
+    def sweep(self) -> int:
+        """removes the expired events from the database. :returns how many were removed."""
+        if self._connections is None:
+            return 0
+        self._last_sweep = time.time()
+        with self._connections.get() as connection:
+            return connection.execute('DELETE FROM deliveries WHERE expires_at <= ?', (self._last_sweep,)).rowcount
+
+    def __len__(self):
+        if self._connections is None:
+            return len(self._seen)
+        return self._connections.get().execute(
+            'SELECT COUNT(*) FROM deliveries WHERE expires_at > ?', (time.time(),)
+        ).fetchone()[0]
+
+
+def delivery_deduplicator_from_environment() -> DeliveryDeduplicator:
+    """
+    keeps the delivered events in the sqlite database HYPER_VYPER_CONVERSATION_DB points at, next to the pending
+    conversations, so that all the workers using it suppress each other's retries. without it, they are in memory.
+    """
+    return DeliveryDeduplicator(db_path=os.environ.get('HYPER_VYPER_CONVERSATION_DB'))
@@ -0,0 +1,76 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, TypeVar
+
+from src.parsing.request_registry import rules_version
+
+Evaluation = TypeVar('Evaluation')
+
+
+class MessageEvaluationCache(object):
+    """
+    Remembers what was made of a message, so that a text pasted again is not classified, extracted and scored again.
+    Texts are kept up to maxsize, evicting the least recently used, and are matched exactly: the near-identical
+    templated requests users paste differ in the very values (durations, ticket numbers) that get extracted,
+    so no normalization of the text could let them share a result. the cached evaluations are shared by every caller,
+    so callers must not change them, see message_evaluation.evaluate_message.
+    Everything is forgotten whenever the version changes: by default whenever a request class, extractor or risk rule
+    is registered, see rules_version, and also whenever anything else that the evaluations depend on changes, like the
+    fallback model of message_evaluation.
+    Counts how many lookups were answered from the cache (hits), how many had to evaluate the text (misses),
+    how many texts were evicted and how many times the cache was emptied because the version changed.
+    """
+
+    def __init__(self, maxsize: int = 4096, version: Callable[[], Hashable] = rules_version):
+        self._evaluations = OrderedDict()
+        self.maxsize = maxsize
+        self.version = version
+        self._lock = threading.Lock()
+        self._version = version()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_or_evaluate(self, text: Hashable, evaluate: Callable[[Hashable], Evaluation]) -> Evaluation:
+        """
+        :returns the cached evaluation of the text, or evaluates and caches it.
+        the evaluation runs outside the lock, so threads evaluating different texts do not wait for each other.
+        """
+        with self._lock:
+            evaluated_by_version = self._invalidate_if_version_changed()
+            evaluation = self._evaluations.get(text)
+            if evaluation is not None:
+                self._evaluations.move_to_end(text)
+                self.hits += 1
+                return evaluation
+            self.misses += 1
+        evaluation = evaluate(text)
+        with self._lock:
+            # rules registered, or a model replaced, while the text was being evaluated may not have been used for it.
+            if self._invalidate_if_version_changed() == evaluated_by_version:
+                self._evaluations[text] = evaluation
+                if len(self._evaluations) > self.maxsize:
+                    self._evaluations.popitem(last=False)
+                    self.evictions += 1
+        return evaluation
+
+    def clear(self) -> None:
+        with self._lock:
+            self._evaluations.clear()
+
+    def _invalidate_if_version_changed(self) -> Hashable:
+        current_version = self.version()
+        if current_version != self._version:
+            self._evaluations.clear()
+            self._version = current_version
+            self.invalidations += 1
+        return current_version
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.
+
+    def __len__(self):
+        return len(self._evaluations)
@@ -0,0 +1,26 @@
+"""
+Connects to the sqlite database that the state shared by every worker process is kept in, see gunicorn.conf.
+"""
+import os
+import sqlite3
+import threading
+
+
+class PerThreadConnections(object):
+    """Gives every thread its own connection to the database, as a sqlite connection must not be shared by threads."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._connections = threading.local()
+
+    def get(self) -> sqlite3.Connection:
+        connection = getattr(self._connections, 'connection', None)
+        # a worker forked from a process which already connected must not share its connection, so it opens its own.
+        if connection is None or self._connections.pid != os.getpid():
+            connection = sqlite3.connect(self.db_path, timeout=10.)
+            # lets readers in other processes go on while one of them writes.
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._connections.connection = connection
+            self._connections.pid = os.getpid()
+        return connection
@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from typing import Optional
+
+from cachetools import TTLCache
+
+from src.state.sqlite_connections import PerThreadConnections
+
+
+class BotThreadIndex(object):
+    """
+    Remembers the timestamps of the threads our bot has started, so that a reply in one of them is recognized
+    without asking slack who posted the thread's root message.
+    The threads slack said someone else started are remembered too, since the author of a thread's root never changes,
+    so that every reply in a thread started by a person does not ask slack again.
+    With a db_path the threads are also kept in a table of a sqlite database every worker process shares, so that a
+    thread one worker learned about is not asked about by the others. what a process looked up is kept in memory.
+    Counts how many lookups were answered locally or by the database (hits) and how many had to fall back to slack
+    (misses).
+    """
+
+    def __init__(
+            self, maxsize: int = 10000, ttl: float = 1000 * 3600, db_path: Optional[str] = None,
+            sweep_interval_seconds: float = 60.
+    ):
+        self._threads = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._last_sweep = 0.
+        self._connections = None
+        if db_path:
+            self._connections = PerThreadConnections(db_path)
+            with self._connections.get() as connection:
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS bot_threads ('
+                    'thread_ts TEXT PRIMARY KEY, is_ours INTEGER NOT NULL, expires_at REAL NOT NULL)'
+                )
+                connection.execute('CREATE INDEX IF NOT EXISTS bot_threads_expiry ON bot_threads (expires_at)')
+
+    def add(self, thread_ts) -> None:
+        self._remember(str(thread_ts), True)
+
+    def add_not_ours(self, thread_ts) -> None:
+        self._remember(str(thread_ts), False)
+
+    def is_ours(self, thread_ts) -> Optional[bool]:
+        """
+        :returns whether the thread was started by our bot, or None if it is not known, counting the lookup as a hit
+        or a miss.
+        """
+        with self._lock:
+            is_ours = self._threads.get(str(thread_ts))
+        if is_ours is None and self._connections is not None:
+            row = self._connections.get().execute(
+                'SELECT is_ours FROM bot_threads WHERE thread_ts = ? AND expires_at > ?', (str(thread_ts), time.time())
+            ).fetchone()
+            if row is not None:
+                is_ours = bool(row[0])
+                with self._lock:
+                    self._threads[str(thread_ts)] = is_ours
+        with self._lock:
+            if is_ours is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return is_ours
+
+    def _remember(self, thread_ts: str, is_ours: bool) -> None:
+        with self._lock:
+            self._threads[thread_ts] = is_ours
+        if self._connections is None:
+            return
+        now = time.time()
+        with self._connections.get() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO bot_threads (thread_ts, is_ours, expires_at) VALUES (?, ?, ?)',
+                (thread_ts, is_ours, now + self.ttl)
+            )
+        if now - self._last_sweep > self.sweep_interval_seconds:
+            self.sweep()
+
+    def sweep(self) -> int:
+        """removes the expired threads from the database. :returns how many were removed."""
+        if self._connections is None:
+            return 0
+        self._last_sweep = time.time()
+        with self._connections.get() as connection:
+            return connection.execute('DELETE FROM bot_threads WHERE expires_at <= ?', (self._last_sweep,)).rowcount
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.
+
+    def __len__(self):
+        return len(self._threads)
+
+
+def bot_thread_index_from_environment() -> BotThreadIndex:
+    """
+    keeps the threads in the sqlite database HYPER_VYPER_CONVERSATION_DB points at, next to the pending conversations,
+    so that all the workers using it share what slack told any of them. without it, they are in memory.
+    """
+    return BotThreadIndex(db_path=os.environ.get('HYPER_VYPER_CONVERSATION_DB'))
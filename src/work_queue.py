@@ -0,0 +1,138 @@
+"""
+Runs the bot's work off the web workers, so that slack gets its ack as soon as a request arrives,
+however long classifying it and talking to slack's api take.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import zlib
+from typing import Any, Callable, List
+
+queue_logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+DEFAULT_CAPACITY_PER_WORKER = 100
+
+_STOP = object()
+
+
+class ShardedWorkQueue(object):
+    """
+    Hands work to a pool of consumer threads, each draining a bounded queue of its own.
+    Work is sharded by a key, like the channel it came from, so all the work of a key runs on the same consumer in the
+    order it was submitted, while work of different keys runs concurrently.
+    When the queue of a shard is full, submit refuses the work right away instead of blocking, and counts it as
+    rejected, leaving it to the caller to tell the user to try again.
+    The consumers start with the first submitted work in a process, and are drained when the process exits.
+    With no workers, the work is handled right away by whoever submits it.
+    """
+
+    def __init__(
+            self, handle: Callable[[Any], None], workers: int = DEFAULT_WORKERS,
+            capacity_per_worker: int = DEFAULT_CAPACITY_PER_WORKER, name: str = 'work-queue'
+    ):
+        self.handle = handle
+        self.workers = workers
+        self.capacity_per_worker = capacity_per_worker
+        self.name = name
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self._queues: List[queue.Queue] = []
+        self._consumers: List[threading.Thread] = []
+        self._consumers_pid = None
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    @property
+    def depth(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    def submit(self, key: str, work: Any) -> bool:
+        """:returns whether the work was queued, or refused because the queue of its shard is full."""
+        if self.workers == 0:
+            with self._lock:
+                self.submitted += 1
+            self._handle(work)
+            return True
+        self._ensure_consumers()
+        shard = self._queues[self.shard_of(key)]
+        try:
+            shard.put_nowait(work)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            queue_logger.warning(f"{self.name} is full, refused work for {key}")
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def shard_of(self, key: str) -> int:
+        """:returns the consumer the work of the key goes to, which is the same in every process."""
+        return zlib.crc32(str(key).encode('utf-8')) % self.workers
+
+    def join(self) -> None:
+        """blocks until all the work submitted so far is done."""
+        for shard in list(self._queues):
+            shard.join()
+
+    def close(self) -> None:
+        """finishes the queued work and stops the consumers. submitting again starts new ones."""
+        with self._lock:
+            consumers, queues = self._consumers, self._queues
+            self._consumers, self._queues, self._consumers_pid = [], [], None
+        alive = [(c, q) for c, q in zip(consumers, queues) if c.is_alive()]
+        for _, shard in alive:
+            shard.put(_STOP)
+        for consumer, _ in alive:
+            consumer.join()
+
+    def _ensure_consumers(self) -> None:
+        # a worker forked from a process which already submitted work inherits the queues, but not their consumers.
+        if self._consumers_pid == os.getpid():
+            return
+        with self._lock:
+            if self._consumers_pid == os.getpid():
+                return
+            self._queues = [queue.Queue(maxsize=self.capacity_per_worker) for _ in range(self.workers)]
+            self._consumers = [
+                threading.Thread(target=self._consume, args=(shard,), name=f"{self.name}-{i}", daemon=True)
+                for i, shard in enumerate(self._queues)
+            ]
+            for consumer in self._consumers:
+                consumer.start()
+            self._consumers_pid = os.getpid()
+
+    def _consume(self, shard: queue.Queue) -> None:
+        while True:
+            work = shard.get()
+            try:
+                if work is _STOP:
+                    return
+                self._handle(work)
+            finally:
+                shard.task_done()
+
+    def _handle(self, work: Any) -> None:
+        try:
+            self.handle(work)
+            with self._lock:
+                self.completed += 1
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            queue_logger.exception(f"{self.name} failed to handle work: {e}")
+
+
+def work_queue_from_environment(handle: Callable[[Any], None], name: str = 'work-queue') -> ShardedWorkQueue:
+    """
+    sizes the queue according to the environment:
+    HYPER_VYPER_WORKERS is the number of consumer threads, and HYPER_VYPER_QUEUE_CAPACITY the work each can hold.
+    """
+    workers = int(os.environ.get('HYPER_VYPER_WORKERS', DEFAULT_WORKERS))
+    capacity_per_worker = int(os.environ.get('HYPER_VYPER_QUEUE_CAPACITY', DEFAULT_CAPACITY_PER_WORKER))
+    return ShardedWorkQueue(handle, workers, capacity_per_worker, name)
@@ -0,0 +1,87 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src import bot_policy
+from src.async_bot_policy import classify_and_respond, handle_message
+from src.parsing.constants import RequestFollowUp
+from src.parsing.requests import FireWallChangeRequest
+from test.example_request_texts import FULL_FIREWALL_CHANGE_REQUEST
+from test.test_server_logic import (
+    VYPER_ID, create_fresh_payload_with_text, create_threaded_payload_with_text, _portless_fw_change_req
+)
+
+
+class AsyncConversationalFlowCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        bot_policy.decision_logger.log = MagicMock()
+
+        self.threading_client = AsyncMock()
+        self.threading_client.chat_postMessage.return_value = {'ts': 4242.0}
+        self.threading_client.conversations_history.return_value = {
+            'ok': True,
+            'messages': [{'bot_id': VYPER_ID}]
+        }
+
+        self.bot_context = MagicMock()
+        self.bot_context.bot_id = VYPER_ID
+
+    async def test_given_every_required_field_for_Firewall_Change_request_then_followup_is_accept(self):
+        bot_response = await classify_and_respond(
+            create_fresh_payload_with_text(FULL_FIREWALL_CHANGE_REQUEST), self.threading_client
+        )
+        self.assertIsInstance(bot_response.user_request, FireWallChangeRequest)
+        self.assertEqual(RequestFollowUp.ACCEPT, bot_response.bot_decision.outcome)
+        bot_policy.decision_logger.log.assert_called_once()
+
+    async def test_given_partial_request_followed_by_missing_field_then_original_user_request_is_fixed(self):
+        bot_response = await classify_and_respond(_portless_fw_change_req, self.threading_client)
+        new_message = create_threaded_payload_with_text(
+            'send it to 666.666.666.666 on port 22', bot_response.thread_ts
+        )
+        updated_bot_decision = await handle_message(
+            new_message, self.threading_client, AsyncMock(), self.bot_context
+        )
+        self.assertTrue(updated_bot_decision.user_request.is_valid())
+        self.assertEqual(RequestFollowUp.ACCEPT, updated_bot_decision.bot_decision.outcome)
+        self.assertEqual(bot_response.bot_decision.ticket_id, updated_bot_decision.bot_decision.ticket_id)
+
+    async def test_reply_to_closed_thread_is_answered_in_that_thread(self):
+        say = AsyncMock()
+        closed_thread = create_threaded_payload_with_text('are you still there?', 1337.0)
+        bot_response = await handle_message(closed_thread, self.threading_client, say, self.bot_context)
+
+        self.assertEqual(RequestFollowUp.IRRELEVANT, bot_response.bot_decision.outcome)
+        self.assertEqual(1337.0, say.await_args.kwargs['thread_ts'])
+
+    async def test_slow_slack_api_calls_are_awaited_concurrently(self):
+        async def slow_post(**kwargs):
+            await asyncio.sleep(0.2)
+            return {'ts': time.time()}
+
+        self.threading_client.chat_postMessage.side_effect = slow_post
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            classify_and_respond(_portless_fw_change_req, self.threading_client) for _ in range(10)
+        ))
+        self.assertLess(time.perf_counter() - start, 1.)
+
+    async def test_slow_evaluations_do_not_block_the_event_loop(self):
+        evaluate_new_request = bot_policy._evaluate_new_request
+
+        def slow_evaluation(payload):
+            time.sleep(0.2)
+            return evaluate_new_request(payload)
+
+        start = time.perf_counter()
+        with patch('src.async_bot_policy._evaluate_new_request', slow_evaluation):
+            await asyncio.gather(*(
+                classify_and_respond(_portless_fw_change_req, self.threading_client) for _ in range(4)
+            ))
+        self.assertLess(time.perf_counter() - start, .6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import copy
+import json
+import pickle
+import unittest
+
+from parameterized import parameterized
+
+from src.conversational_user_interfaces.furry import Furry
+from src.conversational_user_interfaces.professional import Professional
+from src.parsing.constants import RequestTypes
+from test.example_request_objects import ALL_EMPTY_REQUESTS
+
+ATTITUDES = [(Professional.__name__, Professional), (Furry.__name__, Furry)]
+
+
+class CachedBlocksCase(unittest.TestCase):
+
+    @parameterized.expand(ATTITUDES)
+    def test_static_blocks_are_built_once_and_shared_between_replies(self, _, attitude_class):
+        attitude = attitude_class()
+        self.assertIs(attitude.generate_approval_block(), attitude.generate_approval_block())
+        self.assertIs(
+            attitude.generate_initial_classification_block(RequestTypes.DATA_EXPORT),
+            attitude.generate_initial_classification_block(RequestTypes.DATA_EXPORT)
+        )
+        missing_fields = ALL_EMPTY_REQUESTS[0].get_missing_fields()
+        self.assertIs(
+            attitude.generate_request_for_fields(missing_fields),
+            attitude.generate_request_for_fields(list(missing_fields))
+        )
+
+    @parameterized.expand(ATTITUDES)
+    def test_blocks_of_different_arguments_are_cached_apart(self, _, attitude_class):
+        attitude = attitude_class()
+        self.assertNotEqual(
+            attitude.generate_initial_classification_block(RequestTypes.DATA_EXPORT),
+            attitude.generate_initial_classification_block(RequestTypes.CLOUD_ACCESS)
+        )
+
+    @parameterized.expand(ATTITUDES)
+    def test_shared_blocks_cannot_be_changed(self, _, attitude_class):
+        block = attitude_class().generate_rejection_block()
+        with self.assertRaises(TypeError):
+            block['type'] = 'header'
+        with self.assertRaises(TypeError):
+            block['text'].update({'text': 'approved after all'})
+
+    @parameterized.expand(ATTITUDES)
+    def test_shared_blocks_serialize_like_freshly_built_ones(self, _, attitude_class):
+        attitude = attitude_class()
+        block = attitude.generate_help_block()
+        fresh_block = attitude_class.generate_help_block.__wrapped__(attitude)
+        self.assertEqual(json.dumps(fresh_block), json.dumps(block))
+        self.assertEqual(fresh_block, pickle.loads(pickle.dumps(block)))
+        self.assertEqual(fresh_block, copy.deepcopy(block))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, timezone
+
+from src.auditing.audit_compaction import compact_audit_log
+from src.auditing.audit_query import outcome_rates
+from src.auditing.audit_records import format_record, parse_records, record_to_decision
+from src.message_evaluation import create_bot_decision, evaluate_message
+from test.example_request_texts import FULL_FIREWALL_CHANGE_REQUEST, FULL_DATA_EXPORT_REQUEST
+
+
+def _decision(text: str, created_at: datetime):
+    evaluation = evaluate_message(text)
+    decision = create_bot_decision(
+        text, evaluation.request_type, evaluation.user_request, evaluation.security_risk, evaluation.followup
+    )
+    decision.created_at = created_at
+    return decision
+
+
+_MONDAY = datetime(2025, 7, 7, 12, tzinfo=timezone.utc)
+_TUESDAY = datetime(2025, 7, 8, 12, tzinfo=timezone.utc)
+
+
+class AuditRecordTest(unittest.TestCase):
+
+    def test_parsed_record_gives_back_the_decision(self):
+        decision = _decision(FULL_FIREWALL_CHANGE_REQUEST, _MONDAY)
+        [record] = parse_records([format_record(decision)])
+        self.assertEqual(decision, record_to_decision(record))
+
+    def test_lines_of_older_repr_logs_are_skipped(self):
+        decision = _decision(FULL_FIREWALL_CHANGE_REQUEST, _MONDAY)
+        records = list(parse_records(["{'ticket_id': 'invalid', 'created_at': datetime.datetime(2025, 7, 7)}",
+                                      format_record(decision)]))
+        self.assertEqual([decision], [record_to_decision(r) for r in records])
+
+
+class AuditCompactionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.audit_dir = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.audit_dir.name, 'audit.log')
+        self.dataset_dir = os.path.join(self.audit_dir.name, 'audit')
+
+    def tearDown(self):
+        self.audit_dir.cleanup()
+
+    def _append_to_log(self, *decisions):
+        with open(self.log_path, 'a', encoding='utf-8') as file:
+            file.write(''.join(format_record(d) for d in decisions))
+
+    def test_every_compaction_only_adds_the_records_logged_since_the_last_one(self):
+        self._append_to_log(_decision(FULL_FIREWALL_CHANGE_REQUEST, _MONDAY))
+        self.assertEqual(1, compact_audit_log(self.log_path, self.dataset_dir))
+        self._append_to_log(_decision(FULL_DATA_EXPORT_REQUEST, _TUESDAY))
+        self.assertEqual(1, compact_audit_log(self.log_path, self.dataset_dir))
+        self.assertEqual(0, compact_audit_log(self.log_path, self.dataset_dir))
+
+        rates = outcome_rates(self.dataset_dir, _MONDAY.date(), _TUESDAY.date(), ['request_type'])
+        self.assertEqual([1, 1], rates['decisions'].tolist())
+
+    def test_partially_written_last_line_is_left_for_the_next_compaction(self):
+        self._append_to_log(_decision(FULL_FIREWALL_CHANGE_REQUEST, _MONDAY))
+        partial_line = format_record(_decision(FULL_FIREWALL_CHANGE_REQUEST, _MONDAY))
+        with open(self.log_path, 'a', encoding='utf-8') as file:
+            file.write(partial_line[:20])
+        self.assertEqual(1, compact_audit_log(self.log_path, self.dataset_dir))
+
+        with open(self.log_path, 'a', encoding='utf-8') as file:
+            file.write(partial_line[20:])
+        self.assertEqual(1, compact_audit_log(self.log_path, self.dataset_dir))
+
+    def test_query_only_counts_decisions_within_the_dates(self):
+        self._append_to_log(
+            _decision(FULL_FIREWALL_CHANGE_REQUEST, _MONDAY),
+            _decision(FULL_FIREWALL_CHANGE_REQUEST, _TUESDAY),
+            _decision('shambalulu', _TUESDAY),
+        )
+        compact_audit_log(self.log_path, self.dataset_dir)
+
+        rates = outcome_rates(self.dataset_dir, _TUESDAY.date(), _TUESDAY.date(), ['request_type'])
+        self.assertEqual(1, rates.loc['FIREWALL CHANGE', 'decisions'])
+        self.assertEqual(1., rates.loc['UNKNOWN', 'Reject'])
+        self.assertTrue(outcome_rates(self.dataset_dir, date(2025, 1, 1), date(2025, 1, 2), ['outcome']).empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from src.batch_classification import BatchThroughput, classify_batch
+from src.message_evaluation import evaluate_message
+from test.example_request_texts import (
+    FULL_FIREWALL_CHANGE_REQUEST, FULL_DEVTOOL_INSTALL_REQUEST,
+    FULL_PERMISSION_CHANGE_REQUEST, FULL_DATA_EXPORT_REQUEST, FULL_CLOUD_ACCESS_REQUEST,
+    FULL_NETWORK_ACCESS_REQUEST, FULL_VENDOR_APPROVAL_REQUEST
+)
+
+_TEXTS = [
+    FULL_CLOUD_ACCESS_REQUEST, FULL_DATA_EXPORT_REQUEST, FULL_DEVTOOL_INSTALL_REQUEST,
+    FULL_FIREWALL_CHANGE_REQUEST, FULL_NETWORK_ACCESS_REQUEST, FULL_PERMISSION_CHANGE_REQUEST,
+    FULL_VENDOR_APPROVAL_REQUEST, 'shambalulu',
+] * 5
+
+
+class BatchClassificationCase(unittest.TestCase):
+
+    def test_batch_decisions_agree_with_evaluating_every_message_alone(self):
+        decisions = list(classify_batch(_TEXTS, workers=1, chunk_size=3))
+        expected = [evaluate_message(t) for t in _TEXTS]
+        self.assertEqual([e.request_type for e in expected], [d.request_type for d in decisions])
+        self.assertEqual([e.followup for e in expected], [d.outcome for d in decisions])
+        self.assertEqual([e.security_risk for e in expected], [d.security_risk for d in decisions])
+
+    def test_decisions_from_worker_processes_keep_the_order_of_the_texts(self):
+        decisions = list(classify_batch(iter(_TEXTS), workers=2, chunk_size=3))
+        self.assertEqual(_TEXTS, [d.details for d in decisions])
+
+    def test_throughput_counts_every_message(self):
+        throughput = BatchThroughput()
+        list(classify_batch(_TEXTS, workers=1, chunk_size=4, throughput=throughput))
+        self.assertEqual(len(_TEXTS), throughput.messages)
+        self.assertGreater(throughput.messages_per_second, 0)
+
+    def test_lower_threshold_rejects_previously_accepted_requests(self):
+        lenient, strict = [
+            next(classify_batch([FULL_FIREWALL_CHANGE_REQUEST], workers=1, security_risk_threshold=t))
+            for t in [100, 0]
+        ]
+        self.assertNotEqual(lenient.outcome, strict.outcome)
+
+
+if __name__ == '__main__':
+    unittest.main()
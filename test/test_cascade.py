@@ -0,0 +1,64 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src import message_evaluation
+from src.parsing.cascade import CascadeRouter, CascadeTier
+from src.parsing.constants import RequestTypes
+from src.parsing.regex_classifier import classify_with_confidence
+
+
+def _answering(request_type: str, confidence: float) -> MagicMock:
+    return MagicMock(return_value=(request_type, confidence))
+
+
+class CascadeRouterCase(unittest.TestCase):
+
+    def setUp(self):
+        self.model = _answering(RequestTypes.CLOUD_ACCESS, .9)
+        self.router = CascadeRouter([
+            CascadeTier('keyword_rules', classify_with_confidence, .75), CascadeTier('model', self.model)
+        ])
+
+    def test_confident_tier_answers_without_escalating(self):
+        self.assertEqual((RequestTypes.DATA_EXPORT, .9), self.router.classify('please export the data'))
+        self.model.assert_not_called()
+        self.assertEqual(0., self.router.escalation_rate('keyword_rules'))
+
+    def test_unsure_tier_escalates_to_the_next(self):
+        self.assertEqual((RequestTypes.CLOUD_ACCESS, .9), self.router.classify('I need access to install X'))
+        self.model.assert_called_once_with('I need access to install X')
+
+    def test_unknown_escalates_to_the_next_tier(self):
+        self.assertEqual((RequestTypes.CLOUD_ACCESS, .9), self.router.classify('nothing to see here'))
+
+    def test_when_no_tier_is_confident_then_the_most_confident_answer_is_taken(self):
+        self.model.return_value = (RequestTypes.UNKNOWN, .4)
+        self.assertEqual((RequestTypes.DEVTOOL_INSTALL, .45), self.router.classify('I need access to install X'))
+
+    def test_when_every_tier_misses_then_it_is_unknown(self):
+        self.model.return_value = (RequestTypes.UNKNOWN, .2)
+        self.assertEqual(RequestTypes.UNKNOWN, self.router.classify('nothing to see here')[0])
+
+    def test_escalation_rate_is_the_share_of_escalated_messages(self):
+        for text in ['please export the data', 'I need access to install X', 'role', 'nothing to see here']:
+            self.router.classify(text)
+        self.assertEqual(.5, self.router.escalation_rate('keyword_rules'))
+        self.assertEqual(0., self.router.escalation_rate('model'))
+
+
+class MessageClassificationCase(unittest.TestCase):
+
+    def test_without_a_fallback_model_escalations_are_counted_and_the_keyword_rules_answer(self):
+        router = CascadeRouter(message_evaluation.classification_cascade.tiers)
+        with patch.object(message_evaluation, 'classification_cascade', router), \
+                patch.object(message_evaluation, 'fallback_classifier', None):
+            request_types = [
+                message_evaluation.classify_message(text)
+                for text in ['please export the data', 'I need access to install X', 'nothing to see here']
+            ]
+        self.assertEqual([RequestTypes.DATA_EXPORT, RequestTypes.DEVTOOL_INSTALL, RequestTypes.UNKNOWN], request_types)
+        self.assertAlmostEqual(2 / 3, router.escalation_rate('keyword_rules'))
+
+
+if __name__ == '__main__':
+    unittest.main()
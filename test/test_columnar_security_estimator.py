@@ -0,0 +1,62 @@
+import unittest
+
+from src.columnar_security_estimator import (
+    IS_VALID_COLUMN, calculate_security_risks, decide_on_follow_ups, requests_to_frame
+)
+from src.message_evaluation import decide_on_follow_up
+from src.parsing.regex_classifier import attempt_to_classify, construct_according_to_classification
+from src.parsing.requests import PermissionsChangeRequest, VendorApprovalRequest
+from src.security_estimator import calculate_security_risk
+from test.example_request_objects import (
+    ALL_EMPTY_REQUESTS, FILLED_REQUESTS, ALTERNATE_FILLED_REQUESTS
+)
+from test.example_request_texts import (
+    FULL_FIREWALL_CHANGE_REQUEST, FULL_DEVTOOL_INSTALL_REQUEST,
+    FULL_PERMISSION_CHANGE_REQUEST, FULL_DATA_EXPORT_REQUEST, FULL_CLOUD_ACCESS_REQUEST,
+    FULL_NETWORK_ACCESS_REQUEST, FULL_VENDOR_APPROVAL_REQUEST
+)
+
+_PARSED_REQUESTS = [
+    construct_according_to_classification(attempt_to_classify(text), text) for text in [
+        FULL_CLOUD_ACCESS_REQUEST, FULL_DATA_EXPORT_REQUEST, FULL_DEVTOOL_INSTALL_REQUEST,
+        FULL_FIREWALL_CHANGE_REQUEST, FULL_NETWORK_ACCESS_REQUEST, FULL_PERMISSION_CHANGE_REQUEST,
+        FULL_VENDOR_APPROVAL_REQUEST,
+    ]
+]
+
+_REQUESTS = ALL_EMPTY_REQUESTS + FILLED_REQUESTS + ALTERNATE_FILLED_REQUESTS + _PARSED_REQUESTS + [
+    PermissionsChangeRequest('to fix prod', '90 minutes', 'INFRA-1', 'acme-prod', None),
+    PermissionsChangeRequest('to fix prod', '3 Days', 'INFRA-1', None, None),
+    PermissionsChangeRequest('to fix prod', '2 days', 'INFRA-1', 'acme-dev', 'Admin'),
+    VendorApprovalRequest(None, False, 'confidential', False),
+]
+
+
+class ColumnarSecurityEstimatorCase(unittest.TestCase):
+
+    def test_columnar_risks_equal_the_risk_of_every_request_on_its_own(self):
+        risks = calculate_security_risks(requests_to_frame(_REQUESTS))
+        self.assertEqual([calculate_security_risk(r) for r in _REQUESTS], risks.tolist())
+
+    def test_columnar_follow_ups_equal_the_follow_up_of_every_request_on_its_own(self):
+        frame = requests_to_frame(_REQUESTS)
+        risks = calculate_security_risks(frame)
+        for threshold in [0, 50, 75, 100]:
+            self.assertEqual(
+                [decide_on_follow_up(r, calculate_security_risk(r), threshold) for r in _REQUESTS],
+                decide_on_follow_ups(frame, risks, threshold).tolist()
+            )
+
+    def test_given_frame_without_validity_column_then_validity_is_derived_from_the_fields(self):
+        frame = requests_to_frame(_REQUESTS)
+        self.assertEqual(
+            calculate_security_risks(frame).tolist(),
+            calculate_security_risks(frame.drop(columns=IS_VALID_COLUMN)).tolist()
+        )
+
+    def test_given_no_requests_then_there_are_no_risks(self):
+        self.assertEqual(0, len(calculate_security_risks(requests_to_frame([]))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+from parameterized import parameterized
+
+from src.state.conversation_store import (
+    InMemoryConversationStore, SqliteConversationStore, deserialize_request, serialize_request
+)
+from test.example_request_objects import ALL_EMPTY_REQUESTS, FILLED_REQUESTS
+
+
+class RequestSerializationTest(unittest.TestCase):
+
+    @parameterized.expand([(r.request_type, r) for r in ALL_EMPTY_REQUESTS + FILLED_REQUESTS])
+    def test_deserialized_request_equals_the_original(self, _, request):
+        restored = deserialize_request(serialize_request(request))
+        self.assertIs(type(request), type(restored))
+        self.assertEqual(request, restored)
+
+
+class ConversationStoreContract(object):
+    """the behaviour every store should have. mixed into a TestCase per store."""
+
+    def create_store(self, capacity=10, ttl_seconds=60.):
+        raise NotImplementedError()
+
+    def test_stored_request_is_found_by_its_thread(self):
+        store = self.create_store()
+        store.put(42.0, FILLED_REQUESTS[0])
+        self.assertEqual(FILLED_REQUESTS[0], store.get('42.0'))
+
+    def test_popped_request_is_no_longer_found(self):
+        store = self.create_store()
+        store.put(42.0, FILLED_REQUESTS[0])
+        self.assertEqual(FILLED_REQUESTS[0], store.pop(42.0))
+        self.assertIsNone(store.get(42.0))
+        self.assertIsNone(store.pop(42.0))
+
+    def test_expired_request_is_not_found_and_is_swept(self):
+        store = self.create_store(ttl_seconds=0.01)
+        store.put(42.0, FILLED_REQUESTS[0])
+        time.sleep(0.02)
+        self.assertIsNone(store.get(42.0))
+        self.assertEqual(1, store.sweep())
+        self.assertEqual(0, len(store))
+
+    def test_store_at_capacity_evicts_the_oldest_request(self):
+        store = self.create_store(capacity=2)
+        for thread_ts, request in enumerate(FILLED_REQUESTS[:3]):
+            store.put(thread_ts, request)
+        self.assertEqual(2, len(store))
+        self.assertIsNone(store.get(0))
+        self.assertEqual(FILLED_REQUESTS[2], store.get(2))
+
+
+class InMemoryConversationStoreTest(ConversationStoreContract, unittest.TestCase):
+
+    def create_store(self, capacity=10, ttl_seconds=60.):
+        return InMemoryConversationStore(capacity, ttl_seconds)
+
+
+class SqliteConversationStoreTest(ConversationStoreContract, unittest.TestCase):
+
+    def setUp(self):
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.db_dir.name, 'conversations.db')
+
+    def tearDown(self):
+        self.db_dir.cleanup()
+
+    def create_store(self, capacity=10, ttl_seconds=60.):
+        return SqliteConversationStore(self.db_path, capacity, ttl_seconds)
+
+    def test_request_stored_by_one_store_is_found_by_another_on_the_same_database(self):
+        self.create_store().put(42.0, FILLED_REQUESTS[0])
+        self.assertEqual(FILLED_REQUESTS[0], self.create_store().get(42.0))
+
+    def test_storing_a_new_request_in_a_known_thread_does_not_count_the_store(self):
+        store = self.create_store(capacity=2)
+        store.put(42.0, FILLED_REQUESTS[0])
+        statements = []
+        store._connection().set_trace_callback(statements.append)
+        store.put(42.0, FILLED_REQUESTS[1])
+
+        self.assertEqual(FILLED_REQUESTS[1], store.get(42.0))
+        self.assertFalse([statement for statement in statements if 'COUNT' in statement])
+
+    @unittest.skipIf(sys.platform == 'win32', 'workers are only forked on posix')
+    def test_request_stored_by_a_forked_worker_is_found_by_its_parent(self):
+        store = self.create_store()
+        store.put(1.0, FILLED_REQUESTS[0])
+        worker = multiprocessing.get_context('fork').Process(target=store.put, args=(42.0, FILLED_REQUESTS[1]))
+        worker.start()
+        worker.join()
+
+        self.assertEqual(0, worker.exitcode)
+        self.assertEqual(FILLED_REQUESTS[1], store.get(42.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from src.auditing.audit_records import format_record, parse_records
+from src.auditing.bot_decision import BotDecision
+from src.auditing.decision_logging import DecisionLogger
+from src.parsing.constants import RequestFollowUp
+
+
+def _decision(ticket_id: str) -> BotDecision:
+    return BotDecision(ticket_id=ticket_id, details='shambalulu', outcome=RequestFollowUp.REJECT)
+
+
+class DecisionLoggerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.log_dir = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.log_dir.name, 'logs', 'audit.log')
+
+    def tearDown(self):
+        self.log_dir.cleanup()
+
+    def _read_log(self):
+        with open(self.log_path) as file:
+            return file.read().splitlines()
+
+    def test_flushed_decisions_are_in_the_log_in_order(self):
+        decision_logger = DecisionLogger(self.log_path, batch_size=3)
+        for ticket in range(10):
+            decision_logger.log(_decision(str(ticket)))
+        decision_logger.flush()
+
+        self.assertEqual([str(t) for t in range(10)], [r['ticket_id'] for r in parse_records(self._read_log())])
+        self.assertEqual(10, decision_logger.written_records)
+        self.assertEqual(0, decision_logger.queue_depth)
+        decision_logger.close()
+
+    def test_closing_writes_whatever_was_still_queued(self):
+        decision_logger = DecisionLogger(self.log_path, fsync_interval_seconds=60.)
+        decision_logger.log(_decision('a'))
+        decision_logger.log(_decision('b'))
+        decision_logger.close()
+
+        self.assertEqual(2, len(self._read_log()))
+
+    def test_decisions_beyond_queue_size_are_dropped_and_counted(self):
+        decision_logger = DecisionLogger(self.log_path, queue_size=2)
+        # keeps the writer from draining the queue.
+        decision_logger._ensure_writer = lambda: None
+        for ticket in range(5):
+            decision_logger.log(_decision(str(ticket)))
+
+        self.assertEqual(2, decision_logger.queue_depth)
+        self.assertEqual(3, decision_logger.dropped_records)
+
+    def test_a_decision_that_fails_to_format_is_dropped_and_the_rest_are_written(self):
+        def failing_format_record(decision: BotDecision) -> str:
+            if decision.ticket_id == '1':
+                raise ValueError('unformattable')
+            return format_record(decision)
+
+        decision_logger = DecisionLogger(self.log_path)
+        with mock.patch('src.auditing.decision_logging.format_record', side_effect=failing_format_record):
+            for ticket in range(3):
+                decision_logger.log(_decision(str(ticket)))
+            decision_logger.flush()
+        decision_logger.log(_decision('3'))
+        decision_logger.close()
+
+        self.assertEqual(['0', '2', '3'], [r['ticket_id'] for r in parse_records(self._read_log())])
+        self.assertEqual(1, decision_logger.dropped_records)
+        self.assertEqual(3, decision_logger.written_records)
+
+    def test_a_writer_that_stopped_drops_what_was_queued_and_is_restarted_by_a_later_log(self):
+        decision_logger = DecisionLogger(self.log_path)
+        with mock.patch('src.auditing.decision_logging.os.makedirs', side_effect=RuntimeError('no disk')):
+            decision_logger.log(_decision('0'))
+            decision_logger._writer.join()
+        with mock.patch('src.auditing.decision_logging.WRITER_RESTART_INTERVAL_SECONDS', 0.):
+            decision_logger.log(_decision('1'))
+        self.assertTrue(decision_logger.flush())
+        decision_logger.close()
+
+        self.assertEqual(['1'], [r['ticket_id'] for r in parse_records(self._read_log())])
+        self.assertEqual(1, decision_logger.dropped_records)
+
+    def test_flushing_a_log_that_cannot_be_opened_does_not_hang(self):
+        os.makedirs(self.log_path)
+        decision_logger = DecisionLogger(self.log_path)
+        decision_logger.log(_decision('0'))
+        start = time.monotonic()
+        decision_logger.flush(timeout=5.)
+        failed_writer = decision_logger._writer
+        failed_writer.join()
+        decision_logger.log(_decision('1'))
+
+        self.assertLess(time.monotonic() - start, 1.)
+        self.assertEqual(1, decision_logger.dropped_records)
+        # the next writer only starts after the restart interval, rather than on every decision logged.
+        self.assertIs(failed_writer, decision_logger._writer)
+        self.assertEqual(1, decision_logger.queue_depth)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+
+from src.state.delivery_deduplication import DeliveryDeduplicator, delivery_key, retry_number
+
+
+def _event_delivery(event_id: str = 'Ev01', client_msg_id: str = 'msg-01') -> dict:
+    return {
+        'type': 'event_callback',
+        'event_id': event_id,
+        'event': {'type': 'message', 'text': 'hello', 'client_msg_id': client_msg_id},
+    }
+
+
+class DeliveryKeyCase(unittest.TestCase):
+
+    def test_events_are_identified_by_their_event_id(self):
+        self.assertEqual('Ev01', delivery_key(_event_delivery()))
+
+    def test_without_event_id_the_client_message_id_identifies_the_event(self):
+        body = _event_delivery()
+        del body['event_id']
+        self.assertEqual('msg-01', delivery_key(body))
+
+    def test_slash_commands_are_not_identified(self):
+        self.assertIsNone(delivery_key({'command': '/classify', 'text': 'hello'}))
+
+    def test_retry_number_is_read_from_bolt_headers(self):
+        self.assertEqual('2', retry_number({'x-slack-retry-num': ['2']}))
+        self.assertIsNone(retry_number({}))
+
+
+class DeliveryDeduplicatorCase(unittest.TestCase):
+
+    def setUp(self):
+        self.seen_deliveries = DeliveryDeduplicator()
+
+    def test_first_delivery_is_handled_and_its_retries_are_suppressed(self):
+        self.assertFalse(self.seen_deliveries.is_duplicate(_event_delivery()))
+        self.assertTrue(self.seen_deliveries.is_duplicate(_event_delivery(), retry='1'))
+        self.assertTrue(self.seen_deliveries.is_duplicate(_event_delivery(), retry='2'))
+        self.assertEqual(2, self.seen_deliveries.retries)
+        self.assertEqual(2, self.seen_deliveries.suppressed_duplicates)
+
+    def test_retry_of_an_event_never_seen_is_handled(self):
+        self.assertFalse(self.seen_deliveries.is_duplicate(_event_delivery(), retry='1'))
+        self.assertEqual(0, self.seen_deliveries.suppressed_duplicates)
+
+    def test_different_events_are_all_handled(self):
+        for event_id in ['Ev01', 'Ev02', 'Ev03']:
+            self.assertFalse(self.seen_deliveries.is_duplicate(_event_delivery(event_id)))
+
+    def test_deliveries_without_a_key_are_never_suppressed(self):
+        command = {'command': '/classify', 'text': 'hello'}
+        self.assertFalse(self.seen_deliveries.is_duplicate(command))
+        self.assertFalse(self.seen_deliveries.is_duplicate(command))
+
+    def test_events_are_forgotten_after_the_time_window(self):
+        seen_deliveries = DeliveryDeduplicator(ttl=0)
+        seen_deliveries.is_duplicate(_event_delivery())
+        self.assertFalse(seen_deliveries.is_duplicate(_event_delivery(), retry='1'))
+
+
+class SharedDeliveryDeduplicatorCase(unittest.TestCase):
+
+    def setUp(self):
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.db_dir.name, 'state.db')
+
+    def tearDown(self):
+        self.db_dir.cleanup()
+
+    def test_retry_delivered_to_another_worker_is_suppressed(self):
+        first_worker, second_worker = [DeliveryDeduplicator(db_path=self.db_path) for _ in range(2)]
+        self.assertFalse(first_worker.is_duplicate(_event_delivery()))
+        self.assertTrue(second_worker.is_duplicate(_event_delivery(), retry='1'))
+        self.assertTrue(first_worker.is_duplicate(_event_delivery(), retry='2'))
+        self.assertEqual(1, second_worker.suppressed_duplicates)
+        self.assertEqual(1, len(second_worker))
+
+    def test_events_claimed_by_another_worker_are_forgotten_after_the_time_window(self):
+        first_worker, second_worker = [DeliveryDeduplicator(ttl=0, db_path=self.db_path) for _ in range(2)]
+        first_worker.is_duplicate(_event_delivery())
+        self.assertFalse(second_worker.is_duplicate(_event_delivery(), retry='1'))
+        self.assertEqual(0, len(second_worker))
+
+
+if __name__ == '__main__':
+    unittest.main()
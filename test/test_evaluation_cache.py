@@ -0,0 +1,90 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src import message_evaluation
+from src.message_evaluation import evaluate_message, evaluation_cache
+from src.parsing.constants import RequestFollowUp, RequestTypes
+from src.parsing.regex_classifier import MAX_MESSAGE_LENGTH
+from src.parsing.request_registry import register_request_class, schema_of
+from src.state.evaluation_cache import MessageEvaluationCache
+from test.example_request_texts import FULL_FIREWALL_CHANGE_REQUEST
+
+
+class MessageEvaluationCacheCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = MessageEvaluationCache(maxsize=2)
+        self.evaluate = MagicMock(side_effect=lambda text: text.upper())
+
+    def test_repeated_text_is_evaluated_once(self):
+        results = [self.cache.get_or_evaluate('same text', self.evaluate) for _ in range(3)]
+        self.assertEqual(['SAME TEXT'] * 3, results)
+        self.evaluate.assert_called_once_with('same text')
+        self.assertEqual((2, 1), (self.cache.hits, self.cache.misses))
+        self.assertAlmostEqual(2 / 3, self.cache.hit_rate)
+
+    def test_texts_are_matched_exactly(self):
+        self.cache.get_or_evaluate('some text', self.evaluate)
+        self.cache.get_or_evaluate('some text ', self.evaluate)
+        self.assertEqual(2, self.evaluate.call_count)
+
+    def test_least_recently_used_text_is_evicted_first(self):
+        for text in ['first', 'second', 'first', 'third']:
+            self.cache.get_or_evaluate(text, self.evaluate)
+        self.assertEqual(1, self.cache.evictions)
+        self.evaluate.reset_mock()
+
+        self.cache.get_or_evaluate('first', self.evaluate)
+        self.evaluate.assert_not_called()
+        self.cache.get_or_evaluate('second', self.evaluate)
+        self.evaluate.assert_called_once_with('second')
+
+    def test_registering_rules_empties_the_cache(self):
+        self.cache.get_or_evaluate('some text', self.evaluate)
+        schema = schema_of(RequestTypes.DATA_EXPORT)
+        register_request_class(schema.request_type, schema.request_class)
+
+        self.cache.get_or_evaluate('some text', self.evaluate)
+        self.assertEqual(2, self.evaluate.call_count)
+        self.assertEqual(1, self.cache.invalidations)
+
+
+class CachedMessageEvaluationCase(unittest.TestCase):
+
+    def test_threshold_change_applies_to_texts_already_evaluated(self):
+        lenient, strict = [evaluate_message(FULL_FIREWALL_CHANGE_REQUEST, threshold) for threshold in [100, 0]]
+        self.assertEqual(RequestFollowUp.ACCEPT, lenient.followup)
+        self.assertEqual(RequestFollowUp.REJECT, strict.followup)
+        self.assertEqual(lenient.security_risk, strict.security_risk)
+
+    def test_changing_an_evaluated_request_does_not_change_the_cached_one(self):
+        first = evaluate_message(FULL_FIREWALL_CHANGE_REQUEST)
+        first.user_request.destination_ip = None
+
+        second = evaluate_message(FULL_FIREWALL_CHANGE_REQUEST)
+        self.assertIsNotNone(second.user_request.destination_ip)
+        self.assertEqual(RequestFollowUp.ACCEPT, second.followup)
+
+    def test_texts_differing_only_beyond_the_parsed_length_share_an_evaluation(self):
+        evaluation_cache.clear()
+        padded_request = FULL_FIREWALL_CHANGE_REQUEST.ljust(MAX_MESSAGE_LENGTH)
+        for suffix in ['a', 'b']:
+            evaluate_message(padded_request + suffix)
+        self.assertEqual(1, len(evaluation_cache))
+
+    def test_replacing_the_fallback_model_forgets_what_the_previous_one_answered(self):
+        vendor_model, export_model = MagicMock(), MagicMock()
+        vendor_model.classify.return_value = (RequestTypes.VENDOR_APPROVAL, .9)
+        export_model.classify.return_value = (RequestTypes.DATA_EXPORT, .9)
+
+        evaluation_cache.clear()
+        request_types = []
+        for model in [vendor_model, export_model]:
+            with patch.object(message_evaluation, 'fallback_classifier', model):
+                request_types.append(evaluate_message('could you sort this out for me').request_type)
+        evaluation_cache.clear()
+        self.assertEqual([RequestTypes.VENDOR_APPROVAL, RequestTypes.DATA_EXPORT], request_types)
+
+
+if __name__ == '__main__':
+    unittest.main()
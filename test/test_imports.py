@@ -0,0 +1,35 @@
+import subprocess
+import sys
+import unittest
+
+# packages the bot does not need to answer slack, which would make every cold start slower.
+HEAVY_PACKAGES = ['torch', 'transformers', 'datasets', 'accelerate', 'pandas', 'numpy', 'matplotlib', 'pyarrow']
+
+
+def _packages_imported_by(module: str) -> set:
+    completed = subprocess.run(
+        [sys.executable, '-c', f"import sys, {module}; print(' '.join(sys.modules))"],
+        capture_output=True, text=True, check=True
+    )
+    return {name.split('.')[0] for name in completed.stdout.split()}
+
+
+class ServingImportsCase(unittest.TestCase):
+
+    def test_policy_imports_no_heavy_packages(self):
+        imported = _packages_imported_by('src.bot_policy')
+        self.assertEqual([], [package for package in HEAVY_PACKAGES if package in imported])
+
+    def test_policy_does_not_import_slack_bolt(self):
+        self.assertNotIn('slack_bolt', _packages_imported_by('src.bot_policy'))
+
+    def test_importing_the_policy_leaves_logging_to_the_entry_point(self):
+        completed = subprocess.run(
+            [sys.executable, '-c', "import logging, src.bot_policy; print(logging.getLogger().handlers)"],
+            capture_output=True, text=True, check=True
+        )
+        self.assertEqual('[]', completed.stdout.strip())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from src import bot_policy, instrumentation, security_estimator
+from src.bot_policy import classify_and_respond
+from src.instrumentation import Counter, Histogram, ObservedValue
+from src.message_evaluation import evaluation_cache
+from src.parsing import regex_classifier
+from src.parsing.constants import RequestTypes
+from test.example_request_texts import FULL_FIREWALL_CHANGE_REQUEST
+
+
+class HistogramCase(unittest.TestCase):
+
+    def setUp(self):
+        self.histogram = Histogram('step_seconds', 'Time taken by a step.', ['kind'], buckets=(.1, 1.))
+
+    def test_observations_are_rendered_in_cumulative_buckets(self):
+        for seconds in [.05, .5, .7, 3.]:
+            self.histogram.observe(seconds, 'slow')
+
+        self.assertEqual([
+            '# HELP step_seconds Time taken by a step.',
+            '# TYPE step_seconds histogram',
+            'step_seconds_bucket{kind="slow",le="0.1"} 1',
+            'step_seconds_bucket{kind="slow",le="1.0"} 3',
+            'step_seconds_bucket{kind="slow",le="+Inf"} 4',
+            'step_seconds_sum{kind="slow"} 4.25',
+            'step_seconds_count{kind="slow"} 4',
+        ], self.histogram.render())
+
+    def test_label_values_are_counted_apart(self):
+        self.histogram.observe(.5, 'a')
+        self.histogram.observe(.5, 'a')
+        self.histogram.observe(.5, 'b')
+        self.assertEqual((2, 1, 0), tuple(self.histogram.count(kind) for kind in ['a', 'b', 'c']))
+
+    def test_observations_of_every_thread_are_counted(self):
+        threads = [
+            threading.Thread(target=lambda: [self.histogram.observe(.5, 'a') for _ in range(1000)]) for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(4000, self.histogram.count('a'))
+
+    def test_series_of_ended_threads_are_folded_together(self):
+        for _ in range(20):
+            thread = threading.Thread(target=lambda: [self.histogram.observe(.5, 'a') for _ in range(10)])
+            thread.start()
+            thread.join()
+        self.histogram.observe(.05, 'a')
+
+        self.assertEqual(201, self.histogram.count('a'))
+        self.assertEqual(1, len(self.histogram._all_thread_series))
+
+    def test_span_times_a_block_that_raises(self):
+        with self.assertRaises(ValueError):
+            with self.histogram.time('failing'):
+                raise ValueError()
+        self.assertEqual(1, self.histogram.count('failing'))
+
+
+class ExpositionCase(unittest.TestCase):
+
+    def test_label_values_are_escaped(self):
+        counter = Counter('lookups_total', 'Lookups.', ['key'])
+        counter.inc('say "hi"\\\n')
+        counter.inc('say "hi"\\\n', amount=2)
+        self.assertEqual('lookups_total{key="say \\"hi\\"\\\\\\n"} 3', counter.render()[-1])
+
+    def test_observed_value_is_read_when_rendered(self):
+        depth = [1]
+        gauge = ObservedValue('queue_depth', 'Depth.', 'gauge', lambda: depth[0])
+        depth[0] = 7
+        self.assertEqual(['# HELP queue_depth Depth.', '# TYPE queue_depth gauge', 'queue_depth 7.0'], gauge.render())
+
+    def test_metrics_of_the_pipeline_are_rendered(self):
+        rendered = instrumentation.render_metrics()
+        for name in [
+            'hyper_vyper_classification_seconds', 'hyper_vyper_extraction_seconds', 'hyper_vyper_risk_scoring_seconds',
+            'hyper_vyper_block_rendering_seconds', 'hyper_vyper_conversation_lookups_total',
+            'hyper_vyper_evaluation_cache_hits_total',
+        ]:
+            self.assertIn(f"# TYPE {name} ", rendered)
+
+
+class PipelineInstrumentationCase(unittest.TestCase):
+
+    def setUp(self):
+        bot_policy.decision_logger.log = MagicMock()
+        evaluation_cache.clear()
+
+    def test_classification_times_every_step_by_request_type(self):
+        def counts():
+            return [
+                regex_classifier._classification_time.count(),
+                regex_classifier._extraction_time.count(RequestTypes.FIREWALL_CHANGE),
+                security_estimator._risk_scoring_time.count(RequestTypes.FIREWALL_CHANGE),
+                bot_policy._block_rendering_time.count(RequestTypes.FIREWALL_CHANGE),
+                bot_policy._request_evaluation_time.count(RequestTypes.FIREWALL_CHANGE, 'new_request'),
+            ]
+        before = counts()
+
+        classify_and_respond({'text': FULL_FIREWALL_CHANGE_REQUEST, 'channel_name': 'test'}, MagicMock())
+
+        self.assertEqual([count + 1 for count in before], counts())
+
+    def test_replies_to_threads_count_conversation_lookups(self):
+        misses_before = bot_policy._conversation_lookups.count('miss')
+        bot_policy.fix_previously_submitted_request(
+            {'text': 'port 22', 'channel': 'C1'}, MagicMock(), 'unknown-thread', 'U1', MagicMock()
+        )
+        self.assertEqual(misses_before + 1, bot_policy._conversation_lookups.count('miss'))
+
+
+if __name__ == '__main__':
+    unittest.main()
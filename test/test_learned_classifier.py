@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from src import message_evaluation
+from src.message_evaluation import evaluate_message, evaluation_cache
+from src.parsing.constants import RequestFollowUp, RequestTypes
+from src.parsing.learned_classifier import (
+    LearnedClassifier, _fit, _from_fitted, read_labeled_tickets, split_holdout
+)
+
+TICKET_ARCHIVE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'resources', 'acme_security_tickets.csv'
+)
+# a vendor approval without the word 'provide', which the keyword rules look for.
+_VENDOR_APPROVAL_WITHOUT_KEYWORD = (
+    "Acme Corp offers marketing analytics services. They completed ACME's security questionnaire with a passing "
+    "score and have a valid SOC 2 Type II report. No PII involved."
+)
+
+
+class LearnedClassifierCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        texts, labels = read_labeled_tickets(TICKET_ARCHIVE_PATH)
+        (cls.train_texts, train_labels), (cls.holdout_texts, cls.holdout_labels) = split_holdout(texts, labels, .2)
+        cls.vectorizer, cls.model = _fit(cls.train_texts, train_labels)
+        cls.classifier = _from_fitted(cls.vectorizer, cls.model)
+
+    def test_scores_agree_with_scikit_learn(self):
+        texts = self.holdout_texts[:50] + ['', 'hello there', 'export export export the data']
+        scores, _ = self.classifier.decision_scores(texts)
+        np.testing.assert_allclose(
+            self.model.decision_function(self.vectorizer.transform(texts)), scores, rtol=1e-4, atol=1e-4
+        )
+
+    def test_holdout_tickets_are_classified_by_their_type(self):
+        predictions = [request_type for request_type, _ in self.classifier.classify_batch(self.holdout_texts)]
+        accuracy = np.mean([p == l for p, l in zip(predictions, self.holdout_labels)])
+        self.assertGreater(accuracy, .95)
+
+    def test_batch_classification_agrees_with_classifying_one_at_a_time(self):
+        texts = self.holdout_texts[:20] + ['nothing to see here']
+        self.assertEqual([self.classifier.classify(t) for t in texts], self.classifier.classify_batch(texts))
+
+    def test_given_text_without_known_terms_then_it_is_unknown(self):
+        self.assertEqual(RequestTypes.UNKNOWN, self.classifier.classify('zzz qqq')[0])
+
+    def test_saved_classifier_is_memory_mapped_and_classifies_the_same(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.classifier.save(directory)
+            loaded = LearnedClassifier.load(directory)
+            self.assertIsInstance(loaded.coefficients, np.memmap)
+            self.assertEqual(
+                self.classifier.classify_batch(self.holdout_texts), loaded.classify_batch(self.holdout_texts)
+            )
+            del loaded
+
+    def test_message_the_keyword_rules_miss_is_classified_by_the_fallback(self):
+        evaluation_cache.clear()
+        with patch.object(message_evaluation, 'fallback_classifier', self.classifier):
+            evaluation = evaluate_message(_VENDOR_APPROVAL_WITHOUT_KEYWORD)
+        evaluation_cache.clear()
+        self.assertEqual(RequestTypes.VENDOR_APPROVAL, evaluation.request_type)
+        self.assertNotEqual(RequestFollowUp.REJECT, evaluation.followup)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import threading
+import time
+import unittest
+from concurrent import futures
+from unittest.mock import patch
+
+from src import message_evaluation
+from src.message_evaluation import evaluate_message, evaluation_cache
+from src.parsing.constants import RequestTypes
+from src.parsing.micro_batching import MicroBatchingClassifier
+
+
+class _FakeModel(object):
+    """classifies every text as a devtool install, with a confidence of one over its length, recording its batches."""
+
+    def __init__(self, fails: bool = False, drops_results: bool = False, seconds_per_batch: float = 0.):
+        self.batches = []
+        self.warmed_up = False
+        self.fails = fails
+        self.drops_results = drops_results
+        self.seconds_per_batch = seconds_per_batch
+
+    def predict_batch(self, texts):
+        self.batches.append(list(texts))
+        time.sleep(self.seconds_per_batch)
+        if self.fails:
+            raise RuntimeError('out of memory')
+        results = [(RequestTypes.DEVTOOL_INSTALL, 1. / len(text)) for text in texts]
+        return results[:-1] if self.drops_results else results
+
+    def warm_up(self):
+        self.warmed_up = True
+
+
+class MicroBatchingCase(unittest.TestCase):
+
+    def setUp(self):
+        self.model = _FakeModel()
+        self.classifier = MicroBatchingClassifier(
+            self.model.predict_batch, max_batch_size=4, max_wait_seconds=.2, warm_up=self.model.warm_up
+        )
+
+    def tearDown(self):
+        self.classifier.close()
+
+    def test_messages_submitted_together_are_classified_in_one_batch(self):
+        futures = [self.classifier.submit(text) for text in ['a', 'bb', 'ccc', 'dddd']]
+        self.assertEqual([1., .5, 1. / 3, .25], [future.result()[1] for future in futures])
+        self.assertEqual([['a', 'bb', 'ccc', 'dddd']], self.model.batches)
+
+    def test_batches_are_no_larger_than_the_maximum(self):
+        self.classifier.classify_batch([str(i) for i in range(10)])
+        self.assertEqual([4, 4, 2], [len(batch) for batch in self.model.batches])
+        self.assertAlmostEqual(10 / 3, self.classifier.average_batch_size)
+
+    def test_lone_message_waits_no_longer_than_the_deadline(self):
+        classifier = MicroBatchingClassifier(self.model.predict_batch, max_batch_size=4, max_wait_seconds=.01)
+        start = time.perf_counter()
+        self.assertEqual(RequestTypes.DEVTOOL_INSTALL, classifier('please install vscode'))
+        self.assertLess(time.perf_counter() - start, .5)
+        classifier.close()
+
+    def test_model_is_warmed_up_before_the_first_batch(self):
+        self.classifier.classify('a')
+        self.assertTrue(self.model.warmed_up)
+
+    def test_failure_of_the_model_fails_every_message_of_the_batch(self):
+        classifier = MicroBatchingClassifier(_FakeModel(fails=True).predict_batch, max_batch_size=2)
+        futures = [classifier.submit(text) for text in ['a', 'b']]
+        for future in futures:
+            self.assertRaises(RuntimeError, future.result)
+        classifier.close()
+
+    def test_missing_results_fail_every_message_of_the_batch(self):
+        classifier = MicroBatchingClassifier(_FakeModel(drops_results=True).predict_batch, max_batch_size=2)
+        futures = [classifier.submit(text) for text in ['a', 'b']]
+        for future in futures:
+            self.assertRaises(RuntimeError, future.result, 1.)
+        classifier.close()
+
+    def test_message_not_classified_in_time_is_given_up_on_and_skipped(self):
+        model = _FakeModel(seconds_per_batch=.2)
+        classifier = MicroBatchingClassifier(
+            model.predict_batch, max_batch_size=1, max_wait_seconds=0., result_timeout_seconds=.1
+        )
+        first = classifier.submit('a')
+        self.assertRaises(futures.TimeoutError, classifier.classify, 'b')
+        first.result(1.)
+        classifier.close()
+        self.assertEqual([['a']], model.batches)
+
+    def test_messages_submitted_while_closing_are_classified(self):
+        classifier = MicroBatchingClassifier(self.model.predict_batch, max_batch_size=4, max_wait_seconds=0.)
+        futures = []
+        submitter = threading.Thread(target=lambda: futures.extend(classifier.submit('a') for _ in range(200)))
+        submitter.start()
+        while submitter.is_alive():
+            classifier.close()
+        classifier.close()
+        self.assertEqual(200, len(futures))
+        self.assertTrue(all(future.done() for future in futures))
+
+    def test_classifying_after_close_starts_a_new_worker(self):
+        self.classifier.classify('a')
+        self.classifier.close()
+        self.assertEqual(RequestTypes.DEVTOOL_INSTALL, self.classifier.classify('b')[0])
+
+    def test_message_the_keyword_rules_miss_is_classified_through_the_worker(self):
+        evaluation_cache.clear()
+        with patch.object(message_evaluation, 'fallback_classifier', self.classifier):
+            evaluation = evaluate_message('vscode, please')
+        evaluation_cache.clear()
+        self.assertEqual(RequestTypes.DEVTOOL_INSTALL, evaluation.request_type)
+        self.assertEqual([['vscode, please']], self.model.batches)
+
+    def test_keyword_rules_answer_when_the_model_fails_or_times_out(self):
+        for model, timeout in [(_FakeModel(fails=True), 1.), (_FakeModel(seconds_per_batch=.3), .1)]:
+            classifier = MicroBatchingClassifier(model.predict_batch, result_timeout_seconds=timeout)
+            evaluation_cache.clear()
+            with patch.object(message_evaluation, 'fallback_classifier', classifier), \
+                    self.assertLogs(message_evaluation.evaluation_logger):
+                evaluation = evaluate_message('I need access to install X')
+            evaluation_cache.clear()
+            classifier.close()
+            self.assertEqual(RequestTypes.DEVTOOL_INSTALL, evaluation.request_type)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,13 +4,15 @@ from parameterized import parameterized
 
 from src.parsing.constants import RequestTypes
 from src.parsing.regex_classifier import (
-    attempt_to_classify, attempt_to_construct_firewall_change,
+    attempt_to_classify, attempt_to_classify_sequentially, attempt_to_construct_firewall_change,
     attempt_to_construct_devtool_install, attempt_to_construct_cloud_access,
     attempt_to_construct_permissions_change,
     attempt_to_construct_data_export, attempt_to_construct_vendor_approval,
     attempt_to_construct_network_access,
-    construct_according_to_classification
+    classify_with_confidence, complete_missing_fields, construct_according_to_classification, MAX_MESSAGE_LENGTH,
+    score_request_types, _KeywordConfirmation, _TriggerRule
 )
+from src.parsing.request_registry import register_trigger_rule, registered_schemas, schema_of
 from src.parsing.requests import (
     CloudResourceAccessRequest, DataExportRequest,
     DevToolInstallRequest, FireWallChangeRequest, NetworkAccessRequest, PermissionsChangeRequest,
@@ -66,6 +68,139 @@ class BasicClassificationTest(unittest.TestCase):
         self.assertIsInstance(construct_according_to_classification(type_name, ''), request_type)
 
 
+_CLASSIFICATION_TEXTS = [
+    (FULL_CLOUD_ACCESS_REQUEST,),
+    (FULL_DATA_EXPORT_REQUEST,),
+    (FULL_DEVTOOL_INSTALL_REQUEST,),
+    (FULL_FIREWALL_CHANGE_REQUEST,),
+    (FULL_NETWORK_ACCESS_REQUEST,),
+    (FULL_PERMISSION_CHANGE_REQUEST,),
+    (FULL_VENDOR_APPROVAL_REQUEST,),
+    ('Acme provides cloud services that we need access to',),
+    ('please INSTALL the ROLE to EXPORT it',),
+    ('Access to installow traffic',),
+    ('we allow no traffic, but we install stuff',),
+    ('Temporary Firewall Rule for the export of a role',),
+    ('ſome acceſſ to data',),
+    ('İnstall acceſs with a temporary firewall rule',),
+    ('nothing to see here',),
+]
+
+
+class SinglePassClassificationTest(unittest.TestCase):
+    @parameterized.expand(_CLASSIFICATION_TEXTS)
+    def test_single_pass_classification_agrees_with_sequential_rules(self, text):
+        self.assertEqual(attempt_to_classify_sequentially(text), attempt_to_classify(text))
+
+    @parameterized.expand(_CLASSIFICATION_TEXTS)
+    def test_classification_with_confidence_agrees_with_single_pass_classification(self, text):
+        self.assertEqual(attempt_to_classify(text), classify_with_confidence(text)[0])
+
+    def test_given_text_matching_rules_of_several_types_then_they_halve_their_confidence(self):
+        self.assertEqual(
+            {RequestTypes.DEVTOOL_INSTALL: .45, RequestTypes.CLOUD_ACCESS: .4},
+            score_request_types('I need access to install X')
+        )
+        self.assertEqual((RequestTypes.DEVTOOL_INSTALL, .45), classify_with_confidence('I need access to install X'))
+        self.assertEqual(
+            (RequestTypes.PERMISSION_CHANGE, .45),
+            classify_with_confidence('I need the admin role to access the billing console')
+        )
+
+    def test_given_text_matching_a_single_rule_then_it_is_as_confident_as_the_rule_is_specific(self):
+        self.assertEqual((RequestTypes.DATA_EXPORT, .9), classify_with_confidence(FULL_DATA_EXPORT_REQUEST))
+        self.assertEqual((RequestTypes.CLOUD_ACCESS, .8), classify_with_confidence('I need access to the s3 bucket'))
+
+    def test_given_text_matching_no_rule_then_it_is_unknown_without_confidence(self):
+        self.assertEqual({}, score_request_types('nothing to see here'))
+        self.assertEqual((RequestTypes.UNKNOWN, 0.), classify_with_confidence('nothing to see here'))
+
+    def test_trigger_rule_registered_with_a_schema_is_used_from_then_on(self):
+        schema = schema_of(RequestTypes.NETWORK_ACCESS)
+        self.addCleanup(register_trigger_rule, schema.request_type, schema.trigger_rule)
+        register_trigger_rule(schema.request_type, _TriggerRule(
+            schema.trigger_rule.priority, .7, lambda text: 'vpn' in text.lower(),
+            {'vpn': _KeywordConfirmation(lambda text, position: True, refutes_rule=False)}
+        ))
+
+        for classify in [attempt_to_classify, attempt_to_classify_sequentially]:
+            self.assertEqual(RequestTypes.NETWORK_ACCESS, classify('please open the VPN for me'))
+        self.assertEqual((RequestTypes.NETWORK_ACCESS, .7), classify_with_confidence('please open the VPN for me'))
+
+
+_EXTRACTION_TEXTS = [
+    FULL_CLOUD_ACCESS_REQUEST, FULL_DATA_EXPORT_REQUEST, FULL_DEVTOOL_INSTALL_REQUEST, FULL_FIREWALL_CHANGE_REQUEST,
+    FULL_NETWORK_ACCESS_REQUEST, FULL_PERMISSION_CHANGE_REQUEST, FULL_VENDOR_APPROVAL_REQUEST,
+    'We DON\'T HAVE AN INVALID SOC 2 TYPE II REPORT, and NO PII INVOLVED. JIRA TICKET: SEC-12 for 3 Days.',
+    'Allow traffic from 10.0.0.0/8 to 10.1.2.3 on port 443 during the 02:00–04:00 window.',
+    'Data claſſification: internal, exported to s3-bucket-eu for the audit.',
+    'jira ticKet: OPS-7 to install a tool',
+    'no direct identifiers present',
+    '',
+]
+
+_PLANNED_REQUEST_TYPES = [schema.request_type for schema in registered_schemas() if schema.extraction_plan is not None]
+
+
+class PlannedExtractionTest(unittest.TestCase):
+    @parameterized.expand([
+        (request_type, text) for request_type in sorted(_PLANNED_REQUEST_TYPES) for text in _EXTRACTION_TEXTS
+    ])
+    def test_planned_extraction_agrees_with_searching_every_field(self, request_type, text):
+        plan = schema_of(request_type).extraction_plan
+        self.assertEqual(plan.extract_sequentially(text), plan.extract(text))
+
+    def test_given_text_without_the_words_of_a_gated_field_then_its_pattern_is_not_searched(self):
+        plan = schema_of(RequestTypes.DEVTOOL_INSTALL).extraction_plan
+        self.assertEqual(1, plan.searches('please install vscode for my work.'))
+        self.assertEqual(2, plan.searches('please install vscode for my work. Jira ticket: DEV-1'))
+
+
+class ThreadReplyCompletionTest(unittest.TestCase):
+    @parameterized.expand([
+        (request_type, text) for request_type in sorted(_PLANNED_REQUEST_TYPES) for text in _EXTRACTION_TEXTS
+    ])
+    def test_completing_an_empty_request_agrees_with_extracting_the_reply(self, request_type, text):
+        plan = schema_of(request_type).extraction_plan
+        empty_request = plan.request_class(*[None] * len(plan.fields))
+        self.assertEqual(plan.extract(text), complete_missing_fields(empty_request, text))
+
+    def test_given_reply_with_the_missing_field_then_it_is_filled_in(self):
+        portless = attempt_to_construct_firewall_change('allow ssh to external ip from 127.0.0.1 for the release.')
+        completed = complete_missing_fields(portless, 'send it to 10.1.2.3 on port 22')
+        self.assertEqual(
+            FireWallChangeRequest(portless.business_justification, portless.source_system, '10.1.2.3:22'), completed
+        )
+
+    def test_given_reply_mentioning_a_field_the_request_has_then_it_keeps_its_value(self):
+        pending = DevToolInstallRequest('my work', None)
+        completed = complete_missing_fields(pending, 'this is for the release. Jira ticket: DEV-1')
+        self.assertEqual(DevToolInstallRequest('my work', 'DEV-1'), completed)
+
+    def test_given_request_missing_nothing_then_it_is_returned_as_is(self):
+        complete_request = DevToolInstallRequest('my work', 'DEV-1')
+        self.assertIs(complete_request, complete_missing_fields(complete_request, FULL_DEVTOOL_INSTALL_REQUEST))
+
+
+class PathologicalInputTest(unittest.TestCase):
+    def test_given_many_words_between_provides_and_a_dead_end_then_classification_is_unknown(self):
+        self.assertEqual(RequestTypes.UNKNOWN, attempt_to_classify('provides ' + 'abcdefgh ' * 40 + '!'))
+
+    def test_given_many_words_before_a_dead_end_then_no_vendor_name_is_extracted(self):
+        user_req = attempt_to_construct_vendor_approval('acme, ' * 40 + '!')
+        self.assertIsNone(user_req.vendor_name)
+
+    def test_given_many_words_after_justification_opener_without_full_stop_then_it_is_not_extracted(self):
+        user_req = attempt_to_construct_devtool_install('for ' + 'abcdefgh ' * 40 + '!')
+        self.assertIsNone(user_req.business_justification)
+
+    def test_given_text_beyond_message_budget_then_it_is_ignored(self):
+        user_req = attempt_to_construct_devtool_install(
+            'x' * MAX_MESSAGE_LENGTH + ' Jira ticket: JUCHA-7979'
+        )
+        self.assertIsNone(user_req.team_leader_approval)
+
+
 class CloudAccessTest(unittest.TestCase):
     def test_given_full_request_then_valid_request_can_be_extracted(self):
         user_req = attempt_to_construct_cloud_access(FULL_CLOUD_ACCESS_REQUEST)
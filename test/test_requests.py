@@ -3,6 +3,9 @@ import unittest
 
 from parameterized import parameterized
 
+from src import security_estimator  # noqa: F401, registers the risk rules
+from src.parsing import regex_classifier  # noqa: F401, registers the extractors
+from src.parsing.request_registry import schema_of
 from src.parsing.requests import UserRequest, RequestField
 from test.example_request_objects import (
     ALL_EMPTY_REQUESTS, FILLED_REQUESTS,
@@ -54,6 +57,13 @@ class BasicRequestActionsCase(unittest.TestCase):
             self.assertIn(field.name, pretty_print)
             self.assertIn(field.description, pretty_print)
 
+    def test_field_values_appear_verbatim_in_pretty_printed_content(self):
+        req = _FakeRequest('{curly} a', None)
+        self.assertEqual(
+            "_FakeRequest\n\n\t*<a>* (mandatory): {curly} a\n\t*<b>* (_optional_): _<empty>_",
+            req.pretty_print_content()
+        )
+
 
 class RequestMergingCase(unittest.TestCase):
 
@@ -88,6 +98,45 @@ class RequestMergingCase(unittest.TestCase):
             ):
         self.assertNotEqual(filled, filled.merge_with(also_filled))
 
+    @parameterized.expand(
+        [
+            (old, new) for old, new in itertools.product(FILLED_REQUESTS, ALTERNATE_FILLED_REQUESTS)
+            if old.__class__ == new.__class__
+        ]
+    )
+    def test_merging_leaves_both_merged_requests_as_they_were(self, filled, also_filled):
+        filled_values = [getattr(filled, name) for name in filled._field_details]
+        also_filled_values = [getattr(also_filled, name) for name in also_filled._field_details]
+
+        merged = filled.merge_with(also_filled)
+
+        self.assertIsNot(filled, merged)
+        self.assertEqual(filled_values, [getattr(filled, name) for name in filled._field_details])
+        self.assertEqual(also_filled_values, [getattr(also_filled, name) for name in also_filled._field_details])
+
+
+class RequestRegistryCase(unittest.TestCase):
+
+    @parameterized.expand([(r.request_type, r) for r in FILLED_REQUESTS])
+    def test_every_request_type_is_registered_with_its_class_extractor_and_risk_rule(self, request_type, request):
+        schema = schema_of(request_type)
+        self.assertIs(type(request), schema.request_class)
+        self.assertIsNotNone(schema.construct)
+        self.assertIsNotNone(schema.calculate_risk)
+
+    @parameterized.expand([(r.request_type, r) for r in FILLED_REQUESTS])
+    def test_declared_constructor_takes_the_fields_in_order(self, _, request):
+        values = [getattr(request, name) for name in request._field_details]
+        self.assertEqual(request, type(request)(*values))
+
+
+class CompactRequestCase(unittest.TestCase):
+
+    @parameterized.expand([(r.request_type, r) for r in ALL_EMPTY_REQUESTS])
+    def test_requests_hold_their_fields_in_slots_and_share_the_field_descriptions(self, _, request):
+        self.assertFalse(hasattr(request, '__dict__'))
+        self.assertIs(type(request)._field_details, request._field_details)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -141,6 +141,53 @@ class ConversationalFlowCase(unittest.TestCase):
 
         bot_policy.decision_logger.log.assert_called_once()
 
+    def test_reply_in_thread_started_by_classification_does_not_ask_slack_who_started_it(self):
+        bot_response = classify_and_respond(
+            _portless_fw_change_req, self.threading_client
+        )
+        hits = bot_policy.bot_threads.hits
+
+        handle_message(
+            create_threaded_payload_with_text('are you still there?', bot_response.thread_ts),
+            self.threading_client, MagicMock(), self.bot_context
+        )
+
+        self.threading_client.conversations_history.assert_not_called()
+        self.assertEqual(hits + 1, bot_policy.bot_threads.hits)
+
+    def test_reply_in_unknown_thread_asks_slack_only_once(self):
+        unknown_thread_reply = create_threaded_payload_with_text('are you still there?', 1234.0)
+        misses = bot_policy.bot_threads.misses
+
+        for _ in range(3):
+            handle_message(unknown_thread_reply, self.threading_client, MagicMock(), self.bot_context)
+
+        self.threading_client.conversations_history.assert_called_once()
+        self.assertEqual(misses + 1, bot_policy.bot_threads.misses)
+
+    def test_second_reply_in_thread_started_by_a_person_does_not_ask_slack(self):
+        self.threading_client.conversations_history.return_value = {
+            'ok': True,
+            'messages': [{'user': 'U092VDAKQG0'}]
+        }
+        human_thread_reply = create_threaded_payload_with_text('thanks all', 5678.0)
+
+        first = handle_message(human_thread_reply, self.threading_client, MagicMock(), self.bot_context)
+        second = handle_message(human_thread_reply, self.threading_client, MagicMock(), self.bot_context)
+
+        self.threading_client.conversations_history.assert_called_once()
+        self.assertEqual(RequestFollowUp.IRRELEVANT, first.bot_decision.outcome)
+        self.assertEqual(RequestFollowUp.IRRELEVANT, second.bot_decision.outcome)
+
+    def test_thread_whose_root_could_not_be_fetched_is_asked_about_again(self):
+        self.threading_client.conversations_history.return_value = {'ok': False, 'messages': []}
+        reply = create_threaded_payload_with_text('hello?', 9012.0)
+
+        for _ in range(2):
+            handle_message(reply, self.threading_client, MagicMock(), self.bot_context)
+
+        self.assertEqual(2, self.threading_client.conversations_history.call_count)
+
 
 _basic_fake_payload = {
     'token': '6gXYiea8a5GXPFnyHHjdqnYi',
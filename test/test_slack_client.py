@@ -0,0 +1,187 @@
+import json
+import multiprocessing
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from slack_sdk.errors import SlackApiError, SlackRequestError
+
+from src import slack_client
+from src.slack_client import PooledWebClient, TokenBucket
+
+
+class _MockSlackApi(BaseHTTPRequestHandler):
+    """
+    answers every api method with ok, except for the scripted statuses queued in the server's rate_limits, after
+    dropping the first dropped_connections calls without an answer.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server = self.server
+        with server.lock:
+            server.calls.append(self.path.rsplit('/', 1)[-1])
+            server.client_ports.add(self.client_address[1])
+            retry_after = server.rate_limits.pop(0) if server.rate_limits else None
+            is_dropped = server.dropped_connections > 0
+            server.dropped_connections -= is_dropped
+        if is_dropped:
+            self.close_connection = True
+        elif retry_after is not None:
+            self._answer(429, {'ok': False, 'error': 'ratelimited'}, {'Retry-After': str(retry_after)})
+        else:
+            self._answer(200, {'ok': True, 'ts': f"{time.time():.6f}", 'channel': 'C1'})
+
+    def _answer(self, status: int, body: dict, headers: dict = None):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class PooledWebClientCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _MockSlackApi)
+        self.server.lock = threading.Lock()
+        self.server.calls, self.server.client_ports, self.server.rate_limits = [], set(), []
+        self.server.dropped_connections = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = PooledWebClient(
+            token='xoxb-test', base_url=f"http://127.0.0.1:{self.server.server_address[1]}/api/"
+        )
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_calls_are_answered_over_a_single_kept_alive_connection(self):
+        for _ in range(3):
+            self.assertTrue(self.client.chat_postMessage(channel='C1', text='hello')['ok'])
+        self.client.conversations_history(channel='C1', limit=1)
+
+        self.assertEqual(['chat.postMessage'] * 3 + ['conversations.history'], self.server.calls)
+        self.assertEqual(1, len(self.server.client_ports))
+
+    @unittest.skipIf(sys.platform == 'win32', 'workers are only forked on posix')
+    def test_forked_worker_calls_slack_over_a_connection_of_its_own(self):
+        self.client.api_test()
+        worker = multiprocessing.get_context('fork').Process(target=self.client.api_test)
+        worker.start()
+        worker.join()
+        self.client.api_test()
+
+        self.assertEqual(0, worker.exitcode)
+        self.assertEqual(['api.test'] * 3, self.server.calls)
+        self.assertEqual(2, len(self.server.client_ports))
+
+    def test_rate_limited_call_is_retried_after_slack_asks_to(self):
+        self.server.rate_limits.append(0)
+
+        response = self.client.chat_postMessage(channel='C1', text='hello')
+
+        self.assertTrue(response['ok'])
+        self.assertEqual(['chat.postMessage'] * 2, self.server.calls)
+        self.assertEqual(1, self.client.rate_limited_calls)
+
+    def test_call_whose_connection_was_dropped_is_retried(self):
+        self.server.dropped_connections = 1
+
+        response = self.client.chat_postMessage(channel='C1', text='hello')
+
+        self.assertTrue(response['ok'])
+        self.assertEqual(['chat.postMessage'] * 2, self.server.calls)
+
+    def test_call_to_a_url_that_is_not_http_is_refused(self):
+        client = PooledWebClient(token='xoxb-test', base_url='file:///etc/')
+        try:
+            with self.assertRaises(SlackRequestError):
+                client.api_test()
+        finally:
+            client.close()
+        self.assertEqual([], self.server.calls)
+
+    def test_calls_go_through_the_proxy_the_client_was_given(self):
+        client = PooledWebClient(token='xoxb-test', base_url='http://slack.invalid/api/', proxy=self.client.base_url)
+        try:
+            self.assertTrue(client.api_test()['ok'])
+        finally:
+            client.close()
+        self.assertEqual(['api.test'], self.server.calls)
+
+    def test_call_still_rate_limited_after_all_retries_raises(self):
+        client = PooledWebClient(token='xoxb-test', base_url=self.client.base_url, rate_limit_retries=1)
+        self.server.rate_limits.extend([0, 0])
+        try:
+            with self.assertRaises(SlackApiError):
+                client.chat_postMessage(channel='C1', text='hello')
+        finally:
+            client.close()
+
+    def test_messages_over_the_channel_rate_wait_their_turn(self):
+        for _ in range(6):
+            self.client.chat_postMessage(channel='C1', text='hello')
+        self.client.chat_postMessage(channel='C2', text='hello')
+
+        self.assertEqual(7, len(self.server.calls))
+        # the burst of 5 goes right through, the 6th waits about a second, and another channel does not wait.
+        self.assertGreater(self.client.waited_seconds, .5)
+        self.assertLess(self.client.waited_seconds, 1.5)
+
+    def test_a_share_of_the_rate_limits_paces_calls_slower(self):
+        client = PooledWebClient(token='xoxb-test', base_url=self.client.base_url, rate_limit_share=.25)
+        try:
+            post_message_bucket = client._bucket_of('chat.postMessage', 'C1')
+            history_bucket = client._bucket_of('conversations.history')
+        finally:
+            client.close()
+
+        self.assertEqual((.25, 1), (post_message_bucket.rate_per_second, post_message_bucket.burst))
+        self.assertAlmostEqual(50 / 60 / 4, history_bucket.rate_per_second)
+
+    def test_idle_buckets_of_channels_are_dropped_past_the_maximum(self):
+        self.client._bucket_of('chat.postMessage', 'C0').acquire()
+        with patch.object(slack_client, 'MAX_BUCKETS', 3):
+            for channel in ['C1', 'C2', 'C3']:
+                self.client._bucket_of('chat.postMessage', channel)
+
+        self.assertEqual([('chat.postMessage', 'C0'), ('chat.postMessage', 'C3')], sorted(self.client._buckets))
+
+
+class TokenBucketCase(unittest.TestCase):
+
+    def test_burst_passes_at_once_and_the_rest_is_paced(self):
+        bucket = TokenBucket(rate_per_second=20, burst=3)
+        waits = [bucket.acquire() for _ in range(5)]
+        self.assertEqual([0.] * 3, waits[:3])
+        self.assertAlmostEqual(.05, waits[3], delta=.02)
+        self.assertAlmostEqual(.05, waits[4], delta=.02)
+
+    def test_bucket_is_idle_once_it_filled_up_again(self):
+        bucket = TokenBucket(rate_per_second=100, burst=1)
+        self.assertTrue(bucket.is_idle())
+        bucket.acquire()
+        self.assertFalse(bucket.is_idle())
+        time.sleep(.02)
+        self.assertTrue(bucket.is_idle())
+
+    def test_paused_bucket_holds_calls_back(self):
+        bucket = TokenBucket(rate_per_second=100, burst=10)
+        bucket.pause(.1)
+        self.assertAlmostEqual(.1, bucket.acquire(), delta=.02)
+
+
+if __name__ == '__main__':
+    unittest.main()
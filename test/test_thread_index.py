@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+
+from src.state.thread_index import BotThreadIndex
+
+
+class BotThreadIndexCase(unittest.TestCase):
+
+    def test_threads_are_known_as_ours_or_not_and_lookups_are_counted(self):
+        bot_threads = BotThreadIndex()
+        bot_threads.add('1.0')
+        bot_threads.add_not_ours(2.0)
+        self.assertEqual([True, False, None], [bot_threads.is_ours(ts) for ts in ['1.0', '2.0', '3.0']])
+        self.assertEqual((2, 1), (bot_threads.hits, bot_threads.misses))
+
+
+class SharedBotThreadIndexCase(unittest.TestCase):
+
+    def setUp(self):
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.db_dir.name, 'state.db')
+
+    def tearDown(self):
+        self.db_dir.cleanup()
+
+    def test_threads_one_worker_learned_about_are_known_by_another(self):
+        first_worker, second_worker = [BotThreadIndex(db_path=self.db_path) for _ in range(2)]
+        first_worker.add('1.0')
+        first_worker.add_not_ours('2.0')
+        self.assertEqual([True, False, None], [second_worker.is_ours(ts) for ts in ['1.0', '2.0', '3.0']])
+        self.assertEqual((2, 1), (second_worker.hits, second_worker.misses))
+
+    def test_threads_are_forgotten_after_their_time(self):
+        first_worker, second_worker = [BotThreadIndex(ttl=0, db_path=self.db_path) for _ in range(2)]
+        first_worker.add('1.0')
+        self.assertIsNone(second_worker.is_ours('1.0'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import threading
+import unittest
+
+from src.work_queue import ShardedWorkQueue
+
+
+class ShardedWorkQueueCase(unittest.TestCase):
+
+    def setUp(self):
+        self.handled = []
+        self.work_queue = ShardedWorkQueue(self.handled.append, workers=4, capacity_per_worker=100)
+
+    def tearDown(self):
+        self.work_queue.close()
+
+    def test_work_of_the_same_key_is_handled_in_submission_order(self):
+        for i in range(50):
+            self.work_queue.submit('C1', ('C1', i))
+            self.work_queue.submit('C2', ('C2', i))
+        self.work_queue.join()
+
+        for channel in ['C1', 'C2']:
+            self.assertEqual(list(range(50)), [i for c, i in self.handled if c == channel])
+        self.assertEqual(100, self.work_queue.completed)
+
+    def test_work_of_different_keys_runs_concurrently(self):
+        both_running = threading.Barrier(2, timeout=5)
+        work_queue = ShardedWorkQueue(lambda _: both_running.wait(), workers=4)
+        keys_by_shard = {work_queue.shard_of(f"C{i}"): f"C{i}" for i in range(20)}
+        try:
+            for key in list(keys_by_shard.values())[:2]:
+                work_queue.submit(key, None)
+            work_queue.join()
+            self.assertEqual((2, 0), (work_queue.completed, work_queue.failed))
+        finally:
+            work_queue.close()
+
+    def test_full_shard_refuses_work_without_blocking(self):
+        release = threading.Event()
+        work_queue = ShardedWorkQueue(lambda _: release.wait(timeout=5), workers=1, capacity_per_worker=2)
+        try:
+            accepted = [work_queue.submit('C1', i) for i in range(5)]
+            # the consumer holds the first while two more wait in the queue.
+            self.assertLessEqual(accepted.count(True), 3)
+            self.assertFalse(accepted[-1])
+            self.assertEqual(accepted.count(False), work_queue.rejected)
+        finally:
+            release.set()
+            work_queue.close()
+
+    def test_failing_work_is_counted_and_does_not_stop_the_consumer(self):
+        def fail_on_odd(i):
+            if i % 2:
+                raise ValueError(i)
+            self.handled.append(i)
+        work_queue = ShardedWorkQueue(fail_on_odd, workers=1)
+        try:
+            for i in range(4):
+                work_queue.submit('C1', i)
+            work_queue.join()
+            self.assertEqual([0, 2], self.handled)
+            self.assertEqual((2, 2), (work_queue.completed, work_queue.failed))
+        finally:
+            work_queue.close()
+
+    def test_without_workers_work_is_handled_by_the_submitter(self):
+        work_queue = ShardedWorkQueue(self.handled.append, workers=0)
+        self.assertTrue(work_queue.submit('C1', 'now'))
+        self.assertEqual(['now'], self.handled)
+
+    def test_closed_queue_starts_again_on_submit(self):
+        self.work_queue.submit('C1', 1)
+        self.work_queue.close()
+        self.work_queue.submit('C1', 2)
+        self.work_queue.join()
+        self.assertEqual([1, 2], self.handled)
+
+
+if __name__ == '__main__':
+    unittest.main()